@@ -39,6 +39,8 @@ class Notification(models.Model):
             models.Index(fields=["user", "status"]),
             models.Index(fields=["type"]),
             models.Index(fields=["created_at"]),
+            # Keyset pages of a user's feed on (created_at, id)
+            models.Index(fields=["user", "-created_at", "-id"], name="notification_user_created_idx"),
         ]
 
     def __str__(self):
@@ -4,13 +4,7 @@ from rest_framework.decorators import action
 from .models import Notification
 from .serializers import NotificationSerializer
 from django.db.models import Q
-from rest_framework.pagination import PageNumberPagination
-
-class StandardResultsSetPagination(PageNumberPagination):
-    """Custom pagination class for consistent page sizes."""
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from app.utils.pagination import StandardResultsSetPagination
 
 class NotificationViewSet(viewsets.ModelViewSet):
     """
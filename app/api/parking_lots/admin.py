@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import ParkingLot, ParkingSpace
+from .models import ParkingLot, ParkingSpace, OccupancySample
 
 # Register your models here.
 admin.site.register(ParkingLot)
 admin.site.register(ParkingSpace)
+admin.site.register(OccupancySample)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ParkingLotsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app.api.parking_lots"
+
+    def ready(self):
+        import app.api.parking_lots.signals  # noqa
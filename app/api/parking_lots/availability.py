@@ -0,0 +1,231 @@
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import ParkingLot, ParkingSpace
+from .occupancy import occupancy_rate
+
+SNAPSHOT_KEY = 'parking_lots:availability:{lot_id}'
+
+# Bumped on every committed write to a lot's spaces or counters; a snapshot
+# is only served while it carries the current version
+VERSION_KEY = 'parking_lots:availability:{lot_id}:version'
+
+# Lots loaded per query when rebuilding many snapshots
+REBUILD_BATCH_SIZE = 100
+
+
+def _version_keys(lot_ids):
+    return {lot_id: VERSION_KEY.format(lot_id=lot_id) for lot_id in lot_ids}
+
+
+def _initial_version():
+    # Seeded from the clock so an evicted counter restarts above every value
+    # it held and never matches an older snapshot again
+    return time.time_ns() // 1000
+
+
+def _versions(lot_ids):
+    keys = _version_keys(lot_ids)
+    versions = cache.get_many(keys.values())
+    for lot_id, key in keys.items():
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key, 0)
+    return {lot_id: versions[key] for lot_id, key in keys.items()}
+
+
+def _bump(lot_ids):
+    versions = {}
+    for lot_id, key in _version_keys(lot_ids).items():
+        cache.add(key, _initial_version(), None)
+        try:
+            versions[lot_id] = cache.incr(key)
+        except ValueError:
+            versions[lot_id] = _initial_version()
+            cache.set(key, versions[lot_id], None)
+    return versions
+
+
+def _load(lot_ids, versions):
+    # Imported here: the serializers module depends on the counters, which
+    # depend on this module
+    from .serializers import ParkingSpaceSerializer
+
+    snapshots = {
+        lot_id: {
+            'version': versions[lot_id],
+            'total_spaces': total_spaces,
+            'available_spaces': available_spaces,
+            'space_ids': {choice: [] for choice in ParkingSpace.Status.values},
+            'available': [],
+        }
+        for lot_id, total_spaces, available_spaces in ParkingLot.objects.filter(pk__in=lot_ids).values_list(
+            'id', 'total_spaces', 'available_spaces'
+        )
+    }
+    available = defaultdict(list)
+    for space in ParkingSpace.objects.filter(parking_lot_id__in=snapshots).order_by('id'):
+        snapshots[space.parking_lot_id]['space_ids'][space.status].append(space.id)
+        if space.status == ParkingSpace.Status.AVAILABLE:
+            available[space.parking_lot_id].append(space)
+    for lot_id, spaces in available.items():
+        snapshots[lot_id]['available'] = ParkingSpaceSerializer(spaces, many=True).data
+    return snapshots
+
+
+def rebuild(lot_ids=None, versions=None):
+    """
+    Load availability snapshots from the database and cache them.
+
+    Covers every lot when ``lot_ids`` is not given. Snapshots are tagged
+    with the version read before loading, so a write committed meanwhile
+    leaves them stale rather than wrong. Entries of deleted lots are
+    dropped. Returns ``{lot_id: snapshot}``.
+    """
+    if lot_ids is None:
+        lot_ids = ParkingLot.objects.order_by('pk').values_list('pk', flat=True)
+    lot_ids = list(lot_ids)
+    snapshots = {}
+    for offset in range(0, len(lot_ids), REBUILD_BATCH_SIZE):
+        batch = lot_ids[offset:offset + REBUILD_BATCH_SIZE]
+        batch_versions = versions if versions is not None else _versions(batch)
+        loaded = _load(batch, batch_versions)
+        cache.set_many(
+            {SNAPSHOT_KEY.format(lot_id=lot_id): snapshot for lot_id, snapshot in loaded.items()},
+            settings.PARKING_LOT_AVAILABILITY_TIMEOUT
+        )
+        cache.delete_many([SNAPSHOT_KEY.format(lot_id=lot_id) for lot_id in batch if lot_id not in loaded])
+        snapshots.update(loaded)
+    return snapshots
+
+
+def get_availability(lot_id):
+    """
+    Availability snapshot of a lot: counters, space ids per status and the
+    serialized available spaces.
+
+    Served from the cache in one round trip while the snapshot's version is
+    current; otherwise rebuilt from the database. Raises
+    ``ParkingLot.DoesNotExist`` for unknown lots.
+    """
+    snapshot_key, version_key = SNAPSHOT_KEY.format(lot_id=lot_id), VERSION_KEY.format(lot_id=lot_id)
+    cached = cache.get_many([snapshot_key, version_key])
+    snapshot = cached.get(snapshot_key)
+    if snapshot is not None and snapshot['version'] == cached.get(version_key):
+        return snapshot
+    snapshot = rebuild([lot_id]).get(lot_id)
+    if snapshot is None:
+        raise ParkingLot.DoesNotExist(f"Parking lot {lot_id} does not exist")
+    return snapshot
+
+
+def occupancy(snapshot):
+    """Occupancy figures of a snapshot, shaped like the ``occupancy_rate`` action."""
+    total_spaces, available_spaces = snapshot['total_spaces'], snapshot['available_spaces']
+    return {
+        'occupancy_rate': occupancy_rate(total_spaces, available_spaces),
+        'total_spaces': total_spaces,
+        'available_spaces': available_spaces,
+        'occupied_spaces': total_spaces - available_spaces
+    }
+
+
+def refresh(lot_ids):
+    """Bump the lots' versions and write fresh snapshots through to the cache."""
+    versions = _bump(lot_ids)
+    rebuild(list(versions), versions)
+
+
+def _remove_spaces(snapshot, space_ids):
+    snapshot['space_ids'] = {
+        choice: [space_id for space_id in ids if space_id not in space_ids]
+        for choice, ids in snapshot['space_ids'].items()
+    }
+    snapshot['available'] = [space for space in snapshot['available'] if space['id'] not in space_ids]
+
+
+def _add_spaces(snapshot, spaces):
+    # Imported here for the same reason as in _load
+    from .serializers import ParkingSpaceSerializer
+
+    available = []
+    for space in spaces:
+        snapshot['space_ids'][space.status].append(space.id)
+        if space.status == ParkingSpace.Status.AVAILABLE:
+            available.append(space)
+    for ids in snapshot['space_ids'].values():
+        ids.sort()
+    if available:
+        snapshot['available'] = sorted(
+            [*snapshot['available'], *ParkingSpaceSerializer(available, many=True).data],
+            key=lambda space: space['id']
+        )
+
+
+def patch(lot_ids, space_ids=()):
+    """
+    Apply committed writes to the cached snapshots of ``lot_ids``.
+
+    Only the lots' counters and the rows of ``space_ids`` (inserted,
+    updated or deleted spaces) are read back; the spaces are moved between
+    the status sets of the current snapshot rather than reloading the lot.
+    The versions are read before those rows, and a patched snapshot is only
+    written when bumping the version lands exactly one above it, so a write
+    committed meanwhile is never lost. Lots without a current snapshot, or
+    that lose that race, are rebuilt from the database instead.
+    """
+    lot_ids, space_ids = set(lot_ids), set(space_ids)
+    snapshot_keys = {lot_id: SNAPSHOT_KEY.format(lot_id=lot_id) for lot_id in lot_ids}
+    version_keys = _version_keys(lot_ids)
+    cached = cache.get_many([*snapshot_keys.values(), *version_keys.values()])
+    snapshots = {
+        lot_id: cached[key] for lot_id, key in snapshot_keys.items()
+        if key in cached and cached[key]['version'] == cached.get(version_keys[lot_id])
+    }
+    stale = lot_ids - set(snapshots)
+    if snapshots:
+        counts = {
+            lot_id: (total_spaces, available_spaces)
+            for lot_id, total_spaces, available_spaces in ParkingLot.objects.filter(pk__in=snapshots).values_list(
+                'id', 'total_spaces', 'available_spaces'
+            )
+        }
+        spaces = defaultdict(list)
+        if space_ids:
+            for space in ParkingSpace.objects.filter(pk__in=space_ids, parking_lot_id__in=counts):
+                spaces[space.parking_lot_id].append(space)
+        for lot_id, snapshot in snapshots.items():
+            if lot_id not in counts:
+                cache.delete(snapshot_keys[lot_id])
+                continue
+            snapshot['total_spaces'], snapshot['available_spaces'] = counts[lot_id]
+            if space_ids:
+                _remove_spaces(snapshot, space_ids)
+                _add_spaces(snapshot, spaces[lot_id])
+            try:
+                version = cache.incr(version_keys[lot_id])
+            except ValueError:
+                version = None
+            if version != snapshot['version'] + 1:
+                stale.add(lot_id)
+                continue
+            snapshot['version'] = version
+            cache.set(snapshot_keys[lot_id], snapshot, settings.PARKING_LOT_AVAILABILITY_TIMEOUT)
+    if stale:
+        refresh(stale)
+
+
+def touch(lot_ids, space_ids=()):
+    """
+    Record a write to lots' counters and to the spaces ``space_ids``.
+
+    After commit the cached snapshots are patched with the committed rows
+    (see ``patch``); until then readers keep the last committed snapshot.
+    Every write that inserts, updates or deletes spaces must pass their ids.
+    """
+    lot_ids, space_ids = set(lot_ids), set(space_ids)
+    if not lot_ids:
+        return
+    transaction.on_commit(lambda: patch(lot_ids, space_ids), robust=True)
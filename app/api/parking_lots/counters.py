@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+from .models import ParkingLot, OccupancySample
+from .occupancy import occupancy_rate, record_sample
+from . import availability
+
+# Counter changes run as one statement that also returns the new counts
+ADJUST_SQL = f"""
+    UPDATE {ParkingLot._meta.db_table}
+    SET available_spaces = available_spaces + %s
+    WHERE id = %s AND available_spaces + %s BETWEEN 0 AND total_spaces
+    RETURNING total_spaces, available_spaces
+"""
+
+ADD_SQL = f"""
+    UPDATE {ParkingLot._meta.db_table}
+    SET total_spaces = total_spaces + %s, available_spaces = available_spaces + %s
+    WHERE id = %s
+    RETURNING total_spaces, available_spaces
+"""
+
+
+def adjust_available_spaces(parking_lot, delta):
+    """
+    Add ``delta`` to a lot's ``available_spaces`` in a single UPDATE.
+
+    The change is applied relative to the stored value and only when the
+    new count stays within ``0..total_spaces``; that condition is part of
+    the UPDATE's WHERE clause, so concurrent callers can neither lose
+    updates nor push the counter out of bounds. Only ``available_spaces``
+    is written. Returns ``True`` when the change was applied and refreshes
+    the counters on ``parking_lot`` from the UPDATE's RETURNING clause;
+    ``False`` leaves the row untouched.
+    """
+    if not delta:
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute(ADJUST_SQL, [delta, parking_lot.pk, delta])
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    _set_counts(parking_lot, row)
+    return True
+
+
+def add_spaces(parking_lot, total, available):
+    """
+    Grow a lot by ``total`` new spaces, ``available`` of them free, in one UPDATE.
+
+    Used after spaces are inserted in bulk; both counters move relative to
+    the stored values, so concurrent bookings are not overwritten.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(ADD_SQL, [total, available, parking_lot.pk])
+        _set_counts(parking_lot, cursor.fetchone())
+
+
+def _set_counts(parking_lot, counts):
+    parking_lot.total_spaces, parking_lot.available_spaces = counts
+    # Raw updates skip post_save, so sample here when change samples are
+    # enabled; either way the instance must not sample these counts again
+    # on its next save()
+    if settings.OCCUPANCY_SAMPLE_ON_CHANGE:
+        record_sample(parking_lot)
+    parking_lot._sampled_counts = tuple(counts)
+    availability.touch([parking_lot.pk])
+
+
+def take_space(parking_lot):
+    """Claim one space; ``False`` when the lot is already full."""
+    return adjust_available_spaces(parking_lot, -1)
+
+
+def release_space(parking_lot):
+    """Return one space; ``False`` when every space is already free."""
+    return adjust_available_spaces(parking_lot, 1)
+
+
+def release_spaces(counts):
+    """
+    Return spaces to many lots in one UPDATE; ``counts`` maps lot id to spaces.
+
+    Each counter is capped at ``total_spaces`` in SQL rather than rejected,
+    so a sweep that frees many spaces at once is always applied. Records one
+    occupancy sample per lot when change samples are enabled and returns
+    the number of lots updated.
+    """
+    counts = {lot_id: count for lot_id, count in counts.items() if count > 0}
+    if not counts:
+        return 0
+    increment = Case(
+        *[When(pk=lot_id, then=Value(count)) for lot_id, count in counts.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    updated = ParkingLot.objects.filter(pk__in=counts).update(
+        available_spaces=Least(F('available_spaces') + increment, F('total_spaces'))
+    )
+    availability.touch(counts)
+    if not settings.OCCUPANCY_SAMPLE_ON_CHANGE:
+        return updated
+    OccupancySample.objects.bulk_create([
+        OccupancySample(
+            parking_lot_id=lot_id,
+            bucket_start=timezone.now(),
+            average_occupancy=occupancy_rate(total_spaces, available_spaces),
+            peak_occupancy=occupancy_rate(total_spaces, available_spaces)
+        )
+        for lot_id, total_spaces, available_spaces in ParkingLot.objects.filter(pk__in=counts).values_list(
+            'id', 'total_spaces', 'available_spaces'
+        )
+    ])
+    return updated
@@ -0,0 +1,227 @@
+import heapq
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from .models import ParkingLot
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Bumped on every change to lot locations; each process rebuilds its tree
+# when the shared version moves on
+INDEX_VERSION_KEY = 'parking_lots:geo:version'
+
+# Rebuild at least this often (seconds), for caches not shared between
+# processes (locmem)
+INDEX_MAX_AGE = 300
+
+# Candidates checked against the database per query while looking for lots
+# that are active and have enough free spaces
+CANDIDATE_BATCH = 32
+
+_POINT, _NODE = 0, 1
+
+
+def to_xyz(latitude, longitude):
+    """Unit-sphere coordinates; chord length orders points like great-circle distance."""
+    lat, lng = math.radians(float(latitude)), math.radians(float(longitude))
+    return (math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometres."""
+    lat1, lng1, lat2, lng2 = map(math.radians, map(float, (lat1, lng1, lat2, lng2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _distance2(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+def _box_distance2(point, low, high):
+    return sum(
+        (low[axis] - point[axis]) ** 2 if point[axis] < low[axis]
+        else (point[axis] - high[axis]) ** 2 if point[axis] > high[axis]
+        else 0.0
+        for axis in range(3)
+    )
+
+
+class KDTree:
+    """
+    3-d tree over lot locations projected onto the unit sphere.
+
+    Every node keeps the bounding box of its subtree, so ``nearest`` can
+    walk the tree best-first and yield lots in increasing distance without
+    a fixed ``k``; callers stop as soon as they have enough matches.
+    """
+
+    def __init__(self, locations):
+        self.ids = []
+        self.points = []
+        for lot_id, latitude, longitude in locations:
+            self.ids.append(lot_id)
+            self.points.append(to_xyz(latitude, longitude))
+        # Per node: point index, left and right child (-1 when missing), box corners
+        self.nodes = []
+        self.root = self._build(list(range(len(self.points))), 0)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, indexes, depth):
+        if not indexes:
+            return -1
+        axis = depth % 3
+        indexes.sort(key=lambda index: self.points[index][axis])
+        middle = len(indexes) // 2
+        node = len(self.nodes)
+        self.nodes.append(None)
+        left = self._build(indexes[:middle], depth + 1)
+        right = self._build(indexes[middle + 1:], depth + 1)
+        # The subtree box is the node's point merged with its children's boxes
+        point = self.points[indexes[middle]]
+        corners = [(point, point)] + [self.nodes[child][3:] for child in (left, right) if child != -1]
+        low = tuple(min(corner[0][dim] for corner in corners) for dim in range(3))
+        high = tuple(max(corner[1][dim] for corner in corners) for dim in range(3))
+        self.nodes[node] = (indexes[middle], left, right, low, high)
+        return node
+
+    def nearest(self, latitude, longitude, max_km=None):
+        """Yield ``(lot_id, distance_km)`` nearest first, up to ``max_km`` away."""
+        if self.root == -1:
+            return
+        query = to_xyz(latitude, longitude)
+        limit = km_to_chord(max_km) ** 2 if max_km is not None else math.inf
+        heap = [(0.0, 0, _NODE, self.root)]
+        counter = 1
+        while heap:
+            distance2, _, kind, item = heapq.heappop(heap)
+            if distance2 > limit:
+                return
+            if kind == _POINT:
+                yield self.ids[item], chord_to_km(math.sqrt(distance2))
+                continue
+            point, left, right, _, _ = self.nodes[item]
+            heapq.heappush(heap, (_distance2(query, self.points[point]), counter, _POINT, point))
+            counter += 1
+            for child in (left, right):
+                if child != -1:
+                    _, _, _, low, high = self.nodes[child]
+                    heapq.heappush(heap, (_box_distance2(query, low, high), counter, _NODE, child))
+                    counter += 1
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """This process' tree of lot locations, rebuilt when lots have moved."""
+    global _index
+    version = cache.get(INDEX_VERSION_KEY, 0)
+    current = _index
+    if current and current[0] == version and time.monotonic() - current[1] < INDEX_MAX_AGE:
+        return current[2]
+    with _index_lock:
+        if _index is current:
+            tree = KDTree(ParkingLot.objects.order_by().values_list('id', 'latitude', 'longitude').iterator())
+            _index = (version, time.monotonic(), tree)
+        return _index[2]
+
+
+def invalidate():
+    """
+    Make every process rebuild its tree after a lot was added, moved or removed.
+
+    The version is bumped immediately and again after commit, so a process
+    cannot keep a tree built before the write became visible.
+    """
+    def bump():
+        cache.add(INDEX_VERSION_KEY, 0, None)
+        try:
+            cache.incr(INDEX_VERSION_KEY)
+        except ValueError:
+            cache.set(INDEX_VERSION_KEY, 1, None)
+    bump()
+    transaction.on_commit(bump)
+
+
+def _bookable(lot_ids, min_free):
+    return set(ParkingLot.objects.filter(
+        pk__in=lot_ids,
+        status=ParkingLot.Status.ACTIVE,
+        available_spaces__gte=min_free
+    ).values_list('pk', flat=True))
+
+
+def nearby_indexed(latitude, longitude, radius_km, k, min_free=0):
+    """Nearest bookable lots from the in-memory tree, as ``(lot_id, distance_km)``."""
+    candidates = get_index().nearest(latitude, longitude, radius_km)
+    found = []
+    while len(found) < k:
+        batch = [candidate for _, candidate in zip(range(max(CANDIDATE_BATCH, 2 * k)), candidates)]
+        if not batch:
+            break
+        bookable = _bookable([lot_id for lot_id, _ in batch], min_free)
+        found.extend(candidate for candidate in batch if candidate[0] in bookable)
+    return found[:k]
+
+
+def nearby_bbox(latitude, longitude, radius_km, k, min_free=0):
+    """
+    Nearest bookable lots without the tree: a bounding-box prefilter on the
+    ``(latitude, longitude)`` index, then exact distances in Python.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    angle = radius_km / EARTH_RADIUS_KM
+    delta_lat = math.degrees(angle)
+    if abs(latitude) + delta_lat >= 90 or angle >= math.pi / 2:
+        # The circle contains a pole: every longitude is in range
+        delta_lng = 180.0
+    else:
+        delta_lng = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+    west, east = longitude - delta_lng, longitude + delta_lng
+    if delta_lng >= 180.0:
+        longitudes = Q()
+    elif west < -180.0:
+        longitudes = Q(longitude__gte=west + 360) | Q(longitude__lte=east)
+    elif east > 180.0:
+        longitudes = Q(longitude__gte=west) | Q(longitude__lte=east - 360)
+    else:
+        longitudes = Q(longitude__range=(west, east))
+    rows = ParkingLot.objects.filter(
+        longitudes,
+        latitude__range=(latitude - delta_lat, latitude + delta_lat),
+        status=ParkingLot.Status.ACTIVE,
+        available_spaces__gte=min_free
+    ).values_list('id', 'latitude', 'longitude')
+    found = sorted(
+        (distance, lot_id)
+        for lot_id, lot_latitude, lot_longitude in rows
+        for distance in [haversine_km(latitude, longitude, lot_latitude, lot_longitude)]
+        if distance <= radius_km
+    )
+    return [(lot_id, distance) for distance, lot_id in found[:k]]
+
+
+def nearby(latitude, longitude, radius_km, k, min_free=0):
+    """
+    Up to ``k`` active lots with at least ``min_free`` available spaces
+    within ``radius_km`` of a point, nearest first, as ``(lot_id, distance_km)``.
+    """
+    if settings.PARKING_LOT_SPATIAL_INDEX:
+        return nearby_indexed(latitude, longitude, radius_km, k, min_free)
+    return nearby_bbox(latitude, longitude, radius_km, k, min_free)
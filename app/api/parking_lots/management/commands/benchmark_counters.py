@@ -0,0 +1,100 @@
+import random
+import threading
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from app.api.parking_lots.counters import release_space, take_space
+from app.api.parking_lots.models import ParkingLot
+
+
+class Command(BaseCommand):
+    help = 'Hammer one scratch parking lot from many threads and verify its availability counter stays exact'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=16,
+            help='Concurrent workers'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Counter changes per worker'
+        )
+        parser.add_argument(
+            '--spaces',
+            type=int,
+            default=10,
+            help='Total spaces of the scratch lot; keep it small so the bounds are hit'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed for the take/release mix'
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['iterations'] < 1 or options['spaces'] < 1:
+            raise CommandError('--threads, --iterations and --spaces must be positive.')
+
+        lot = ParkingLot.objects.create(
+            name='Counter benchmark',
+            address='-',
+            latitude=Decimal('0'),
+            longitude=Decimal('0'),
+            total_spaces=options['spaces'],
+            available_spaces=options['spaces'],
+            hourly_rate=Decimal('0')
+        )
+        rng = random.Random(options['seed'])
+        seeds = [rng.random() for _ in range(options['threads'])]
+        results = [None] * options['threads']
+        errors = []
+        start = threading.Barrier(options['threads'])
+
+        def worker(index):
+            local = random.Random(seeds[index])
+            handle = ParkingLot(pk=lot.pk)
+            taken = released = 0
+            try:
+                start.wait()
+                for _ in range(options['iterations']):
+                    if local.random() < 0.5:
+                        taken += take_space(handle)
+                    else:
+                        released += release_space(handle)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+            results[index] = (taken, released)
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['threads'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        try:
+            if errors:
+                raise CommandError(f'{len(errors)} workers failed: {errors[0]!r}')
+            taken = sum(result[0] for result in results)
+            released = sum(result[1] for result in results)
+            expected = options['spaces'] - taken + released
+            actual = ParkingLot.objects.values_list('available_spaces', flat=True).get(pk=lot.pk)
+            operations = options['threads'] * options['iterations']
+            self.stdout.write(
+                f'{operations} changes in {elapsed:.2f}s ({operations / elapsed:.0f}/s): '
+                f'{taken} taken, {released} released, {operations - taken - released} rejected at a bound'
+            )
+            if actual != expected or not 0 <= actual <= options['spaces']:
+                raise CommandError(f'Counter drifted: expected {expected} available spaces, found {actual}')
+            self.stdout.write(self.style.SUCCESS(f'Counter exact: {actual} of {options["spaces"]} spaces available'))
+        finally:
+            lot.delete()
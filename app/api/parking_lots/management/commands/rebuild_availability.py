@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from app.api.parking_lots.availability import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached availability of parking lots from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'lot_ids',
+            nargs='*',
+            type=int,
+            help='Lots to rebuild (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        snapshots = rebuild(options['lot_ids'] or None)
+        self.stdout.write(f'Rebuilt availability of {len(snapshots)} lots')
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from app.api.parking_lots.occupancy import downsample, record_samples
+
+
+class Command(BaseCommand):
+    help = 'Sample every parking lot occupancy at a fixed interval and downsample old samples'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between samples'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Take a single sample and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['interval'] < 1:
+            raise CommandError('--interval must be positive.')
+
+        while True:
+            started = time.monotonic()
+            sampled = len(record_samples())
+            folded = downsample()
+            self.stdout.write(f'Sampled {sampled} lots, wrote {folded} downsampled buckets')
+            if options['once']:
+                break
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
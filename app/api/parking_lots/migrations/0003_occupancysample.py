@@ -0,0 +1,80 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0002_parkinglot_owner"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OccupancySample",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "resolution",
+                    models.CharField(
+                        choices=[("raw", "Raw"), ("5m", "5 minutes"), ("1h", "1 hour")],
+                        default="raw",
+                        max_length=3,
+                        verbose_name="resolution",
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField(verbose_name="bucket start")),
+                (
+                    "average_occupancy",
+                    models.FloatField(verbose_name="average occupancy rate"),
+                ),
+                (
+                    "peak_occupancy",
+                    models.FloatField(verbose_name="peak occupancy rate"),
+                ),
+                (
+                    "sample_count",
+                    models.PositiveIntegerField(default=1, verbose_name="sample count"),
+                ),
+                (
+                    "parking_lot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occupancy_samples",
+                        to="parking_lots.parkinglot",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "occupancy sample",
+                "verbose_name_plural": "occupancy samples",
+                "ordering": ["bucket_start"],
+                "indexes": [
+                    models.Index(
+                        fields=["bucket_start", "parking_lot"],
+                        name="occupancy_time_lot_idx",
+                    ),
+                    models.Index(
+                        fields=["parking_lot", "resolution", "bucket_start"],
+                        name="occupancy_lot_res_time_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="occupancysample",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("resolution", "raw"), _negated=True),
+                fields=("parking_lot", "resolution", "bucket_start"),
+                name="unique_occupancy_bucket",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0003_occupancysample"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="parkingspace",
+            name="distance_to_entrance",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Walking distance from the lot entrance in metres, used for space placement.",
+                null=True,
+                verbose_name="distance to entrance",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="parkingspace",
+            index=models.Index(
+                fields=["parking_lot", "status"], name="parking_space_lot_status_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:10
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0004_parkingspace_distance_to_entrance"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="parkinglot",
+            name="occupancy",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Case(
+                    models.When(then=models.Value(0.0), total_spaces=0),
+                    default=django.db.models.expressions.CombinedExpression(
+                        django.db.models.expressions.CombinedExpression(
+                            django.db.models.functions.comparison.Cast(
+                                django.db.models.expressions.CombinedExpression(
+                                    models.F("total_spaces"),
+                                    "-",
+                                    models.F("available_spaces"),
+                                ),
+                                models.FloatField(),
+                            ),
+                            "*",
+                            models.Value(100.0),
+                        ),
+                        "/",
+                        models.F("total_spaces"),
+                    ),
+                    output_field=models.FloatField(),
+                ),
+                output_field=models.FloatField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="parkinglot",
+            index=models.Index(fields=["occupancy"], name="parking_lot_occupancy_idx"),
+        ),
+    ]
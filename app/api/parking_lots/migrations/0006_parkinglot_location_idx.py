@@ -0,0 +1,20 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0005_parkinglot_occupancy"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="parkinglot",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="parking_lot_location_idx"
+            ),
+        ),
+    ]
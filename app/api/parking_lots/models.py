@@ -1,9 +1,45 @@
 from django.db import models
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+def occupancy_expression():
+    """SQL expression mirroring ``ParkingLot.occupancy_rate`` (percentage of spaces taken)."""
+    return Case(
+        When(total_spaces=0, then=Value(0.0)),
+        default=Cast(F('total_spaces') - F('available_spaces'), FloatField()) * Value(100.0) / F('total_spaces'),
+        output_field=FloatField()
+    )
+
+def space_count_field(status):
+    """Name of the ``with_space_counts`` annotation for ``status``."""
+    return f'{status}_space_count'
+
+class ParkingLotQuerySet(models.QuerySet):
+    """QuerySet with per-status space counts computed in the database."""
+    
+    def with_space_counts(self):
+        """
+        Annotate the number of spaces in each status.
+        
+        Each count is a correlated subquery answered from the
+        ``(parking_lot, status)`` index, so only the lots actually returned
+        (e.g. one page) are counted and no space rows are loaded.
+        """
+        return self.annotate(**{
+            space_count_field(status): Coalesce(
+                Subquery(
+                    ParkingSpace.objects.filter(parking_lot=OuterRef('pk'), status=status)
+                    .order_by().values('parking_lot').annotate(count=Count('pk')).values('count')
+                ),
+                0
+            )
+            for status in ParkingSpace.Status.values
+        })
+
 class ParkingLot(models.Model):
     """Model for parking lots."""
     
@@ -32,12 +68,27 @@ class ParkingLot(models.Model):
         null=True,
         blank=True
     )
+    # Occupancy percentage kept by the database so listings can filter, sort
+    # and index on it; ``occupancy_rate`` still reads the in-memory counters
+    occupancy = models.GeneratedField(
+        expression=occupancy_expression(),
+        output_field=models.FloatField(),
+        db_persist=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ParkingLotQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('parking lot')
         verbose_name_plural = _('parking lots')
+        indexes = [
+            # Occupancy filters and sorting of lot listings
+            models.Index(fields=['occupancy'], name='parking_lot_occupancy_idx'),
+            # Bounding-box prefilter of nearby searches
+            models.Index(fields=['latitude', 'longitude'], name='parking_lot_location_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -77,6 +128,12 @@ class ParkingSpace(models.Model):
         blank=True,
         related_name='occupied_spaces'
     )
+    distance_to_entrance = models.PositiveIntegerField(
+        _('distance to entrance'),
+        null=True,
+        blank=True,
+        help_text=_('Walking distance from the lot entrance in metres, used for space placement.')
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -84,6 +141,60 @@ class ParkingSpace(models.Model):
         verbose_name = _('parking space')
         verbose_name_plural = _('parking spaces')
         unique_together = ('parking_lot', 'space_number')
+        indexes = [
+            # Free-space lookups within a lot
+            models.Index(fields=['parking_lot', 'status'], name='parking_space_lot_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.parking_lot.name} - Space {self.space_number}"
+
+class OccupancySample(models.Model):
+    """
+    Append-only occupancy time series for a parking lot.
+
+    Raw samples are taken on every change and at a fixed interval, then
+    downsampled into 5-minute and hourly buckets as they age (see
+    ``occupancy.py``). Each row covers ``bucket_start`` onwards at its
+    ``resolution``; rates are percentages.
+    """
+    
+    class Resolution(models.TextChoices):
+        RAW = 'raw', _('Raw')
+        FIVE_MINUTES = '5m', _('5 minutes')
+        HOUR = '1h', _('1 hour')
+    
+    parking_lot = models.ForeignKey(
+        ParkingLot,
+        on_delete=models.CASCADE,
+        related_name='occupancy_samples'
+    )
+    resolution = models.CharField(
+        _('resolution'),
+        max_length=3,
+        choices=Resolution.choices,
+        default=Resolution.RAW
+    )
+    bucket_start = models.DateTimeField(_('bucket start'))
+    average_occupancy = models.FloatField(_('average occupancy rate'))
+    peak_occupancy = models.FloatField(_('peak occupancy rate'))
+    sample_count = models.PositiveIntegerField(_('sample count'), default=1)
+    
+    class Meta:
+        verbose_name = _('occupancy sample')
+        verbose_name_plural = _('occupancy samples')
+        ordering = ['bucket_start']
+        indexes = [
+            models.Index(fields=['bucket_start', 'parking_lot'], name='occupancy_time_lot_idx'),
+            models.Index(fields=['parking_lot', 'resolution', 'bucket_start'], name='occupancy_lot_res_time_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['parking_lot', 'resolution', 'bucket_start'],
+                condition=~models.Q(resolution='raw'),
+                name='unique_occupancy_bucket'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.parking_lot_id} - {self.bucket_start} ({self.resolution})"
@@ -0,0 +1,228 @@
+import math
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db import connection, transaction
+from django.db.models import F, Func, Min, Q, Value, DateTimeField, ExpressionWrapper, Window
+from django.db.models.functions import Extract, Floor, Lead, TruncDate, TruncDay
+from django.utils import timezone
+from .models import OccupancySample, ParkingLot
+
+Resolution = OccupancySample.Resolution
+
+# (source, target, target bucket size, how long the source is kept)
+DOWNSAMPLING = [
+    (Resolution.RAW, Resolution.FIVE_MINUTES, timedelta(minutes=5), timedelta(days=1)),
+    (Resolution.FIVE_MINUTES, Resolution.HOUR, timedelta(hours=1), timedelta(days=7)),
+]
+
+
+def occupancy_rate(total_spaces, available_spaces):
+    """Occupancy percentage for a lot with the given space counts."""
+    return ((total_spaces - available_spaces) / total_spaces * 100) if total_spaces > 0 else 0
+
+
+def record_sample(parking_lot, at=None):
+    """Append a raw sample with the lot's current occupancy."""
+    rate = occupancy_rate(parking_lot.total_spaces, parking_lot.available_spaces)
+    return OccupancySample.objects.create(
+        parking_lot_id=parking_lot.pk,
+        bucket_start=at or timezone.now(),
+        average_occupancy=rate,
+        peak_occupancy=rate
+    )
+
+
+def record_samples(at=None):
+    """Append a raw sample for every parking lot in one insert."""
+    at = at or timezone.now()
+    samples = []
+    for lot_id, total_spaces, available_spaces in ParkingLot.objects.values_list(
+        'id', 'total_spaces', 'available_spaces'
+    ):
+        rate = occupancy_rate(total_spaces, available_spaces)
+        samples.append(OccupancySample(
+            parking_lot_id=lot_id,
+            bucket_start=at,
+            average_occupancy=rate,
+            peak_occupancy=rate
+        ))
+    return OccupancySample.objects.bulk_create(samples, batch_size=1000)
+
+
+def align(moment, size):
+    """Round ``moment`` down to a multiple of ``size`` since the epoch."""
+    seconds = int(size.total_seconds())
+    return datetime.fromtimestamp(math.floor(moment.timestamp() / seconds) * seconds, tz=dt_timezone.utc)
+
+
+def bucket_expression(size):
+    """SQL expression rounding ``bucket_start`` down to a multiple of ``size``."""
+    seconds = int(size.total_seconds())
+    epoch = Extract('bucket_start', 'epoch', tzinfo=dt_timezone.utc)
+    return Func(
+        Floor(epoch / Value(seconds)) * Value(seconds),
+        function='to_timestamp',
+        output_field=DateTimeField()
+    )
+
+
+# Each sample holds until the next sample of its lot, capped at ``until``;
+# averages are weighted by those durations rather than by sample counts
+WEIGHTED_SQL = """
+    SELECT {columns}
+        SUM(average_occupancy * seconds), SUM(seconds),
+        SUM(average_occupancy * sample_count), SUM(sample_count),
+        MAX(peak_occupancy)
+    FROM (
+        SELECT *, GREATEST(EXTRACT(EPOCH FROM LEAST(COALESCE(next_start, until), until) - bucket_start)::float, 0) AS seconds
+        FROM ({samples}) AS samples
+    ) AS timed
+    {group_by}
+"""
+
+
+def time_weighted(samples, until, group=()):
+    """
+    Time-weighted occupancy of ``samples``, grouped by the ``group`` columns.
+
+    ``until`` is an expression for the moment the last sample of each lot
+    stops counting. Returns ``(*group, average, peak, sample_count)`` rows;
+    the average falls back to weighting by samples when no time elapsed.
+    """
+    samples = samples.order_by().annotate(
+        next_start=Window(Lead('bucket_start'), partition_by=[F('parking_lot_id')], order_by=F('bucket_start').asc()),
+        until=until
+    ).values(*group, 'bucket_start', 'average_occupancy', 'peak_occupancy', 'sample_count', 'next_start', 'until')
+    sql, params = samples.query.sql_with_params()
+    columns = ', '.join(group)
+    with connection.cursor() as cursor:
+        cursor.execute(WEIGHTED_SQL.format(
+            columns=f'{columns},' if group else '',
+            samples=sql,
+            group_by=f'GROUP BY {columns}' if group else ''
+        ), params)
+        return [
+            (*keys, weighted / seconds if seconds else counted / count, peak, count)
+            for *keys, weighted, seconds, counted, count, peak in cursor.fetchall()
+            if count
+        ]
+
+
+def downsample(now=None):
+    """
+    Fold aged samples into coarser buckets.
+
+    Raw samples older than a day become 5-minute buckets and 5-minute
+    buckets older than a week become hourly ones. A bucket's average
+    weights each folded sample by how long it held within the bucket.
+    Each step is a single grouped query plus a delete and a bulk insert,
+    and only touches whole buckets, so it is safe to run repeatedly.
+    Returns the number of rows written.
+    """
+    now = now or timezone.now()
+    written = 0
+    for source, target, size, retention in DOWNSAMPLING:
+        cutoff = align(now - retention, size)
+        with transaction.atomic():
+            earliest = OccupancySample.objects.filter(
+                resolution=source,
+                bucket_start__lt=cutoff
+            ).aggregate(earliest=Min('bucket_start'))['earliest']
+            if earliest is None:
+                continue
+            # Existing target buckets in the window are merged, not duplicated
+            folded = OccupancySample.objects.filter(
+                Q(resolution=source) | Q(resolution=target),
+                bucket_start__gte=align(earliest, size),
+                bucket_start__lt=cutoff
+            )
+            bucket_end = ExpressionWrapper(bucket_expression(size) + Value(size), output_field=DateTimeField())
+            rows = time_weighted(
+                folded.annotate(bucket=bucket_expression(size)),
+                bucket_end,
+                group=('parking_lot_id', 'bucket')
+            )
+            folded.delete()
+            OccupancySample.objects.bulk_create([
+                OccupancySample(
+                    parking_lot_id=lot_id,
+                    resolution=target,
+                    bucket_start=bucket,
+                    average_occupancy=average,
+                    peak_occupancy=peak,
+                    sample_count=count
+                )
+                for lot_id, bucket, average, peak, count in rows
+            ], batch_size=1000)
+            written += len(rows)
+    return written
+
+
+def day_bounds(date):
+    """Start and end of ``date`` in the current time zone."""
+    start = timezone.make_aware(datetime.combine(date, time.min))
+    return start, timezone.make_aware(datetime.combine(date + timedelta(days=1), time.min))
+
+
+def occupancy_samples(start, end, lot_ids=None):
+    """Samples of any resolution starting within ``start``..``end``."""
+    samples = OccupancySample.objects.filter(bucket_start__gte=start, bucket_start__lt=end)
+    if lot_ids is not None:
+        samples = samples.filter(parking_lot_id__in=lot_ids)
+    return samples
+
+
+def _until(end):
+    # The latest sample of a range holds until its end, or until now for
+    # ranges that have not finished yet
+    return Value(min(end, timezone.now()), output_field=DateTimeField())
+
+
+def occupancy_totals(start, end, lot_ids=None):
+    """
+    Time-weighted average and peak occupancy over all lots, or ``None``
+    when no samples exist in the range.
+
+    Each sample counts for as long as it held, so a burst of changes does
+    not outweigh a long quiet period. Time before a lot's first sample in
+    the range is not counted.
+    """
+    rows = time_weighted(occupancy_samples(start, end, lot_ids), _until(end))
+    if not rows:
+        return None
+    average, peak, _ = rows[0]
+    return {'average': average, 'peak': peak}
+
+
+def occupancy_by_day(dates, lot_ids=None):
+    """
+    ``{date: {'average', 'peak'}}`` over all lots for those of ``dates``
+    with samples, time-weighted within each day in one grouped query.
+    """
+    dates = sorted(dates)
+    if not dates:
+        return {}
+    samples = occupancy_samples(day_bounds(dates[0])[0], day_bounds(dates[-1])[1], lot_ids).annotate(
+        day=TruncDate('bucket_start')
+    ).filter(day__in=dates)
+    # TruncDay is a local wall-clock timestamp; timezone() turns the next
+    # midnight back into an instant so it compares with bucket_start
+    day_end = Func(
+        Value(timezone.get_current_timezone_name()),
+        TruncDay('bucket_start') + Value(timedelta(days=1)),
+        function='timezone',
+        output_field=DateTimeField()
+    )
+    return {
+        day: {'average': average, 'peak': peak}
+        for day, average, peak, _ in time_weighted(samples, day_end, group=('day',))
+    }
+
+
+def occupancy_by_lot(start, end, lot_ids=None):
+    """``{parking_lot_id: {'average', 'peak'}}`` for lots with samples in the range, time-weighted."""
+    return {
+        lot_id: {'average': average, 'peak': peak}
+        for lot_id, average, peak, _ in time_weighted(
+            occupancy_samples(start, end, lot_ids), _until(end), group=('parking_lot_id',)
+        )
+    }
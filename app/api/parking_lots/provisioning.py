@@ -0,0 +1,66 @@
+from django.db import transaction
+from .counters import add_spaces
+from . import availability
+from .models import ParkingLot, ParkingSpace
+
+# Spaces per INSERT; a 2,000-space garage takes two statements
+SPACE_BATCH_SIZE = 1000
+
+# Largest number of spaces one layout may provision
+MAX_LAYOUT_SPACES = 10000
+
+# Default numbering: "001", "002", ...
+DEFAULT_WIDTH = 3
+
+
+def space_numbers(count, prefix='', start=1, width=DEFAULT_WIDTH):
+    """``count`` space numbers from ``start``, zero padded to ``width`` ("L2-001")."""
+    return [f"{prefix}{number:0{width}d}" for number in range(start, start + count)]
+
+
+def layout_numbers(layout):
+    """
+    Space numbers of a layout, in order.
+
+    A layout is a list of sections, e.g. one per level or zone, each with a
+    ``count`` and optional ``prefix``, ``start`` and ``width``.
+    """
+    numbers = []
+    for section in layout:
+        numbers.extend(space_numbers(**section))
+    return numbers
+
+
+def create_spaces(parking_lot, numbers, status=ParkingSpace.Status.AVAILABLE, batch_size=SPACE_BATCH_SIZE):
+    """Insert spaces with the given numbers in batches; lot counters are left alone."""
+    spaces = ParkingSpace.objects.bulk_create(
+        [
+            ParkingSpace(parking_lot=parking_lot, space_number=number, status=status)
+            for number in numbers
+        ],
+        batch_size=batch_size
+    )
+    availability.touch([parking_lot.pk], [space.pk for space in spaces])
+    return spaces
+
+
+def import_spaces(parking_lot, layout):
+    """
+    Add the spaces of ``layout`` to an existing lot and grow its counters.
+
+    Numbers already used in the lot are rejected with ``ValueError`` before
+    anything is written. Returns the created spaces.
+    """
+    numbers = layout_numbers(layout)
+    with transaction.atomic():
+        # Serialize imports into the same lot so the duplicate check holds
+        ParkingLot.objects.select_for_update().values_list('pk', flat=True).get(pk=parking_lot.pk)
+        taken = sorted(ParkingSpace.objects.filter(
+            parking_lot=parking_lot,
+            space_number__in=numbers
+        ).values_list('space_number', flat=True))
+        if taken:
+            raise ValueError(f"Space numbers already exist in this parking lot: {', '.join(taken[:10])}")
+        spaces = create_spaces(parking_lot, numbers)
+        add_spaces(parking_lot, len(spaces), len(spaces))
+    return spaces
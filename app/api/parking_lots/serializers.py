@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import ParkingLot, ParkingSpace
+from django.db import transaction
+from .models import ParkingLot, ParkingSpace, OccupancySample, space_count_field
+from .provisioning import MAX_LAYOUT_SPACES, DEFAULT_WIDTH, create_spaces, layout_numbers, space_numbers
 from app.api.realtime.utils import send_notification_to_all
 
 class ParkingSpaceSerializer(serializers.ModelSerializer):
@@ -7,9 +9,17 @@ class ParkingSpaceSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ParkingSpace
-        fields = ('id', 'parking_lot', 'space_number', 'status', 'current_user', 'created_at', 'updated_at')
+        fields = ('id', 'parking_lot', 'space_number', 'status', 'current_user', 'distance_to_entrance', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+class OccupancySampleSerializer(serializers.ModelSerializer):
+    """Serializer for occupancy time series samples."""
+    
+    class Meta:
+        model = OccupancySample
+        fields = ('bucket_start', 'resolution', 'average_occupancy', 'peak_occupancy', 'sample_count')
+        read_only_fields = fields
+
 class ParkingLotSerializer(serializers.ModelSerializer):
     """Serializer for parking lots."""
     
@@ -33,25 +43,95 @@ class ParkingLotSerializer(serializers.ModelSerializer):
                 )
         return attrs
 
+class ParkingLotSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact serializer for parking lot listings.
+    
+    Instead of nesting every space it reports how many spaces are in each
+    status, read from the ``with_space_counts`` annotations.
+    """
+    
+    occupancy_rate = serializers.FloatField(read_only=True)
+    space_counts = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ParkingLot
+        fields = ('id', 'name', 'address', 'latitude', 'longitude',
+                 'total_spaces', 'available_spaces', 'status',
+                 'hourly_rate', 'space_counts', 'occupancy_rate',
+                 'created_at', 'updated_at')
+        read_only_fields = fields
+    
+    def get_space_counts(self, obj):
+        return {
+            status: getattr(obj, space_count_field(status))
+            for status in ParkingSpace.Status.values
+        }
+
+class SpaceSectionSerializer(serializers.Serializer):
+    """One section of a space layout, e.g. a level or zone: "L2-001" .. "L2-150"."""
+    
+    prefix = serializers.CharField(max_length=8, required=False, allow_blank=True, default='')
+    count = serializers.IntegerField(min_value=1, max_value=MAX_LAYOUT_SPACES)
+    start = serializers.IntegerField(min_value=0, required=False, default=1)
+    width = serializers.IntegerField(min_value=1, max_value=6, required=False, default=DEFAULT_WIDTH)
+    
+    def validate(self, attrs):
+        """Validate that the longest number fits ``space_number``."""
+        longest = len(attrs['prefix']) + max(attrs['width'], len(str(attrs['start'] + attrs['count'] - 1)))
+        if longest > ParkingSpace._meta.get_field('space_number').max_length:
+            raise serializers.ValidationError("Space numbers of this section are too long.")
+        return attrs
+
+def check_layout(layout):
+    """Validate a whole layout: size limit and no number used twice."""
+    numbers = layout_numbers(layout)
+    if len(numbers) > MAX_LAYOUT_SPACES:
+        raise serializers.ValidationError(f"A layout can provision at most {MAX_LAYOUT_SPACES} spaces.")
+    if len(set(numbers)) != len(numbers):
+        raise serializers.ValidationError("Sections of a layout must not repeat space numbers.")
+    return layout
+
+class SpaceLayoutSerializer(serializers.Serializer):
+    """Serializer for importing spaces into an existing lot."""
+    
+    layout = SpaceSectionSerializer(many=True, allow_empty=False)
+    
+    def validate_layout(self, value):
+        return check_layout(value)
+
 class ParkingLotCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating parking lots."""
     
+    layout = SpaceSectionSerializer(many=True, allow_empty=False, required=False, write_only=True)
+    
     class Meta:
         model = ParkingLot
         fields = ('name', 'address', 'latitude', 'longitude',
                  'total_spaces', 'available_spaces', 'status',
-                 'hourly_rate')
+                 'hourly_rate', 'layout')
+    
+    def validate_layout(self, value):
+        return check_layout(value)
+    
+    def validate(self, attrs):
+        """Validate that a layout provides exactly ``total_spaces`` spaces."""
+        layout = attrs.get('layout')
+        if layout and sum(section['count'] for section in layout) != attrs.get('total_spaces'):
+            raise serializers.ValidationError(
+                "The layout must provide exactly total_spaces spaces."
+            )
+        return attrs
     
     def create(self, validated_data):
         """Create a new parking lot and its spaces."""
-        parking_lot = ParkingLot.objects.create(**validated_data)
-        
-        # Create parking spaces
-        for i in range(1, parking_lot.total_spaces + 1):
-            ParkingSpace.objects.create(
-                parking_lot=parking_lot,
-                space_number=str(i).zfill(3)
-            )
+        layout = validated_data.pop('layout', None)
+        with transaction.atomic():
+            parking_lot = ParkingLot.objects.create(**validated_data)
+            
+            # Create parking spaces in batched INSERTs
+            numbers = layout_numbers(layout) if layout else space_numbers(parking_lot.total_spaces)
+            create_spaces(parking_lot, numbers)
         
         # Send notification to all users about the new parking lot
         send_notification_to_all({
@@ -93,12 +173,11 @@ class ParkingLotUpdateSerializer(serializers.ModelSerializer):
             current_spaces = instance.spaces.count()
             
             if new_total_spaces > old_total_spaces:
-                # Add new spaces
-                for i in range(current_spaces + 1, new_total_spaces + 1):
-                    ParkingSpace.objects.create(
-                        parking_lot=instance,
-                        space_number=str(i).zfill(3)
-                    )
+                # Add new spaces in batched INSERTs
+                create_spaces(instance, space_numbers(
+                    new_total_spaces - current_spaces,
+                    start=current_spaces + 1
+                ))
             else:
                 # Remove excess spaces
                 instance.spaces.filter(
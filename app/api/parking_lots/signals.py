@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .models import ParkingLot, ParkingSpace
+from .occupancy import record_sample
+from . import availability, geo
+
+
+@receiver(post_init, sender=ParkingLot)
+def remember_space_counts(sender, instance, **kwargs):
+    """Keep the loaded space counts so saves only sample real changes."""
+    instance._sampled_counts = (
+        instance.__dict__.get('total_spaces'),
+        instance.__dict__.get('available_spaces')
+    )
+
+
+@receiver(post_save, sender=ParkingLot)
+def sample_occupancy_on_change(sender, instance, created, **kwargs):
+    """Record an occupancy sample whenever a lot's space counts change, if enabled."""
+    counts = (instance.total_spaces, instance.available_spaces)
+    changed = created or counts != getattr(instance, '_sampled_counts', None)
+    if changed and settings.OCCUPANCY_SAMPLE_ON_CHANGE:
+        record_sample(instance)
+    instance._sampled_counts = counts
+
+
+@receiver(post_init, sender=ParkingLot)
+def remember_location(sender, instance, **kwargs):
+    """Keep the loaded coordinates so only moves rebuild the spatial index."""
+    instance._loaded_location = (
+        instance.__dict__.get('latitude'),
+        instance.__dict__.get('longitude')
+    )
+
+
+@receiver(post_save, sender=ParkingLot)
+def invalidate_spatial_index(sender, instance, created, **kwargs):
+    """Rebuild the nearby-lot index when a lot is added or moved."""
+    location = (instance.latitude, instance.longitude)
+    if created or location != getattr(instance, '_loaded_location', None):
+        geo.invalidate()
+    instance._loaded_location = location
+
+
+@receiver(post_delete, sender=ParkingLot)
+def invalidate_spatial_index_on_delete(sender, instance, **kwargs):
+    geo.invalidate()
+
+
+@receiver(post_save, sender=ParkingLot)
+@receiver(post_delete, sender=ParkingLot)
+def refresh_lot_availability(sender, instance, **kwargs):
+    """Refresh the cached availability of a lot that was saved or deleted."""
+    availability.touch([instance.pk])
+
+
+@receiver(post_save, sender=ParkingSpace)
+@receiver(post_delete, sender=ParkingSpace)
+def refresh_space_availability(sender, instance, **kwargs):
+    """Refresh the cached availability of the lot a space was saved into or deleted from."""
+    availability.touch([instance.parking_lot_id], [instance.pk])
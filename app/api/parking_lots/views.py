@@ -1,24 +1,63 @@
+from django.http import Http404
 from django.shortcuts import render
 from rest_framework import  permissions, status,generics, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
 from .models import ParkingLot, ParkingSpace
-from .serializers import ParkingLotSerializer, ParkingLotCreateSerializer, ParkingLotUpdateSerializer, ParkingSpaceSerializer
-from rest_framework.pagination import PageNumberPagination
+from .serializers import ParkingLotSerializer, ParkingLotSummarySerializer, ParkingLotCreateSerializer, SpaceLayoutSerializer, ParkingLotUpdateSerializer, ParkingSpaceSerializer, OccupancySampleSerializer
+from .counters import release_space, take_space
+from .occupancy import occupancy_samples, occupancy_totals
+from . import availability, geo
+from .provisioning import import_spaces
+from app.api.reservations import intervals
+from app.utils.pagination import StandardResultsSetPagination
+from django.db import transaction
 from django.db.models import Q
 from decimal import Decimal
 
-class StandardResultsSetPagination(PageNumberPagination):
-    """Custom pagination class for consistent page sizes."""
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+def parse_moment(value):
+    """Parse an ISO 8601 date time query parameter into an aware datetime."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(value)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+def free_window_params(request):
+    """Read the free window search parameters from the query string."""
+    count = int(request.query_params.get('count', 5))
+    min_minutes = int(request.query_params.get('min_minutes', 30))
+    if not 1 <= count <= 50 or min_minutes < 0:
+        raise ValueError('count must be 1-50 and min_minutes non-negative')
+    return {
+        'after': parse_moment(request.query_params.get('start')) or timezone.now(),
+        'until': parse_moment(request.query_params.get('until')),
+        'count': count,
+        'min_duration': timedelta(minutes=min_minutes),
+    }
+
+def nearby_params(request):
+    """Read the nearby search parameters from the query string."""
+    latitude = float(request.query_params['lat'])
+    longitude = float(request.query_params['lng'])
+    radius = float(request.query_params.get('radius', 5))
+    k = int(request.query_params.get('k', 10))
+    min_free = int(request.query_params.get('min_free', 0))
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= 100 and 1 <= k <= 100 and min_free >= 0):
+        raise ValueError('out of range')
+    return {'latitude': latitude, 'longitude': longitude, 'radius_km': radius, 'k': k, 'min_free': min_free}
+
+def format_windows(windows):
+    return [{'start': start, 'end': end} for start, end in windows]
 
 class ParkingLotListView(generics.ListAPIView):
     """View for listing all parking lots."""
     
-    queryset = ParkingLot.objects.all()
+    queryset = ParkingLot.objects.prefetch_related('spaces')
     serializer_class = ParkingLotSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -37,21 +76,39 @@ class ParkingLotViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     
+    # Actions that return many lots; they use the space summary unless the
+    # full space lists are asked for with ?expand=true
+    LIST_ACTIONS = {'list', 'search', 'active', 'with_available_spaces'}
+    EXPAND_VALUES = {'1', 'true', 'yes'}
+    
+    def expand(self):
+        """Whether the client asked for the full nested space lists."""
+        return self.request.query_params.get('expand', '').lower() in self.EXPAND_VALUES
+    
+    def summarize(self):
+        return self.action in self.LIST_ACTIONS and not self.expand()
+    
     def get_serializer_class(self):
-        if self.action == 'create':
+        if self.summarize():
+            return ParkingLotSummarySerializer
+        elif self.action == 'create':
             return ParkingLotCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return ParkingLotUpdateSerializer
         return ParkingLotSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'available_spaces', 'occupancy_rate', 'search']:
+        if self.action in ['list', 'retrieve', 'available_spaces', 'occupancy_rate', 'search', 'free_windows', 'nearby']:
             return [permissions.IsAuthenticated()]
         return [permissions.IsAdminUser()]
     
     def get_queryset(self):
         """Filter parking lots based on query parameters."""
         queryset = ParkingLot.objects.all()
+        if self.summarize():
+            queryset = queryset.with_space_counts()
+        elif self.action in self.LIST_ACTIONS or self.action == 'retrieve':
+            queryset = queryset.prefetch_related('spaces')
         
         # Filter by status if provided
         status = self.request.query_params.get('status')
@@ -90,7 +147,7 @@ class ParkingLotViewSet(viewsets.ModelViewSet):
         if max_occupancy:
             try:
                 max_occupancy = float(max_occupancy)
-                queryset = [lot for lot in queryset if lot.occupancy_rate <= max_occupancy]
+                queryset = queryset.filter(occupancy__lte=max_occupancy)
             except ValueError:
                 pass
                 
@@ -111,33 +168,106 @@ class ParkingLotViewSet(viewsets.ModelViewSet):
                 'created_at', '-created_at',
                 'available_spaces', '-available_spaces',
                 'hourly_rate', '-hourly_rate',
-                'status', '-status'
+                'status', '-status',
+                'occupancy_rate', '-occupancy_rate'
             }
             if sort_by in allowed_sort_fields:
-                queryset = queryset.order_by(sort_by)
+                # occupancy_rate is served by the stored occupancy column
+                queryset = queryset.order_by(sort_by.replace('occupancy_rate', 'occupancy'))
         
         return queryset
     
+    def cached_availability(self):
+        """
+        The lot's cached availability snapshot.
+        
+        The lot is not loaded; both actions using this only require an
+        authenticated user, so a cache hit needs no query at all.
+        """
+        try:
+            return availability.get_availability(int(self.kwargs['pk']))
+        except (ValueError, ParkingLot.DoesNotExist):
+            raise Http404
+    
     @action(detail=True, methods=['get'])
     def available_spaces(self, request, pk=None):
         """Get available spaces in a parking lot."""
+        return Response(self.cached_availability()['available'])
+    
+    @action(detail=True, methods=['post'], url_path='import-spaces')
+    def import_spaces(self, request, pk=None):
+        """
+        Add spaces to a parking lot from a layout (admin only).
+        
+        The layout is a list of sections, e.g. one per level or zone:
+        ``{"layout": [{"prefix": "L1-", "count": 200}, {"prefix": "L2-", "count": 180}]}``.
+        Spaces are inserted in batches and the lot's counters grow accordingly.
+        """
         parking_lot = self.get_object()
-        available_spaces = parking_lot.spaces.filter(
-            status=ParkingSpace.Status.AVAILABLE
-        )
-        serializer = ParkingSpaceSerializer(available_spaces, many=True)
-        return Response(serializer.data)
+        serializer = SpaceLayoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            spaces = import_spaces(parking_lot, serializer.validated_data['layout'])
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'created': len(spaces),
+            'total_spaces': parking_lot.total_spaces,
+            'available_spaces': parking_lot.available_spaces
+        }, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['get'])
     def occupancy_rate(self, request, pk=None):
         """Get the occupancy rate of a parking lot."""
+        return Response(availability.occupancy(self.cached_availability()))
+        
+    @action(detail=True, methods=['get'])
+    def occupancy_history(self, request, pk=None):
+        """Get the occupancy time series of a parking lot (default: last 24 hours)."""
         parking_lot = self.get_object()
+        try:
+            end = parse_moment(request.query_params.get('end')) or timezone.now()
+            start = parse_moment(request.query_params.get('start')) or end - timedelta(days=1)
+        except ValueError:
+            return Response(
+                {'detail': 'Invalid start or end. Use an ISO 8601 date time.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        samples = occupancy_samples(start, end, [parking_lot.id]).order_by('bucket_start')
+        totals = occupancy_totals(start, end, [parking_lot.id]) or {'average': None, 'peak': None}
         return Response({
-            'occupancy_rate': parking_lot.occupancy_rate,
-            'total_spaces': parking_lot.total_spaces,
-            'available_spaces': parking_lot.available_spaces,
-            'occupied_spaces': parking_lot.total_spaces - parking_lot.available_spaces
+            'start': start,
+            'end': end,
+            'average_occupancy': totals['average'],
+            'peak_occupancy': totals['peak'],
+            'samples': OccupancySampleSerializer(samples, many=True).data
         })
+    
+    @action(detail=True, methods=['get'])
+    def free_windows(self, request, pk=None):
+        """Get the next free windows of every space in a parking lot."""
+        parking_lot = self.get_object()
+        try:
+            params = free_window_params(request)
+        except ValueError:
+            return Response(
+                {'detail': 'Invalid start, until, count or min_minutes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        spaces = list(parking_lot.spaces.exclude(
+            status=ParkingSpace.Status.MAINTENANCE
+        ).order_by('space_number').values_list('id', 'space_number'))
+        indexes = intervals.get_many_intervals([space_id for space_id, _ in spaces])
+        return Response([
+            {
+                'parking_space': space_id,
+                'space_number': space_number,
+                'windows': format_windows(indexes[space_id].free_windows(**params))
+            }
+            for space_id, space_number in spaces
+        ])
         
     @action(detail=False, methods=['get'])
     def search(self, request):
@@ -156,6 +286,34 @@ class ParkingLotViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(parking_lots, many=True)
         return Response(serializer.data)
         
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Get the nearest active parking lots to a point.
+        
+        ``lat`` and ``lng`` are required; ``radius`` (km, default 5),
+        ``k`` (default 10) and ``min_free`` (available spaces, default 0)
+        narrow the search. Lots are returned nearest first with their
+        ``distance_km``.
+        """
+        try:
+            params = nearby_params(request)
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'lat and lng are required; radius must be 0-100 km, k 1-100 and min_free non-negative.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        found = geo.nearby(**params)
+        lots = ParkingLot.objects.with_space_counts().in_bulk([lot_id for lot_id, _ in found])
+        data = []
+        for lot_id, distance in found:
+            if lot_id in lots:
+                item = ParkingLotSummarySerializer(lots[lot_id], context=self.get_serializer_context()).data
+                item['distance_km'] = round(distance, 3)
+                data.append(item)
+        return Response(data)
+        
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get all active parking lots."""
@@ -189,7 +347,7 @@ class ParkingSpaceViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'reserve', 'occupy', 'vacate']:
+        if self.action in ['list', 'retrieve', 'reserve', 'occupy', 'vacate', 'free_windows']:
             return [permissions.IsAuthenticated()]
         return [permissions.IsAdminUser()]
     
@@ -201,6 +359,20 @@ class ParkingSpaceViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(parking_lot_id=lot_id)
         return queryset
     
+    @action(detail=True, methods=['get'])
+    def free_windows(self, request, pk=None):
+        """Get the next free windows of a parking space."""
+        space = self.get_object()
+        try:
+            params = free_window_params(request)
+        except ValueError:
+            return Response(
+                {'detail': 'Invalid start, until, count or min_minutes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        windows = intervals.get_intervals(space.id).free_windows(**params)
+        return Response(format_windows(windows))
+    
     @action(detail=True, methods=['post'])
     def reserve(self, request, pk=None):
         """Reserve a parking space."""
@@ -226,21 +398,25 @@ class ParkingSpaceViewSet(viewsets.ModelViewSet):
         """Mark a space as occupied."""
         space = self.get_object()
         
-        if space.status not in [ParkingSpace.Status.AVAILABLE, ParkingSpace.Status.RESERVED]:
+        # The status check is part of the UPDATE so that concurrent requests
+        # cannot occupy the same space (and take a lot space) twice
+        with transaction.atomic():
+            occupied = ParkingSpace.objects.filter(
+                pk=space.pk,
+                status__in=[ParkingSpace.Status.AVAILABLE, ParkingSpace.Status.RESERVED]
+            ).update(status=ParkingSpace.Status.OCCUPIED, current_user=request.user, updated_at=timezone.now())
+            if occupied:
+                # Update parking lot available spaces; a full lot stays at zero
+                take_space(space.parking_lot)
+                # The space changed even when the counter was already at zero
+                availability.touch([space.parking_lot_id], [space.pk])
+        
+        if not occupied:
             return Response(
                 {'detail': 'This space cannot be occupied.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        space.status = ParkingSpace.Status.OCCUPIED
-        space.current_user = request.user
-        space.save()
-        
-        # Update parking lot available spaces
-        parking_lot = space.parking_lot
-        parking_lot.available_spaces = max(0, parking_lot.available_spaces - 1)
-        parking_lot.save()
-        
         return Response(
             {'detail': 'Space marked as occupied.'},
             status=status.HTTP_200_OK
@@ -251,24 +427,22 @@ class ParkingSpaceViewSet(viewsets.ModelViewSet):
         """Mark a space as available."""
         space = self.get_object()
         
-        if space.status != ParkingSpace.Status.OCCUPIED:
+        with transaction.atomic():
+            vacated = ParkingSpace.objects.filter(
+                pk=space.pk,
+                status=ParkingSpace.Status.OCCUPIED
+            ).update(status=ParkingSpace.Status.AVAILABLE, current_user=None, updated_at=timezone.now())
+            if vacated:
+                # Update parking lot available spaces; never above total_spaces
+                release_space(space.parking_lot)
+                availability.touch([space.parking_lot_id], [space.pk])
+        
+        if not vacated:
             return Response(
                 {'detail': 'This space is not occupied.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        space.status = ParkingSpace.Status.AVAILABLE
-        space.current_user = None
-        space.save()
-        
-        # Update parking lot available spaces
-        parking_lot = space.parking_lot
-        parking_lot.available_spaces = min(
-            parking_lot.total_spaces,
-            parking_lot.available_spaces + 1
-        )
-        parking_lot.save()
-        
         return Response(
             {'detail': 'Space marked as available.'},
             status=status.HTTP_200_OK
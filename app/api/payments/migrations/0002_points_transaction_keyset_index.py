@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pointstransaction",
+            index=models.Index(
+                fields=["points", "-created_at", "-id"], name="points_tx_created_idx"
+            ),
+        ),
+    ]
@@ -37,6 +37,12 @@ class PointsTransaction(models.Model):
     description = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pages of a user's history on (created_at, id)
+            models.Index(fields=['points', '-created_at', '-id'], name='points_tx_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.transaction_type} {self.amount} points: {self.description}"
 
@@ -118,22 +118,3 @@ class PaymentService:
     def get_user_points(user_id: int) -> ParkPoints:
         """Get user's ParkPoints balance."""
         return ParkPoints.objects.get_or_create(user_id=user_id)[0]
-    
-    @staticmethod
-    def get_user_transactions(user_id: int, page: int = 1, page_size: int = 10):
-        """Get user's points transaction history."""
-        transactions = PointsTransaction.objects.filter(
-            points__user_id=user_id
-        ).order_by('-created_at')
-        
-        total_items = transactions.count()
-        total_pages = (total_items + page_size - 1) // page_size
-        
-        start = (page - 1) * page_size
-        end = start + page_size
-        
-        return {
-            'transactions': transactions[start:end],
-            'total_pages': total_pages,
-            'total_items': total_items
-        } 
\ No newline at end of file
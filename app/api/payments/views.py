@@ -10,6 +10,7 @@ from .serializers import (
     PointsTransactionSerializer
 )
 from .services import PaymentService
+from app.utils.pagination import StandardResultsSetPagination
 
 class PaymentViewSet(viewsets.ModelViewSet):
     """ViewSet for handling payments."""
@@ -68,13 +69,24 @@ class ParkPointsViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def transactions(self, request):
-        """Get points transaction history."""
+        """
+        Get points transaction history.
+
+        Returns the whole history as a list unless the request asks for
+        pages (``?page``, ``?page_size``, ``?pagination=cursor`` or a
+        ``cursor``).
+        """
         transactions = PointsTransaction.objects.filter(
             points__user=request.user
-        ).order_by('-created_at')
+        ).order_by('-created_at', '-id')
+        
+        paginator = StandardResultsSetPagination()
+        if not paginator.is_requested(request):
+            return Response(PointsTransactionSerializer(transactions, many=True).data)
         
-        serializer = PointsTransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        page = paginator.paginate_queryset(transactions, request, view=self)
+        serializer = PointsTransactionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def add_points(self, request, pk=None):
@@ -1,6 +1,10 @@
+import asyncio
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
+# Channel layer sends awaited together by send_notifications_to_users
+NOTIFICATION_BATCH_SIZE = 500
+
 def send_notification_to_all(message):
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
@@ -28,4 +32,36 @@ def send_notification_to_user(user_id, message, extra_data=None):
                 **(extra_data or {})
             }
         }
-    ) 
\ No newline at end of file
+    ) 
+
+def send_notifications_to_users(notifications):
+    """
+    Send many ``(user_id, message, extra_data)`` notifications at once.
+
+    ``send_notification_to_user`` enters the event loop once per message;
+    this enters it once and awaits the channel layer sends in batches.
+    """
+    channel_layer = get_channel_layer()
+    messages = [
+        (
+            f"user_{user_id if user_id is not None else 'anonymous'}_notifications",
+            {
+                "type": "send_notification",
+                "content": {
+                    "message": message,
+                    **(extra_data or {})
+                }
+            }
+        )
+        for user_id, message, extra_data in notifications
+    ]
+
+    async def send_all():
+        for start in range(0, len(messages), NOTIFICATION_BATCH_SIZE):
+            await asyncio.gather(*(
+                channel_layer.group_send(group, event)
+                for group, event in messages[start:start + NOTIFICATION_BATCH_SIZE]
+            ))
+
+    if messages:
+        async_to_sync(send_all)()
@@ -0,0 +1,137 @@
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Extract
+from app.api.reservations.models import Reservation, duration_seconds_expression
+
+# Rows fetched per round trip while building the arrays
+LOAD_CHUNK_SIZE = 10000
+
+# Duration histogram edges in hours; the last bin is open ended
+DURATION_BINS = [0, 1, 2, 3, 4, 6, 8, 12, 24]
+DURATION_PERCENTILES = [50, 75, 90, 95, 99]
+
+COLUMN_DTYPE = np.dtype([
+    ('local_start', 'f8'),
+    ('duration', 'f8'),
+    ('lot', 'i8'),
+    ('rate', 'f8'),
+])
+
+
+class ReservationColumns:
+    """
+    Column arrays for the reportable reservations of a date range.
+
+    Rows are loaded once and every statistic below is computed with array
+    operations rather than per-row Python loops. ``local_start`` is the
+    start time as seconds since the epoch on the current time zone's wall
+    clock, so hours and weekdays are plain arithmetic. ``duration`` is in
+    seconds and ``rate`` is the booked hourly rate.
+    """
+
+    def __init__(self, rows):
+        self.local_start = rows['local_start']
+        self.duration = rows['duration']
+        self.lot = rows['lot']
+        self.rate = rows['rate']
+
+    def __len__(self):
+        return len(self.lot)
+
+    @classmethod
+    def load(cls, start_date, end_date, lot_ids=None):
+        reservations = Reservation.objects.reportable().filter(
+            start_time__date__range=[start_date, end_date]
+        )
+        if lot_ids:
+            reservations = reservations.filter(parking_lot_id__in=lot_ids)
+        rows = (
+            reservations.order_by()
+            .annotate(
+                local_start=Cast(Extract('start_time', 'epoch'), FloatField()),
+                duration_seconds=duration_seconds_expression(),
+                rate=Cast('hourly_rate', FloatField())
+            )
+            .values_list('local_start', 'duration_seconds', 'parking_lot_id', 'rate')
+            .iterator(chunk_size=LOAD_CHUNK_SIZE)
+        )
+        return cls(np.fromiter(rows, dtype=COLUMN_DTYPE))
+
+    @property
+    def hours(self):
+        return (self.local_start // 3600 % 24).astype(np.int64)
+
+    @property
+    def weekdays(self):
+        # 1970-01-01 was a Thursday; Monday is 0
+        return ((self.local_start // 86400 + 3) % 7).astype(np.int64)
+
+    @property
+    def duration_hours(self):
+        return self.duration / 3600
+
+    @property
+    def revenue(self):
+        return self.duration_hours * self.rate
+
+
+def hourly_distribution(columns):
+    """Reservations and revenue per starting hour of day."""
+    hours = columns.hours
+    counts = np.bincount(hours, minlength=24)
+    revenue = np.bincount(hours, weights=columns.revenue, minlength=24)
+    return [
+        {'hour': hour, 'reservations': int(counts[hour]), 'revenue': round(float(revenue[hour]), 2)}
+        for hour in range(24)
+    ]
+
+
+def duration_distribution(columns):
+    """Histogram of reservation lengths plus summary percentiles, in hours."""
+    durations = columns.duration_hours
+    edges = DURATION_BINS + [max(DURATION_BINS[-1], float(durations.max()) if len(durations) else 0) + 1]
+    counts, _ = np.histogram(durations, bins=edges)
+    bins = [
+        {
+            'min_hours': DURATION_BINS[index],
+            'max_hours': DURATION_BINS[index + 1] if index + 1 < len(DURATION_BINS) else None,
+            'reservations': int(count),
+        }
+        for index, count in enumerate(counts)
+    ]
+    if len(durations):
+        values = np.percentile(durations, DURATION_PERCENTILES)
+        percentiles = {f'p{p}': round(float(v), 2) for p, v in zip(DURATION_PERCENTILES, values)}
+        mean = round(float(durations.mean()), 2)
+    else:
+        percentiles = {f'p{p}': None for p in DURATION_PERCENTILES}
+        mean = None
+    return {'count': len(durations), 'mean': mean, 'percentiles': percentiles, 'bins': bins}
+
+
+def revenue_heatmap(columns):
+    """7 x 24 matrix of revenue by weekday (Monday first) and starting hour."""
+    cells = columns.weekdays * 24 + columns.hours
+    revenue = np.bincount(cells, weights=columns.revenue, minlength=7 * 24).reshape(7, 24)
+    counts = np.bincount(cells, minlength=7 * 24).reshape(7, 24)
+    return {
+        'revenue': np.round(revenue, 2).tolist(),
+        'reservations': counts.tolist(),
+    }
+
+
+def revenue_by_lot(columns):
+    """Reservations, revenue and average duration per parking lot."""
+    lots, inverse = np.unique(columns.lot, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(lots))
+    revenue = np.bincount(inverse, weights=columns.revenue, minlength=len(lots))
+    hours = np.bincount(inverse, weights=columns.duration_hours, minlength=len(lots))
+    return [
+        {
+            'parking_lot': int(lot),
+            'reservations': int(count),
+            'revenue': round(float(total), 2),
+            'average_duration': round(float(duration / count), 2),
+        }
+        for lot, count, total, duration in zip(lots, counts, revenue, hours)
+    ]
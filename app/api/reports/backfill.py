@@ -0,0 +1,105 @@
+import json
+import os
+from datetime import timedelta
+from .cache import invalidate_dates
+from .models import DailyReport, ParkingLotReport
+
+DAILY_REPORT_FIELDS = [
+    'total_revenue', 'total_reservations', 'average_duration',
+    'peak_hour', 'occupancy_rate', 'peak_occupancy_rate', 'updated_at'
+]
+
+
+def date_range(start_date, end_date):
+    """Yield every date from ``start_date`` to ``end_date`` inclusive."""
+    for offset in range((end_date - start_date).days + 1):
+        yield start_date + timedelta(days=offset)
+
+
+def build_units(start_date, end_date, lot_ids, lots_per_unit):
+    """
+    Split the date x lot matrix into work units.
+
+    Each unit is ``(key, date, lot_ids, include_daily)``; the first unit of
+    every date also produces that date's ``DailyReport``.
+    """
+    chunks = [
+        lot_ids[index:index + lots_per_unit]
+        for index in range(0, len(lot_ids), lots_per_unit)
+    ] or [[]]
+    for date in date_range(start_date, end_date):
+        for index, chunk in enumerate(chunks):
+            yield f'{date.isoformat()}:{index}', date, chunk, index == 0
+
+
+def compute_unit(unit):
+    """Calculate the report rows for one work unit (runs inside a worker)."""
+    key, date, lot_ids, include_daily = unit
+    daily = DailyReport.calculate_values(date) if include_daily else None
+    lots = ParkingLotReport.calculate_values_for_lots(date, lot_ids) if lot_ids else {}
+    return key, date, daily, lots
+
+
+def write_results(results):
+    """Bulk upsert the rows computed by ``compute_unit``."""
+    daily_reports = [
+        DailyReport(date=date, **daily)
+        for _, date, daily, _ in results
+        if daily is not None
+    ]
+    lot_reports = [
+        ParkingLotReport(parking_lot_id=parking_lot_id, date=date, **values)
+        for _, date, _, lots in results
+        for parking_lot_id, values in lots.items()
+    ]
+    if daily_reports:
+        DailyReport.objects.bulk_create(
+            daily_reports,
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=DAILY_REPORT_FIELDS
+        )
+        invalidate_dates(report.date for report in daily_reports)
+    if lot_reports:
+        ParkingLotReport.bulk_upsert(lot_reports)
+    return len(daily_reports) + len(lot_reports)
+
+
+class Checkpoint:
+    """
+    Append-only record of completed work units so an interrupted backfill
+    can resume. The first line holds the run signature; a file written for
+    different arguments is rejected.
+    """
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        self.completed = set()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self.completed
+        with open(self.path) as checkpoint_file:
+            header = checkpoint_file.readline().strip()
+            if header and json.loads(header) != self.signature:
+                raise ValueError(
+                    f'Checkpoint {self.path} belongs to a different run. '
+                    'Use --restart to discard it.'
+                )
+            self.completed = {line.strip() for line in checkpoint_file if line.strip()}
+        return self.completed
+
+    def mark_done(self, keys):
+        is_new = not os.path.exists(self.path)
+        with open(self.path, 'a') as checkpoint_file:
+            if is_new:
+                checkpoint_file.write(json.dumps(self.signature) + '\n')
+            for key in keys:
+                checkpoint_file.write(key + '\n')
+        self.completed.update(keys)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.completed = set()
@@ -0,0 +1,137 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from datetime import timedelta
+from django.db import transaction
+
+VERSION_KEY = 'reports:date-version:{date}'
+RANGE_KEY = 'reports:range:{name}:{start}:{end}:{digest}'
+STATS_KEY = 'reports:stats:{name}:{outcome}'
+
+# Longest a single computation may hold the recompute lock
+LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.05
+
+
+def initial_version():
+    """
+    Starting value of a date version: the clock in microseconds.
+
+    Versions only move forward, so a counter that was evicted restarts
+    above every value it held and can never bring back an old range key.
+    """
+    return time.time_ns() // 1000
+
+
+def date_versions(start_date, end_date):
+    """Current version of every date in the range, fetched in one cache round trip."""
+    keys = [
+        VERSION_KEY.format(date=(start_date + timedelta(days=offset)).isoformat())
+        for offset in range((end_date - start_date).days + 1)
+    ]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, initial_version(), None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def range_key(name, start_date, end_date):
+    """
+    Cache key for a report over ``start_date``..``end_date``.
+
+    The key embeds the versions of every date in the range, so bumping one
+    date's version makes only the ranges containing it miss; old entries
+    simply expire.
+    """
+    versions = ','.join(str(version) for version in date_versions(start_date, end_date))
+    digest = hashlib.sha1(versions.encode()).hexdigest()
+    return RANGE_KEY.format(name=name, start=start_date, end=end_date, digest=digest)
+
+
+def get_or_compute(name, start_date, end_date, compute):
+    """Return ``(data, hit)`` for the range report, computing it on a miss."""
+    return single_flight(name, range_key(name, start_date, end_date), compute, settings.REPORT_CACHE_TIMEOUT)
+
+
+def bump_dates(dates):
+    for date in dates:
+        key = VERSION_KEY.format(date=date.isoformat())
+        cache.add(key, initial_version(), None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(key, initial_version(), None)
+
+
+def invalidate_dates(dates):
+    """
+    Invalidate cached range reports that include any of ``dates``.
+
+    Runs after the surrounding transaction commits so a concurrent reader
+    cannot cache pre-commit data under the new version.
+    """
+    dates = set(dates)
+    if dates:
+        transaction.on_commit(lambda: bump_dates(dates))
+
+
+def record(name, outcome):
+    """Count a cache ``hit`` or ``miss`` for ``name``."""
+    key = STATS_KEY.format(name=name, outcome=outcome)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def stats(name):
+    """Hit and miss counters recorded for ``name``."""
+    counts = cache.get_many([STATS_KEY.format(name=name, outcome=outcome) for outcome in ('hit', 'miss')])
+    hits = counts.get(STATS_KEY.format(name=name, outcome='hit'), 0)
+    misses = counts.get(STATS_KEY.format(name=name, outcome='miss'), 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else 0,
+    }
+
+
+def single_flight(name, key, compute, timeout):
+    """
+    Return ``(data, hit)`` for ``key``, computing it at most once at a time.
+
+    On a miss the first caller takes a lock (``cache.add``) and recomputes;
+    concurrent callers wait for its result instead of recomputing too. If
+    the lock holder does not finish within ``LOCK_TIMEOUT`` the waiter
+    computes the value itself.
+    """
+    data = cache.get(key)
+    if data is not None:
+        record(name, 'hit')
+        return data, True
+    
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                record(name, 'hit')
+                return data, True
+            if cache.add(lock_key, 1, LOCK_TIMEOUT):
+                break
+    
+    try:
+        data = compute()
+        cache.set(key, data, timeout)
+    finally:
+        cache.delete(lock_key)
+    record(name, 'miss')
+    return data, False
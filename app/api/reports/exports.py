@@ -0,0 +1,117 @@
+import csv
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+from app.api.reservations.models import Reservation
+from .models import DailyReport, MonthlyReport, ParkingLotReport
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose ``write`` returns the value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+async def stream_csv(header, rows):
+    """
+    Yield CSV text asynchronously, starting with ``header``.
+
+    ``rows`` is a synchronous iterator over a server-side cursor. It is
+    advanced ``EXPORT_CHUNK_SIZE`` rows at a time through ``sync_to_async``,
+    so under ASGI every chunk is sent as soon as it is fetched instead of
+    the whole export being collected into a list first.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    rows = iter(rows)
+    fetch = sync_to_async(lambda: list(islice(rows, EXPORT_CHUNK_SIZE)))
+    while chunk := await fetch():
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def daily_rows(start_date, end_date):
+    return (
+        DailyReport.objects.filter(date__range=[start_date, end_date])
+        .order_by('date')
+        .values_list(
+            'date', 'total_revenue', 'total_reservations',
+            'average_duration', 'peak_hour', 'occupancy_rate'
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def monthly_rows(start_date, end_date):
+    after_start = Q(year__gt=start_date.year) | Q(year=start_date.year, month__gte=start_date.month)
+    before_end = Q(year__lt=end_date.year) | Q(year=end_date.year, month__lte=end_date.month)
+    return (
+        MonthlyReport.objects.filter(after_start & before_end)
+        .order_by('year', 'month')
+        .values_list(
+            'year', 'month', 'total_revenue', 'total_reservations',
+            'average_duration', 'average_occupancy_rate', 'peak_day'
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def parking_lot_rows(start_date, end_date):
+    # The lot name comes from the same join, not one query per row
+    return (
+        ParkingLotReport.objects.filter(date__range=[start_date, end_date])
+        .order_by('date', 'parking_lot_id')
+        .values_list(
+            'parking_lot__name', 'date', 'total_revenue', 'total_reservations',
+            'occupancy_rate', 'average_duration', 'peak_hour'
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def reservation_rows(start_date, end_date):
+    reservations = (
+        Reservation.objects.filter(start_time__date__range=[start_date, end_date])
+        .with_duration_and_cost()
+        .order_by('start_time', 'id')
+        .values_list(
+            'id', 'parking_lot__name', 'parking_space__space_number', 'user__email',
+            'vehicle_plate', 'start_time', 'end_time', 'status',
+            'duration_hours', 'cost_amount'
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for row in reservations:
+        start_time, end_time = row[5], row[6]
+        yield row[:5] + (
+            timezone.localtime(start_time).isoformat(),
+            timezone.localtime(end_time).isoformat(),
+            row[7],
+            round(row[8] or 0, 2),
+            round(row[9] or 0, 2),
+        )
+
+
+# Export type -> (CSV header, row generator)
+EXPORTS = {
+    'daily': (
+        ['Date', 'Total Revenue', 'Total Reservations', 'Average Duration', 'Peak Hour', 'Occupancy Rate'],
+        daily_rows
+    ),
+    'monthly': (
+        ['Year', 'Month', 'Total Revenue', 'Total Reservations', 'Average Duration', 'Average Occupancy Rate', 'Peak Day'],
+        monthly_rows
+    ),
+    'parking_lot': (
+        ['Parking Lot', 'Date', 'Total Revenue', 'Total Reservations', 'Occupancy Rate', 'Average Duration', 'Peak Hour'],
+        parking_lot_rows
+    ),
+    'reservations': (
+        ['ID', 'Parking Lot', 'Space', 'User', 'Vehicle Plate', 'Start Time', 'End Time', 'Status', 'Duration (hours)', 'Total Cost'],
+        reservation_rows
+    ),
+}
@@ -0,0 +1,112 @@
+# Generated by Django 5.0.2 on 2026-10-16 22:53
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, DurationField, ExpressionWrapper, F, FloatField, Sum, Value
+from django.db.models.functions import Cast, Extract, ExtractHour, TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """Populate the buckets from existing reservations."""
+    Reservation = apps.get_model("reservations", "Reservation")
+    ReservationRollup = apps.get_model("reports", "ReservationRollup")
+    # Frozen copies of the duration and cost expressions as of this migration
+    interval = ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField())
+    hours = ExpressionWrapper(
+        Cast(Extract(interval, "epoch"), FloatField()) / Value(3600.0), output_field=FloatField()
+    )
+    cost = ExpressionWrapper(
+        Cast(Extract(interval, "epoch"), DecimalField(max_digits=16, decimal_places=4))
+        * F("parking_lot__hourly_rate")
+        / Value(Decimal("3600")),
+        output_field=DecimalField(max_digits=16, decimal_places=4),
+    )
+    rows = (
+        Reservation.objects.filter(status__in=["active", "completed"])
+        .order_by()
+        .annotate(
+            bucket_date=TruncDate("start_time"),
+            bucket_hour=ExtractHour("start_time"),
+        )
+        .values("bucket_date", "parking_lot_id", "bucket_hour")
+        .annotate(
+            reservations=Count("id"),
+            revenue=Sum(cost),
+            duration=Sum(hours),
+        )
+    )
+    ReservationRollup.objects.bulk_create(
+        (
+            ReservationRollup(
+                date=row["bucket_date"],
+                parking_lot_id=row["parking_lot_id"],
+                hour=row["bucket_hour"],
+                total_reservations=row["reservations"],
+                total_revenue=row["revenue"] or 0,
+                total_duration=row["duration"] or 0,
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0002_parkinglot_owner"),
+        ("reservations", "0001_initial"),
+        ("reports", "0003_alter_dailyreport_average_duration_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReservationRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="date")),
+                ("hour", models.PositiveSmallIntegerField(verbose_name="hour")),
+                (
+                    "total_reservations",
+                    models.IntegerField(default=0, verbose_name="total reservations"),
+                ),
+                (
+                    "total_revenue",
+                    models.DecimalField(
+                        decimal_places=4,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="total revenue",
+                    ),
+                ),
+                (
+                    "total_duration",
+                    models.FloatField(default=0, verbose_name="total duration (hours)"),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "parking_lot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservation_rollups",
+                        to="parking_lots.parkinglot",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "reservation rollup",
+                "verbose_name_plural": "reservation rollups",
+                "ordering": ["date", "parking_lot", "hour"],
+                "unique_together": {("date", "parking_lot", "hour")},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:11
+
+import app.api.reports.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0004_reservationrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailyreport",
+            name="peak_occupancy_rate",
+            field=models.FloatField(
+                default=0,
+                validators=[app.api.reports.validators.validate_percentage],
+                verbose_name="peak occupancy rate",
+            ),
+        ),
+        migrations.AddField(
+            model_name="parkinglotreport",
+            name="peak_occupancy_rate",
+            field=models.FloatField(
+                default=0,
+                validators=[app.api.reports.validators.validate_percentage],
+                verbose_name="peak occupancy rate",
+            ),
+        ),
+    ]
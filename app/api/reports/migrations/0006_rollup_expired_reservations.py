@@ -0,0 +1,70 @@
+# Generated by Django 5.0.2 on 2026-10-17 02:20
+
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import Count, DecimalField, DurationField, ExpressionWrapper, F, FloatField, Sum, Value
+from django.db.models.functions import Cast, Extract, ExtractHour, TruncDate
+
+
+def rebuild_rollups(apps, schema_editor):
+    """
+    Rebuild the buckets now that expired reservations are reported.
+
+    0004 backfilled active and completed reservations only. Bookings that
+    had already expired by then were never counted, and they can no longer
+    be told apart from ones that expired later, so every bucket is
+    recomputed from the raw rows.
+    """
+    Reservation = apps.get_model("reservations", "Reservation")
+    ReservationRollup = apps.get_model("reports", "ReservationRollup")
+    # Frozen copies of the duration and cost expressions as of this migration
+    interval = ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField())
+    hours = ExpressionWrapper(
+        Cast(Extract(interval, "epoch"), FloatField()) / Value(3600.0), output_field=FloatField()
+    )
+    cost = ExpressionWrapper(
+        Cast(Extract(interval, "epoch"), DecimalField(max_digits=16, decimal_places=4))
+        * F("parking_lot__hourly_rate")
+        / Value(Decimal("3600")),
+        output_field=DecimalField(max_digits=16, decimal_places=4),
+    )
+    rows = (
+        Reservation.objects.filter(status__in=["active", "completed", "expired"])
+        .order_by()
+        .annotate(
+            bucket_date=TruncDate("start_time"),
+            bucket_hour=ExtractHour("start_time"),
+        )
+        .values("bucket_date", "parking_lot_id", "bucket_hour")
+        .annotate(
+            reservations=Count("id"),
+            revenue=Sum(cost),
+            duration=Sum(hours),
+        )
+    )
+    ReservationRollup.objects.all().delete()
+    ReservationRollup.objects.bulk_create(
+        (
+            ReservationRollup(
+                date=row["bucket_date"],
+                parking_lot_id=row["parking_lot_id"],
+                hour=row["bucket_hour"],
+                total_reservations=row["reservations"],
+                total_revenue=row["revenue"] or 0,
+                total_duration=row["duration"] or 0,
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0005_peak_occupancy_rate"),
+        ("reservations", "0003_alter_reservation_status"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,16 @@
+from collections import defaultdict
 from django.db import models
+from django.db.models import Count, Sum, Max, F
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from app.api.parking_lots.models import ParkingLot
-from app.api.reservations.models import Reservation
-from datetime import datetime
+from app.api.parking_lots.occupancy import (
+    day_bounds, occupancy_by_day, occupancy_by_lot, occupancy_rate, occupancy_totals
+)
+from app.api.reservations.models import duration_hours_expression, total_cost_expression
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 from .validators import (
     validate_non_negative, validate_positive, validate_percentage,
@@ -12,6 +19,186 @@ from .validators import (
 
 User = get_user_model()
 
+
+class ReservationRollup(models.Model):
+    """
+    Reservation totals pre-aggregated per date, parking lot and hour.
+
+    Buckets are maintained incrementally from reservation writes (see
+    ``rollups.py``) so reports read O(buckets) rows instead of rescanning
+    reservations. ``reconcile_rollups`` rebuilds them from raw data.
+    """
+    
+    date = models.DateField(_('date'))
+    parking_lot = models.ForeignKey(
+        ParkingLot,
+        on_delete=models.CASCADE,
+        related_name='reservation_rollups'
+    )
+    hour = models.PositiveSmallIntegerField(_('hour'))
+    total_reservations = models.IntegerField(_('total reservations'), default=0)
+    total_revenue = models.DecimalField(
+        _('total revenue'),
+        max_digits=14,
+        decimal_places=4,
+        default=0
+    )
+    total_duration = models.FloatField(_('total duration (hours)'), default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('reservation rollup')
+        verbose_name_plural = _('reservation rollups')
+        ordering = ['date', 'parking_lot', 'hour']
+        unique_together = ['date', 'parking_lot', 'hour']
+    
+    def __str__(self):
+        return f"{self.parking_lot_id} - {self.date} {self.hour:02d}:00"
+
+
+def aggregate_reservations(reservations, **groups):
+    """
+    Group reservations by the given expressions in a single query.
+
+    ``groups`` maps output names to expressions, e.g.
+    ``bucket=ExtractHour('start_time')``. Returns a list of dicts with the
+    group keys plus ``reservations``, ``revenue`` and ``duration`` (summed
+    hours), ordered by the group keys.
+    """
+    return list(
+        reservations.order_by()
+        .annotate(**groups)
+        .values(*groups)
+        .annotate(
+            reservations=Count('id'),
+            revenue=Sum(total_cost_expression()),
+            duration=Sum(duration_hours_expression())
+        )
+        .order_by(*groups)
+    )
+
+
+def summarize_buckets(rows):
+    """Reduce grouped rows into totals, average duration and the busiest bucket."""
+    total_reservations = sum(row['reservations'] for row in rows)
+    total_revenue = sum((row['revenue'] or Decimal('0') for row in rows), Decimal('0')).quantize(Decimal('0.01'))
+    total_duration = sum(row['duration'] or 0 for row in rows)
+    average_duration = total_duration / total_reservations if total_reservations else 0
+    peak = max(rows, key=lambda row: row['reservations'])['bucket'] if rows else None
+    return {
+        'total_revenue': total_revenue,
+        'total_reservations': total_reservations,
+        'average_duration': average_duration,
+        'peak': peak,
+    }
+
+
+def aggregate_rollups(rollups, bucket):
+    """
+    Group stored ``ReservationRollup`` buckets by ``bucket`` in a single query.
+
+    Returns rows shaped like ``aggregate_reservations`` so both can be fed to
+    ``summarize_buckets``. Buckets emptied by cancellations are skipped.
+    """
+    return list(
+        rollups.order_by()
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(
+            reservations=Sum('total_reservations'),
+            revenue=Sum('total_revenue'),
+            duration=Sum('total_duration')
+        )
+        .filter(reservations__gt=0)
+        .order_by('bucket')
+    )
+
+
+def hour_to_time(hour):
+    """Convert an hour of day into the ``TimeField`` value stored on reports."""
+    return time(hour=hour) if hour is not None else None
+
+
+def live_occupancy_rate():
+    """Occupancy rate over all lots from their current counters."""
+    spaces = ParkingLot.objects.aggregate(
+        total=Sum('total_spaces'),
+        available=Sum('available_spaces')
+    )
+    return occupancy_rate(spaces['total'] or 0, spaces['available'] or 0)
+
+
+def merge_daily_reports(start_date, end_date):
+    """
+    Merge stored daily figures for ``start_date``..``end_date`` (inclusive).
+
+    ``DailyReport`` rows are combined as-is (revenue and counts summed,
+    duration re-weighted by count). Days whose report is missing, or older
+    than the latest rollup write for that day, are recomputed from
+    ``ReservationRollup`` buckets in one grouped query. Returns the
+    ``summarize_buckets`` totals (``peak`` is the busiest day), the mean
+    daily occupancy rate over the days with data and the merged per-day
+    rows.
+    """
+    reports = {
+        row['date']: row
+        for row in DailyReport.objects.filter(date__range=(start_date, end_date)).values(
+            'date', 'total_revenue', 'total_reservations', 'average_duration',
+            'occupancy_rate', 'updated_at'
+        )
+    }
+    last_writes = (
+        ReservationRollup.objects.filter(date__range=(start_date, end_date))
+        .order_by()
+        .values('date')
+        .annotate(last_write=Max('updated_at'))
+        .values_list('date', 'last_write')
+    )
+    stale_dates = [
+        day for day, last_write in last_writes
+        if day not in reports or reports[day]['updated_at'] < last_write
+    ]
+    
+    days = {
+        day: {
+            'bucket': day,
+            'reservations': report['total_reservations'],
+            'revenue': report['total_revenue'],
+            'duration': report['average_duration'] * report['total_reservations'],
+        }
+        for day, report in reports.items()
+        if day not in stale_dates and report['total_reservations']
+    }
+    if stale_dates:
+        rollups = ReservationRollup.objects.filter(date__in=stale_dates)
+        for row in aggregate_rollups(rollups, F('date')):
+            days[row['bucket']] = row
+    
+    rows = [days[day] for day in sorted(days)]
+    
+    # Days without a fresh report take their occupancy from the samples, as
+    # their report would; days with neither are left out of the average
+    occupancy = {
+        day: report['occupancy_rate'] for day, report in reports.items() if day not in stale_dates
+    }
+    recomputed = [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+        if start_date + timedelta(days=offset) not in occupancy
+    ]
+    for day, rates in occupancy_by_day(recomputed).items():
+        occupancy[day] = rates['average']
+    today = timezone.localdate()
+    if today in recomputed and today not in occupancy:
+        occupancy[today] = live_occupancy_rate()
+    occupancy_rates = list(occupancy.values())
+    return {
+        **summarize_buckets(rows),
+        'average_occupancy_rate': sum(occupancy_rates) / len(occupancy_rates) if occupancy_rates else 0,
+        'days': rows,
+    }
+
+
 class DailyReport(models.Model):
     """Model for daily parking reports."""
     
@@ -38,6 +225,11 @@ class DailyReport(models.Model):
         default=0,
         validators=[validate_percentage]
     )
+    peak_occupancy_rate = models.FloatField(
+        _('peak occupancy rate'),
+        default=0,
+        validators=[validate_percentage]
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -56,49 +248,34 @@ class DailyReport(models.Model):
             raise ValidationError({'peak_hour': 'Invalid time format.'})
     
     @classmethod
-    def generate_report(cls, date):
-        """Generate a daily report for the specified date."""
-        # Get all reservations for the date
-        reservations = Reservation.objects.filter(
-            start_time__date=date,
-            status__in=['active', 'completed']
-        )
-        
-        # Calculate total revenue
-        total_revenue = sum(reservation.total_cost for reservation in reservations)
+    def calculate_values(cls, date):
+        """Calculate the report figures for ``date`` without saving them."""
+        rollups = ReservationRollup.objects.filter(date=date)
+        totals = summarize_buckets(aggregate_rollups(rollups, F('hour')))
         
-        # Calculate total reservations
-        total_reservations = reservations.count()
+        # Occupancy comes from the day's samples; only today may fall back to
+        # the live counts before the first sample is taken
+        occupancy = occupancy_totals(*day_bounds(date))
+        if occupancy is None and date == timezone.localdate():
+            rate = live_occupancy_rate()
+            occupancy = {'average': rate, 'peak': rate}
+        occupancy = occupancy or {'average': 0, 'peak': 0}
         
-        # Calculate average duration
-        durations = [reservation.duration for reservation in reservations]
-        average_duration = sum(durations) / len(durations) if durations else 0
-        
-        # Find peak hour
-        hourly_counts = {}
-        for reservation in reservations:
-            hour = reservation.start_time.hour
-            hourly_counts[hour] = hourly_counts.get(hour, 0) + 1
-        
-        peak_hour = max(hourly_counts.items(), key=lambda x: x[1])[0] if hourly_counts else None
-        if peak_hour is not None:
-            peak_hour = datetime.strptime(f"{peak_hour:02d}:00", "%H:%M").time()
-        
-        # Calculate overall occupancy rate
-        total_spaces = sum(lot.total_spaces for lot in ParkingLot.objects.all())
-        occupied_spaces = sum(lot.total_spaces - lot.available_spaces for lot in ParkingLot.objects.all())
-        occupancy_rate = (occupied_spaces / total_spaces * 100) if total_spaces > 0 else 0
-        
-        # Create or update report
+        return {
+            'total_revenue': totals['total_revenue'],
+            'total_reservations': totals['total_reservations'],
+            'average_duration': totals['average_duration'],
+            'peak_hour': hour_to_time(totals['peak']),
+            'occupancy_rate': occupancy['average'],
+            'peak_occupancy_rate': occupancy['peak']
+        }
+    
+    @classmethod
+    def generate_report(cls, date):
+        """Generate a daily report for the specified date."""
         report, created = cls.objects.update_or_create(
             date=date,
-            defaults={
-                'total_revenue': total_revenue,
-                'total_reservations': total_reservations,
-                'average_duration': average_duration,
-                'peak_hour': peak_hour,
-                'occupancy_rate': occupancy_rate
-            }
+            defaults=cls.calculate_values(date)
         )
         
         return report
@@ -149,54 +326,27 @@ class MonthlyReport(models.Model):
             validate_peak_day(self.peak_day, self.year, self.month)
     
     @classmethod
-    def generate_report(cls, year, month):
-        """Generate a monthly report for the specified year and month."""
+    def calculate_values(cls, year, month):
+        """Merge the month's daily figures without saving them."""
         from calendar import monthrange
         _, last_day = monthrange(year, month)
+        totals = merge_daily_reports(date(year, month, 1), date(year, month, last_day))
         
-        # Get all reservations for the month
-        reservations = Reservation.objects.filter(
-            start_time__year=year,
-            start_time__month=month,
-            status__in=['active', 'completed']
-        )
-        
-        # Calculate total revenue
-        total_revenue = sum(reservation.total_cost for reservation in reservations)
-        
-        # Calculate total reservations
-        total_reservations = reservations.count()
-        
-        # Calculate average duration
-        durations = [reservation.duration for reservation in reservations]
-        average_duration = sum(durations) / len(durations) if durations else 0
-        
-        # Calculate average occupancy rate
-        daily_reports = DailyReport.objects.filter(
-            date__year=year,
-            date__month=month
-        )
-        average_occupancy_rate = sum(report.occupancy_rate for report in daily_reports) / len(daily_reports) if daily_reports else 0
-        
-        # Find peak day
-        daily_counts = {}
-        for reservation in reservations:
-            day = reservation.start_time.date()
-            daily_counts[day] = daily_counts.get(day, 0) + 1
-        
-        peak_day = max(daily_counts.items(), key=lambda x: x[1])[0] if daily_counts else None
-        
-        # Create or update report
+        return {
+            'total_revenue': totals['total_revenue'],
+            'total_reservations': totals['total_reservations'],
+            'average_duration': totals['average_duration'],
+            'average_occupancy_rate': totals['average_occupancy_rate'],
+            'peak_day': totals['peak']
+        }
+    
+    @classmethod
+    def generate_report(cls, year, month):
+        """Generate a monthly report for the specified year and month."""
         report, created = cls.objects.update_or_create(
             year=year,
             month=month,
-            defaults={
-                'total_revenue': total_revenue,
-                'total_reservations': total_reservations,
-                'average_duration': average_duration,
-                'average_occupancy_rate': average_occupancy_rate,
-                'peak_day': peak_day
-            }
+            defaults=cls.calculate_values(year, month)
         )
         
         return report
@@ -204,6 +354,11 @@ class MonthlyReport(models.Model):
 class ParkingLotReport(models.Model):
     """Model for parking lot specific reports."""
     
+    UPSERT_FIELDS = [
+        'total_revenue', 'total_reservations', 'occupancy_rate',
+        'peak_occupancy_rate', 'average_duration', 'peak_hour', 'updated_at'
+    ]
+    
     parking_lot = models.ForeignKey(
         ParkingLot,
         on_delete=models.CASCADE,
@@ -226,6 +381,11 @@ class ParkingLotReport(models.Model):
         default=0,
         validators=[validate_percentage]
     )
+    peak_occupancy_rate = models.FloatField(
+        _('peak occupancy rate'),
+        default=0,
+        validators=[validate_percentage]
+    )
     average_duration = models.FloatField(
         _('average duration'),
         default=0,
@@ -253,49 +413,90 @@ class ParkingLotReport(models.Model):
             raise ValidationError({'parking_lot': 'Parking lot does not exist.'})
     
     @classmethod
-    def generate_report(cls, parking_lot, date):
-        """Generate a report for a specific parking lot and date."""
-        # Get all reservations for the parking lot and date
-        reservations = Reservation.objects.filter(
-            parking_lot=parking_lot,
-            start_time__date=date,
-            status__in=['active', 'completed']
-        )
-        
-        # Calculate total revenue
-        total_revenue = sum(reservation.total_cost for reservation in reservations)
-        
-        # Calculate total reservations
-        total_reservations = reservations.count()
-        
-        # Calculate occupancy rate
-        occupancy_rate = ((parking_lot.total_spaces - parking_lot.available_spaces) / parking_lot.total_spaces * 100) if parking_lot.total_spaces > 0 else 0
-        
-        # Calculate average duration
-        durations = [reservation.duration for reservation in reservations]
-        average_duration = sum(durations) / len(durations) if durations else 0
+    def calculate_values(cls, parking_lot, date):
+        """Calculate the report figures for a parking lot and date without saving them."""
+        return cls.calculate_values_for_lots(date, [parking_lot.pk])[parking_lot.pk]
+    
+    @classmethod
+    def calculate_values_for_lots(cls, date, lot_ids=None):
+        """
+        Calculate ``{parking_lot_id: values}`` for many lots at once.
+
+        Rollups are grouped by lot and hour, and occupancy samples by lot, so
+        the cost does not grow with one query per lot. Lots without
+        reservations get zero figures. ``lot_ids`` limits the result to
+        those lots.
+        """
+        lots = ParkingLot.objects.order_by('id')
+        rollups = ReservationRollup.objects.filter(date=date)
+        if lot_ids is not None:
+            lots = lots.filter(id__in=lot_ids)
+            rollups = rollups.filter(parking_lot_id__in=lot_ids)
         
-        # Find peak hour
-        hourly_counts = {}
-        for reservation in reservations:
-            hour = reservation.start_time.hour
-            hourly_counts[hour] = hourly_counts.get(hour, 0) + 1
+        rows_by_lot = defaultdict(list)
+        for row in (
+            rollups.order_by()
+            .values('parking_lot_id', 'hour')
+            .annotate(
+                reservations=Sum('total_reservations'),
+                revenue=Sum('total_revenue'),
+                duration=Sum('total_duration')
+            )
+            .filter(reservations__gt=0)
+            .order_by('parking_lot_id', 'hour')
+        ):
+            row['bucket'] = row['hour']
+            rows_by_lot[row['parking_lot_id']].append(row)
         
-        peak_hour = max(hourly_counts.items(), key=lambda x: x[1])[0] if hourly_counts else None
-        if peak_hour is not None:
-            peak_hour = datetime.strptime(f"{peak_hour:02d}:00", "%H:%M").time()
+        occupancy = occupancy_by_lot(*day_bounds(date), lot_ids)
+        is_today = date == timezone.localdate()
         
-        # Create or update report
+        values = {}
+        for lot_id, total_spaces, available_spaces in lots.values_list('id', 'total_spaces', 'available_spaces'):
+            totals = summarize_buckets(rows_by_lot[lot_id])
+            if lot_id in occupancy:
+                lot_occupancy = occupancy[lot_id]
+            elif is_today:
+                rate = occupancy_rate(total_spaces, available_spaces)
+                lot_occupancy = {'average': rate, 'peak': rate}
+            else:
+                lot_occupancy = {'average': 0, 'peak': 0}
+            values[lot_id] = {
+                'total_revenue': totals['total_revenue'],
+                'total_reservations': totals['total_reservations'],
+                'occupancy_rate': lot_occupancy['average'],
+                'peak_occupancy_rate': lot_occupancy['peak'],
+                'average_duration': totals['average_duration'],
+                'peak_hour': hour_to_time(totals['peak'])
+            }
+        return values
+    
+    @classmethod
+    def bulk_upsert(cls, reports):
+        """Insert or update many reports in one statement per batch."""
+        return cls.objects.bulk_create(
+            reports,
+            update_conflicts=True,
+            unique_fields=['parking_lot', 'date'],
+            update_fields=cls.UPSERT_FIELDS,
+            batch_size=1000
+        )
+    
+    @classmethod
+    def generate_for_all_lots(cls, date, lot_ids=None):
+        """Generate (or refresh) the reports of every parking lot for ``date``."""
+        return cls.bulk_upsert([
+            cls(parking_lot_id=lot_id, date=date, **values)
+            for lot_id, values in cls.calculate_values_for_lots(date, lot_ids).items()
+        ])
+    
+    @classmethod
+    def generate_report(cls, parking_lot, date):
+        """Generate a report for a specific parking lot and date."""
         report, created = cls.objects.update_or_create(
             parking_lot=parking_lot,
             date=date,
-            defaults={
-                'total_revenue': total_revenue,
-                'total_reservations': total_reservations,
-                'occupancy_rate': occupancy_rate,
-                'average_duration': average_duration,
-                'peak_hour': peak_hour
-            }
+            defaults=cls.calculate_values(parking_lot, date)
         )
         
         return report 
\ No newline at end of file
@@ -0,0 +1,196 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+from app.api.reservations.models import Reservation
+from .cache import invalidate_dates
+from .models import ReservationRollup, aggregate_reservations
+
+
+SNAPSHOT_FIELDS = ('start_time', 'end_time', 'status', 'parking_lot_id', 'hourly_rate')
+
+
+def snapshot(reservation):
+    """
+    Capture the fields that decide a reservation's rollup contribution.
+
+    Reads the instance ``__dict__`` so deferred fields are never loaded;
+    returns ``None`` when any of them is deferred.
+    """
+    values = reservation.__dict__
+    if any(field not in values for field in SNAPSHOT_FIELDS):
+        return None
+    return tuple(values[field] for field in SNAPSHOT_FIELDS)
+
+
+def stored_snapshot(pk):
+    """Snapshot of the persisted row, used when the loaded state is unknown."""
+    row = Reservation.objects.filter(pk=pk).values_list(*SNAPSHOT_FIELDS).first()
+    return tuple(row) if row else None
+
+
+def contribution(state):
+    """
+    Return ``(key, (count, revenue, duration))`` for a reservation snapshot,
+    or ``None`` if it does not count towards reports.
+
+    Revenue is priced at the reservation's booked ``hourly_rate``, as
+    ``total_cost_expression`` does, so a later change of the lot's rate
+    leaves past buckets alone.
+    """
+    start_time, end_time, status, parking_lot_id, hourly_rate = state
+    if status not in Reservation.REPORTABLE_STATUSES or not (start_time and end_time):
+        return None
+    local_start = timezone.localtime(start_time)
+    duration = Decimal(str((end_time - start_time).total_seconds() / 3600))
+    key = (local_start.date(), parking_lot_id, local_start.hour)
+    return key, (1, duration * hourly_rate, float(duration))
+
+
+def reservation_deltas(old_state, new_state):
+    """Compute per-bucket deltas for a reservation moving between two snapshots."""
+    deltas = defaultdict(lambda: [0, Decimal('0'), 0.0])
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is None or state[3] is None or state[2] not in Reservation.REPORTABLE_STATUSES:
+            continue
+        result = contribution(state)
+        if result is None:
+            continue
+        key, (count, revenue, duration) = result
+        deltas[key][0] += sign * count
+        deltas[key][1] += sign * revenue
+        deltas[key][2] += sign * duration
+    return {key: tuple(values) for key, values in deltas.items() if values[0] or values[1] or values[2]}
+
+
+def apply_deltas(deltas):
+    """
+    Add ``{(date, parking_lot_id, hour): (count, revenue, duration)}`` to the
+    stored buckets using ``F()`` updates.
+
+    Missing buckets are only created for positive deltas; a removal from a
+    bucket that does not exist is left for ``reconcile`` to resolve.
+    """
+    invalidate_dates(date for date, _, _ in deltas)
+    for (date, parking_lot_id, hour), (count, revenue, duration) in deltas.items():
+        lookup = {'date': date, 'parking_lot_id': parking_lot_id, 'hour': hour}
+        changes = {
+            'total_reservations': F('total_reservations') + count,
+            'total_revenue': F('total_revenue') + revenue,
+            'total_duration': F('total_duration') + duration,
+            'updated_at': timezone.now(),
+        }
+        if ReservationRollup.objects.filter(**lookup).update(**changes) or count <= 0:
+            continue
+        try:
+            with transaction.atomic():
+                ReservationRollup.objects.create(
+                    total_reservations=count,
+                    total_revenue=revenue,
+                    total_duration=duration,
+                    **lookup
+                )
+        except IntegrityError:
+            # Another writer created the bucket first
+            ReservationRollup.objects.filter(**lookup).update(**changes)
+
+
+def apply_reservations(reservations, sign=1):
+    """Add (or with ``sign=-1`` remove) the contribution of many reservations at once."""
+    deltas = defaultdict(lambda: [0, Decimal('0'), 0.0])
+    for reservation in reservations:
+        result = contribution(snapshot(reservation))
+        if result is None:
+            continue
+        key, (count, revenue, duration) = result
+        deltas[key][0] += sign * count
+        deltas[key][1] += sign * revenue
+        deltas[key][2] += sign * duration
+    apply_deltas({key: tuple(values) for key, values in deltas.items()})
+
+
+def raw_rollup_rows(start_date=None, end_date=None):
+    """Recompute buckets from raw reservations with a single GROUP BY."""
+    reservations = Reservation.objects.reportable()
+    if start_date:
+        reservations = reservations.filter(start_time__date__gte=start_date)
+    if end_date:
+        reservations = reservations.filter(start_time__date__lte=end_date)
+    return aggregate_reservations(
+        reservations,
+        date=TruncDate('start_time'),
+        lot=F('parking_lot_id'),
+        hour=ExtractHour('start_time')
+    )
+
+
+def _normalize(values):
+    """Round bucket values so float/decimal noise is not reported as drift."""
+    count, revenue, duration = values
+    return count, Decimal(revenue or 0).quantize(Decimal('0.01')), round(duration or 0, 4)
+
+
+# Conflicts with the ROW EXCLUSIVE lock every rollup UPDATE/INSERT takes,
+# and with itself, while plain reads go on
+LOCK_SQL = f'LOCK TABLE {ReservationRollup._meta.db_table} IN SHARE ROW EXCLUSIVE MODE'
+
+
+def reconcile(start_date=None, end_date=None, dry_run=False):
+    """
+    Rebuild rollup buckets from raw reservations.
+
+    Returns a list of drifted buckets as
+    ``(key, stored_values, expected_values)``. Unless ``dry_run`` is set the
+    buckets in the range are replaced with the recomputed values. Both
+    sides price revenue at the booked ``hourly_rate``, so changing a lot's
+    rate is not drift.
+
+    Reads and rebuild run in one transaction holding a lock that blocks
+    rollup writers. Rollup deltas are applied in the same transaction as
+    the reservation change, so the lock waits for writers that have already
+    touched the rollups to commit (and the raw read then sees them), while
+    later writers apply their deltas on top of the rebuilt buckets.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(LOCK_SQL)
+        expected = {
+            (row['date'], row['lot'], row['hour']): (
+                row['reservations'], row['revenue'] or Decimal('0'), row['duration'] or 0
+            )
+            for row in raw_rollup_rows(start_date, end_date)
+        }
+        stored_buckets = ReservationRollup.objects.all()
+        if start_date:
+            stored_buckets = stored_buckets.filter(date__gte=start_date)
+        if end_date:
+            stored_buckets = stored_buckets.filter(date__lte=end_date)
+        stored = {
+            (bucket.date, bucket.parking_lot_id, bucket.hour): (
+                bucket.total_reservations, bucket.total_revenue, bucket.total_duration
+            )
+            for bucket in stored_buckets
+        }
+        empty = (0, Decimal('0'), 0.0)
+        drift = [
+            (key, _normalize(stored.get(key, empty)), _normalize(expected.get(key, empty)))
+            for key in sorted(set(stored) | set(expected))
+            if _normalize(stored.get(key, empty)) != _normalize(expected.get(key, empty))
+        ]
+        if not dry_run and drift:
+            invalidate_dates(date for (date, _, _), _, _ in drift)
+            stored_buckets.delete()
+            ReservationRollup.objects.bulk_create([
+                ReservationRollup(
+                    date=date,
+                    parking_lot_id=parking_lot_id,
+                    hour=hour,
+                    total_reservations=count,
+                    total_revenue=revenue,
+                    total_duration=duration
+                )
+                for (date, parking_lot_id, hour), (count, revenue, duration) in expected.items()
+            ], batch_size=1000)
+    return drift
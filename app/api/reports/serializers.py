@@ -9,7 +9,7 @@ class DailyReportSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'date', 'total_revenue', 'total_reservations',
             'average_duration', 'peak_hour', 'occupancy_rate',
-            'created_at', 'updated_at'
+            'peak_occupancy_rate', 'created_at', 'updated_at'
         ]
         read_only_fields = ('created_at', 'updated_at')
 
@@ -25,6 +25,16 @@ class MonthlyReportSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('created_at', 'updated_at')
 
+class YearlyReportSerializer(serializers.Serializer):
+    """Serializer for yearly reports merged from daily figures."""
+    
+    year = serializers.IntegerField()
+    total_revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total_reservations = serializers.IntegerField()
+    average_duration = serializers.FloatField()
+    average_occupancy_rate = serializers.FloatField()
+    peak_day = serializers.DateField(allow_null=True)
+
 class ParkingLotReportSerializer(serializers.ModelSerializer):
     """Serializer for parking lot reports."""
     
@@ -37,8 +47,8 @@ class ParkingLotReportSerializer(serializers.ModelSerializer):
         model = ParkingLotReport
         fields = [
             'id', 'parking_lot', 'parking_lot_name', 'date', 'total_revenue',
-            'total_reservations', 'occupancy_rate', 'average_duration',
-            'peak_hour', 'created_at', 'updated_at'
+            'total_reservations', 'occupancy_rate', 'peak_occupancy_rate',
+            'average_duration', 'peak_hour', 'created_at', 'updated_at'
         ]
         read_only_fields = ('created_at', 'updated_at')
 
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+from app.api.reservations.models import Reservation
+from app.api.reservations.signals import reservations_bulk_created
+from .cache import invalidate_dates
+from .models import DailyReport
+from .rollups import snapshot, stored_snapshot, reservation_deltas, apply_deltas, apply_reservations
+
+
+@receiver(post_init, sender=Reservation)
+def remember_rollup_state(sender, instance, **kwargs):
+    """Keep the loaded state so later saves can be applied as deltas."""
+    instance._rollup_state = snapshot(instance)
+
+
+@receiver(pre_save, sender=Reservation)
+def load_rollup_state(sender, instance, **kwargs):
+    """Fall back to the stored row when the loaded state is unknown (deferred fields)."""
+    if not instance._state.adding and getattr(instance, '_rollup_state', None) is None:
+        instance._rollup_state = stored_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=Reservation)
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    """Apply the reservation's change (create, cancel, complete, edit) to the rollups."""
+    new_state = snapshot(instance) or stored_snapshot(instance.pk)
+    old_state = None if created else getattr(instance, '_rollup_state', None)
+    if old_state != new_state:
+        apply_deltas(reservation_deltas(old_state, new_state))
+    instance._rollup_state = new_state
+
+
+@receiver(post_delete, sender=Reservation)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    """Remove a deleted reservation's contribution from the rollups."""
+    old_state = getattr(instance, '_rollup_state', None) or snapshot(instance)
+    if old_state is not None:
+        apply_deltas(reservation_deltas(old_state, None))
+
+
+@receiver(reservations_bulk_created, sender=Reservation)
+def update_rollups_on_bulk_create(sender, reservations, **kwargs):
+    """Add a bulk insert to the rollups in one pass."""
+    apply_reservations(reservations)
+
+
+@receiver(post_save, sender=DailyReport)
+@receiver(post_delete, sender=DailyReport)
+def invalidate_report_cache(sender, instance, **kwargs):
+    """Drop cached range reports that include a regenerated daily report."""
+    invalidate_dates([instance.date])
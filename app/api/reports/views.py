@@ -1,20 +1,22 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
 from django.utils import timezone
 from django.db.models import Count, Sum, Avg
 from django.db.models.functions import TruncDate, TruncHour
-from datetime import timedelta, datetime
-import csv
-from django.http import HttpResponse
+from datetime import date, timedelta, datetime
+from django.http import StreamingHttpResponse
 from django.core.exceptions import ValidationError
-from .models import DailyReport, ParkingLotReport, MonthlyReport
+from . import analytics, cache as report_cache
+from .exports import EXPORTS, stream_csv
+from .models import DailyReport, ParkingLotReport, MonthlyReport, merge_daily_reports
 from .serializers import (
     DailyReportSerializer, ParkingLotReportSerializer,
     ReportSummarySerializer, DailyReservationsSerializer,
     RevenueSerializer, PeakHoursSerializer,
     UserDemographicsSerializer, MonthlyReportSerializer,
-    DateRangeReportSerializer
+    DateRangeReportSerializer, YearlyReportSerializer
 )
 from app.api.reservations.models import Reservation
 from app.api.parking_lots.models import ParkingLot
@@ -119,49 +121,49 @@ class ReportViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get summary of current day's statistics."""
-        today = timezone.now().date()
-        yesterday = today - timedelta(days=1)
+        today = timezone.localdate()
         
-        # Get today's data
-        today_reservations = Reservation.objects.filter(
-            start_time__date=today,
-            status__in=['active', 'completed']
-        )
-        today_revenue = sum(r.total_cost for r in today_reservations)
-        today_count = today_reservations.count()
-        today_duration = sum(r.duration for r in today_reservations) / today_count if today_count > 0 else 0
-        
-        # Get yesterday's data for comparison
-        yesterday_reservations = Reservation.objects.filter(
-            start_time__date=yesterday,
-            status__in=['active', 'completed']
+        def build_summary():
+            # Yesterday comes from its stored daily report; today from the rollups
+            yesterday_totals = merge_daily_reports(today - timedelta(days=1), today - timedelta(days=1))
+            today_totals = merge_daily_reports(today, today)
+            
+            # Calculate overall parking utilization
+            spaces = ParkingLot.objects.aggregate(
+                total=Sum('total_spaces'),
+                available=Sum('available_spaces')
+            )
+            total_spaces = spaces['total'] or 0
+            occupied_spaces = total_spaces - (spaces['available'] or 0)
+            utilization = (occupied_spaces / total_spaces * 100) if total_spaces > 0 else 0
+            
+            data = {
+                'total_revenue': today_totals['total_revenue'],
+                'daily_reservations': today_totals['total_reservations'],
+                'parking_utilization': utilization,
+                'average_duration': today_totals['average_duration'],
+                'revenue_change': today_totals['total_revenue'] - yesterday_totals['total_revenue'],
+                'reservation_change': today_totals['total_reservations'] - yesterday_totals['total_reservations'],
+                'utilization_change': utilization - yesterday_totals['average_occupancy_rate'],
+                'duration_change': today_totals['average_duration'] - yesterday_totals['average_duration']
+            }
+            return ReportSummarySerializer(data).data
+        
+        data, hit = report_cache.single_flight(
+            'summary',
+            f'reports:summary:{today.isoformat()}',
+            build_summary,
+            settings.REPORT_SUMMARY_CACHE_TIMEOUT
         )
-        yesterday_revenue = sum(r.total_cost for r in yesterday_reservations)
-        yesterday_count = yesterday_reservations.count()
-        yesterday_duration = sum(r.duration for r in yesterday_reservations) / yesterday_count if yesterday_count > 0 else 0
-        
-        # Calculate overall parking utilization
-        total_spaces = sum(lot.total_spaces for lot in ParkingLot.objects.all())
-        occupied_spaces = sum(lot.total_spaces - lot.available_spaces for lot in ParkingLot.objects.all())
-        utilization = (occupied_spaces / total_spaces * 100) if total_spaces > 0 else 0
-        
-        # Calculate yesterday's utilization
-        yesterday_utilization = DailyReport.objects.filter(date=yesterday).first()
-        yesterday_utilization = yesterday_utilization.occupancy_rate if yesterday_utilization else 0
-        
-        data = {
-            'total_revenue': today_revenue,
-            'daily_reservations': today_count,
-            'parking_utilization': utilization,
-            'average_duration': today_duration,
-            'revenue_change': today_revenue - yesterday_revenue,
-            'reservation_change': today_count - yesterday_count,
-            'utilization_change': utilization - yesterday_utilization,
-            'duration_change': today_duration - yesterday_duration
-        }
-        
-        serializer = ReportSummarySerializer(data)
-        return Response(serializer.data)
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+    
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Get hit and miss counters of the cached report endpoints."""
+        return Response({
+            name: report_cache.stats(name)
+            for name in ('summary', 'date_range')
+        })
     
     @action(detail=False, methods=['get'])
     def monthly(self, request):
@@ -174,6 +176,31 @@ class ReportViewSet(viewsets.ModelViewSet):
         serializer = MonthlyReportSerializer(report)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def yearly(self, request):
+        """Get a yearly report merged from the stored daily figures."""
+        try:
+            year = int(request.query_params.get('year', timezone.now().year))
+            start_date, end_date = date(year, 1, 1), date(year, 12, 31)
+        except ValueError:
+            return Response(
+                {'detail': 'Invalid year.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        totals = merge_daily_reports(start_date, end_date)
+        data = {
+            'year': year,
+            'total_revenue': totals['total_revenue'],
+            'total_reservations': totals['total_reservations'],
+            'average_duration': totals['average_duration'],
+            'average_occupancy_rate': totals['average_occupancy_rate'],
+            'peak_day': totals['peak']
+        }
+        
+        serializer = YearlyReportSerializer(data)
+        return Response(serializer.data)
+    
     @action(detail=False, methods=['get'])
     def date_range(self, request):
         """Get report for a custom date range."""
@@ -195,53 +222,36 @@ class ReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get reservations for the date range
-        reservations = Reservation.objects.filter(
-            start_time__date__range=[start_date, end_date],
-            status__in=['active', 'completed']
-        )
-        
-        # Calculate summary statistics
-        total_revenue = sum(r.total_cost for r in reservations)
-        total_reservations = reservations.count()
-        average_duration = sum(r.duration for r in reservations) / total_reservations if total_reservations > 0 else 0
-        
-        # Calculate average occupancy rate
-        daily_reports = DailyReport.objects.filter(
-            date__range=[start_date, end_date]
-        )
-        average_occupancy_rate = sum(report.occupancy_rate for report in daily_reports) / len(daily_reports) if daily_reports else 0
-        
-        # Get daily data
-        daily_data = reservations.annotate(
-            date=TruncDate('start_time')
-        ).values('date').annotate(
-            reservations=Count('id')
-        ).order_by('date')
-        
-        # Get revenue data by date
-        revenue_data = []
-        for date in daily_data:
-            date_reservations = reservations.filter(start_time__date=date['date'])
-            revenue = sum(r.total_cost for r in date_reservations)
-            revenue_data.append({
-                'date': date['date'],
-                'revenue': revenue
-            })
-        
-        data = {
-            'start_date': start_date,
-            'end_date': end_date,
-            'total_revenue': total_revenue,
-            'total_reservations': total_reservations,
-            'average_duration': average_duration,
-            'average_occupancy_rate': average_occupancy_rate,
-            'daily_data': daily_data,
-            'revenue_data': revenue_data
-        }
+        if end_date < start_date:
+            return Response(
+                {'detail': 'end_date must not be before start_date.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        serializer = DateRangeReportSerializer(data)
-        return Response(serializer.data)
+        def build_report():
+            # Per-day revenue, counts and durations come from the stored
+            # daily figures in a constant number of grouped queries
+            totals = merge_daily_reports(start_date, end_date)
+            data = {
+                'start_date': start_date,
+                'end_date': end_date,
+                'total_revenue': totals['total_revenue'],
+                'total_reservations': totals['total_reservations'],
+                'average_duration': totals['average_duration'],
+                'average_occupancy_rate': totals['average_occupancy_rate'],
+                'daily_data': [
+                    {'date': day['bucket'], 'reservations': day['reservations']}
+                    for day in totals['days']
+                ],
+                'revenue_data': [
+                    {'date': day['bucket'], 'revenue': day['revenue']}
+                    for day in totals['days']
+                ]
+            }
+            return DateRangeReportSerializer(data).data
+        
+        data, hit = report_cache.get_or_compute('date_range', start_date, end_date, build_report)
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
     
     @action(detail=False, methods=['get'])
     def export(self, request):
@@ -265,60 +275,19 @@ class ReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{report_type}_report_{start_date}_{end_date}.csv"'
-        
-        writer = csv.writer(response)
-        
-        if report_type == 'daily':
-            reports = DailyReport.objects.filter(date__range=[start_date, end_date])
-            writer.writerow(['Date', 'Total Revenue', 'Total Reservations', 'Average Duration', 'Peak Hour', 'Occupancy Rate'])
-            for report in reports:
-                writer.writerow([
-                    report.date,
-                    report.total_revenue,
-                    report.total_reservations,
-                    report.average_duration,
-                    report.peak_hour,
-                    report.occupancy_rate
-                ])
-        elif report_type == 'monthly':
-            reports = MonthlyReport.objects.filter(
-                year__gte=start_date.year,
-                year__lte=end_date.year,
-                month__gte=start_date.month if start_date.year == end_date.year else 1,
-                month__lte=end_date.month if start_date.year == end_date.year else 12
-            )
-            writer.writerow(['Year', 'Month', 'Total Revenue', 'Total Reservations', 'Average Duration', 'Average Occupancy Rate', 'Peak Day'])
-            for report in reports:
-                writer.writerow([
-                    report.year,
-                    report.month,
-                    report.total_revenue,
-                    report.total_reservations,
-                    report.average_duration,
-                    report.average_occupancy_rate,
-                    report.peak_day
-                ])
-        elif report_type == 'parking_lot':
-            reports = ParkingLotReport.objects.filter(date__range=[start_date, end_date])
-            writer.writerow(['Parking Lot', 'Date', 'Total Revenue', 'Total Reservations', 'Occupancy Rate', 'Average Duration', 'Peak Hour'])
-            for report in reports:
-                writer.writerow([
-                    report.parking_lot.name,
-                    report.date,
-                    report.total_revenue,
-                    report.total_reservations,
-                    report.occupancy_rate,
-                    report.average_duration,
-                    report.peak_hour
-                ])
-        else:
+        if report_type not in EXPORTS:
             return Response(
-                {'detail': 'Invalid report type. Use daily, monthly, or parking_lot.'},
+                {'detail': 'Invalid report type. Use daily, monthly, parking_lot, or reservations.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Rows are pulled from a server-side cursor in chunks while streaming
+        header, rows = EXPORTS[report_type]
+        response = StreamingHttpResponse(
+            stream_csv(header, rows(start_date, end_date)),
+            content_type='text/csv'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{report_type}_report_{start_date}_{end_date}.csv"'
         return response
     
     @action(detail=False, methods=['get'])
@@ -327,9 +296,8 @@ class ReportViewSet(viewsets.ModelViewSet):
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=6)
         
-        reservations = Reservation.objects.filter(
-            start_time__date__range=[start_date, end_date],
-            status__in=['active', 'completed']
+        reservations = Reservation.objects.reportable().filter(
+            start_time__date__range=[start_date, end_date]
         ).annotate(
             date=TruncDate('start_time')
         ).values('date').annotate(
@@ -346,9 +314,8 @@ class ReportViewSet(viewsets.ModelViewSet):
         start_date = end_date - timedelta(days=6)
         
         # Get reservations for the date range
-        reservations = Reservation.objects.filter(
-            start_time__date__range=[start_date, end_date],
-            status__in=['active', 'completed']
+        reservations = Reservation.objects.reportable().filter(
+            start_time__date__range=[start_date, end_date]
         )
         
         # Calculate revenue by date
@@ -369,9 +336,8 @@ class ReportViewSet(viewsets.ModelViewSet):
         """Get peak hours data for today."""
         today = timezone.now().date()
         
-        reservations = Reservation.objects.filter(
-            start_time__date=today,
-            status__in=['active', 'completed']
+        reservations = Reservation.objects.reportable().filter(
+            start_time__date=today
         ).annotate(
             hour=TruncHour('start_time')
         ).values('hour').annotate(
@@ -401,6 +367,50 @@ class ReportViewSet(viewsets.ModelViewSet):
         serializer = UserDemographicsSerializer(data, many=True)
         return Response(serializer.data)
     
+    def _analytics_columns(self, request):
+        """Load the reservations selected by ``start_date``, ``end_date`` and ``lots``."""
+        end_date = request.query_params.get('end_date')
+        start_date = request.query_params.get('start_date')
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else timezone.localdate()
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else end_date - timedelta(days=29)
+        lots = request.query_params.get('lots')
+        lot_ids = [int(lot_id) for lot_id in lots.split(',') if lot_id.strip()] if lots else None
+        return start_date, end_date, analytics.ReservationColumns.load(start_date, end_date, lot_ids)
+    
+    def _analytics_response(self, request, compute):
+        try:
+            start_date, end_date, columns = self._analytics_columns(request)
+        except ValueError:
+            return Response(
+                {'detail': 'Use YYYY-MM-DD dates and comma separated lot IDs.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'start_date': start_date,
+            'end_date': end_date,
+            'results': compute(columns)
+        })
+    
+    @action(detail=False, methods=['get'])
+    def hourly_distribution(self, request):
+        """Get reservations and revenue per starting hour (default: last 30 days)."""
+        return self._analytics_response(request, analytics.hourly_distribution)
+    
+    @action(detail=False, methods=['get'])
+    def duration_distribution(self, request):
+        """Get the reservation duration histogram and percentiles."""
+        return self._analytics_response(request, analytics.duration_distribution)
+    
+    @action(detail=False, methods=['get'])
+    def revenue_heatmap(self, request):
+        """Get revenue by weekday and hour."""
+        return self._analytics_response(request, analytics.revenue_heatmap)
+    
+    @action(detail=False, methods=['get'])
+    def revenue_by_lot(self, request):
+        """Get reservations, revenue and average duration per parking lot."""
+        return self._analytics_response(request, analytics.revenue_by_lot)
+    
     @action(detail=True, methods=['get'])
     def parking_lot(self, request, pk=None):
         """Get detailed report for a specific parking lot."""
@@ -438,6 +448,27 @@ class ReportViewSet(viewsets.ModelViewSet):
         serializer = ParkingLotReportSerializer(report)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'])
+    def generate_lot_reports(self, request):
+        """Generate the reports of every parking lot for a date in one batch."""
+        date_str = request.data.get('date')
+        if date_str:
+            try:
+                date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {'detail': 'Invalid date format. Use YYYY-MM-DD.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            date = timezone.now().date()
+        
+        reports = ParkingLotReport.generate_for_all_lots(date=date)
+        return Response(
+            {'date': date, 'generated': len(reports)},
+            status=status.HTTP_201_CREATED
+        )
+    
     @action(detail=False, methods=['get'])
     def daily(self, request):
         """Get daily report for a specific date."""
@@ -0,0 +1,31 @@
+import os
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+# Kept free of model imports: spawned workers load this module to run the
+# initializer before Django is set up
+
+
+def database_names():
+    """Names of the configured databases, to hand to ``init_worker``."""
+    return {alias: connections[alias].settings_dict['NAME'] for alias in connections}
+
+
+def init_worker(settings_module, databases):
+    """
+    Prepare a report worker process.
+
+    Spawned workers start without Django, so it is set up here with the
+    parent's settings module and pointed at the parent's databases, which
+    differ from the settings during test runs. Every worker then opens its
+    own database connections.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    if not apps.ready:
+        django.setup()
+    for alias, name in databases.items():
+        settings.DATABASES[alias]['NAME'] = name
+        connections[alias].settings_dict['NAME'] = name
+    connections.close_all()
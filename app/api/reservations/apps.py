@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ReservationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app.api.reservations"
+
+    def ready(self):
+        import app.api.reservations.signals  # noqa
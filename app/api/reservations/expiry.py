@@ -0,0 +1,151 @@
+import logging
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, Min, OuterRef
+from django.utils import timezone
+from app.api.notification.models import Notification
+from app.api.parking_lots import availability
+from app.api.parking_lots.counters import release_spaces
+from app.api.parking_lots.models import ParkingLot, ParkingSpace
+from app.api.realtime.utils import send_notifications_to_users
+from app.utils.scheduler import BackgroundScheduler
+from .intervals import invalidate
+from .models import Reservation
+
+logger = logging.getLogger(__name__)
+
+# Reservations expired per UPDATE; a sweep repeats until the backlog is empty
+SWEEP_BATCH_SIZE = 1000
+
+# Shortest wait between sweeps, so rows locked by another sweeper are not spun on
+MIN_SLEEP = 0.5
+
+EXPIRE_SQL = f"""
+    WITH due AS (
+        SELECT id FROM {Reservation._meta.db_table}
+        WHERE status = %s AND end_time <= %s
+        ORDER BY end_time
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE {Reservation._meta.db_table} AS reservation
+    SET status = %s, updated_at = %s
+    FROM due
+    WHERE reservation.id = due.id
+    RETURNING reservation.id, reservation.user_id, reservation.parking_lot_id, reservation.parking_space_id
+"""
+
+
+def expire_due(now=None, limit=SWEEP_BATCH_SIZE):
+    """
+    Expire up to ``limit`` active reservations whose ``end_time`` has passed.
+
+    Statuses flip in one ``UPDATE ... RETURNING``; rows locked by another
+    sweeper are skipped, so concurrent sweepers split the backlog. The
+    returned rows then free their spaces and lot counters in bulk and each
+    user gets one notification after commit. Returns the expired
+    ``(id, user_id, parking_lot_id, parking_space_id)`` rows.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(EXPIRE_SQL, [
+                Reservation.Status.ACTIVE, now, limit, Reservation.Status.EXPIRED, timezone.now()
+            ])
+            rows = cursor.fetchall()
+        if not rows:
+            return rows
+
+        space_ids = {row[3] for row in rows}
+        still_booked = Reservation.objects.filter(parking_space=OuterRef('pk'), status=Reservation.Status.ACTIVE)
+        ParkingSpace.objects.filter(pk__in=space_ids, status=ParkingSpace.Status.RESERVED).exclude(
+            Exists(still_booked)
+        ).update(status=ParkingSpace.Status.AVAILABLE, current_user=None, updated_at=timezone.now())
+        release_spaces(Counter(row[2] for row in rows))
+        availability.touch({row[2] for row in rows}, space_ids)
+        invalidate(space_ids)
+
+        transaction.on_commit(lambda: notify_expired(rows))
+    return rows
+
+
+def notify_expired(rows):
+    """Store one notification per expired reservation and send one message per user."""
+    lot_names = dict(ParkingLot.objects.filter(pk__in={row[2] for row in rows}).values_list('id', 'name'))
+    by_user = defaultdict(list)
+    for reservation_id, user_id, parking_lot_id, _ in rows:
+        by_user[user_id].append({'reservation_id': reservation_id, 'parking_lot': lot_names.get(parking_lot_id)})
+
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=user_id,
+            type=Notification.NotificationType.RESERVATION_EXPIRED,
+            message="Your reservation has expired",
+            data=reservation
+        )
+        for user_id, reservations in by_user.items()
+        for reservation in reservations
+    ], batch_size=SWEEP_BATCH_SIZE)
+    send_notifications_to_users(
+        (
+            user_id,
+            "Your reservation has expired" if len(reservations) == 1 else f"{len(reservations)} of your reservations have expired",
+            {"reservations": reservations}
+        )
+        for user_id, reservations in by_user.items()
+    )
+
+
+def sweep(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Expire everything due, one batch per transaction; returns the number expired."""
+    expired = 0
+    while True:
+        rows = expire_due(now, batch_size)
+        expired += len(rows)
+        if len(rows) < batch_size:
+            return expired
+
+
+def next_expiry():
+    """Earliest ``end_time`` of an active reservation, or ``None``."""
+    return Reservation.objects.filter(status=Reservation.Status.ACTIVE).aggregate(
+        next_expiry=Min('end_time')
+    )['next_expiry']
+
+
+class ExpiryScheduler(BackgroundScheduler):
+    """
+    Runs ``sweep`` when the next active reservation ends.
+
+    Instead of polling, the scheduler sleeps until the earliest known
+    ``end_time``. New bookings in this process wake it through
+    ``schedule``; bookings made elsewhere are picked up at the latest after
+    ``max_sleep`` seconds.
+    """
+
+    name = 'reservation-expiry'
+
+    def __init__(self, batch_size=SWEEP_BATCH_SIZE, max_sleep=None):
+        super().__init__(max_sleep if max_sleep is not None else settings.RESERVATION_EXPIRY_MAX_SLEEP)
+        self.batch_size = batch_size
+        self.deadline = None
+
+    def schedule(self, end_time):
+        """Wake up early if ``end_time`` is before the current deadline."""
+        if self.deadline is None or end_time < self.deadline:
+            self.deadline = end_time
+            self.wake()
+
+    def tick(self):
+        """Sweep due reservations and return the seconds until the next run."""
+        expired = sweep(batch_size=self.batch_size)
+        if expired:
+            logger.info("Expired %s reservations", expired)
+        self.deadline = next_expiry()
+        if self.deadline is None:
+            return self.max_sleep
+        return min(self.max_sleep, max(MIN_SLEEP, (self.deadline - timezone.now()).total_seconds()))
+
+
+scheduler = ExpiryScheduler()
@@ -0,0 +1,121 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import Reservation
+
+INDEX_KEY = 'reservations:intervals:{space_id}'
+
+# Entries are dropped on every write in this process; the TTL bounds how
+# long another process' cache (e.g. locmem) may serve an outdated index.
+# Reservation.save() still performs the authoritative overlap check.
+INDEX_TIMEOUT = 60
+
+
+class SpaceIntervals:
+    """
+    Sorted, non-overlapping busy intervals of one parking space.
+
+    Overlap checks and free-window searches bisect the start times, so a
+    lookup is O(log n) in the number of active reservations.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            # Merge touching or overlapping intervals into one busy block
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, end):
+        """Whether ``start``..``end`` intersects any busy interval."""
+        index = bisect_right(self.starts, start)
+        if index and self.ends[index - 1] > start:
+            return True
+        return index < len(self.starts) and self.starts[index] < end
+
+    def free_windows(self, after, count=5, min_duration=timedelta(0), until=None):
+        """
+        Up to ``count`` free ``(start, end)`` windows from ``after`` onwards.
+
+        Windows shorter than ``min_duration`` are skipped. The last window
+        is open ended (``end`` is ``None``) unless ``until`` is given.
+        """
+        windows = []
+        cursor = after
+        index = bisect_right(self.starts, after)
+        if index and self.ends[index - 1] > cursor:
+            cursor = self.ends[index - 1]
+        while len(windows) < count and (until is None or cursor < until):
+            next_start = self.starts[index] if index < len(self.starts) else None
+            end = min(filter(None, (next_start, until)), default=None)
+            if end is None or (end > cursor and end - cursor >= min_duration):
+                windows.append((cursor, end))
+            if next_start is None or (until is not None and next_start >= until):
+                break
+            cursor = max(cursor, self.ends[index])
+            index += 1
+        return windows
+
+
+def _load(space_ids):
+    intervals = defaultdict(list)
+    rows = Reservation.objects.filter(
+        parking_space_id__in=space_ids,
+        status=Reservation.Status.ACTIVE
+    ).order_by().values_list('parking_space_id', 'start_time', 'end_time')
+    for space_id, start, end in rows:
+        intervals[space_id].append((start, end))
+    return {space_id: SpaceIntervals(intervals[space_id]) for space_id in space_ids}
+
+
+def get_intervals(space_id):
+    """Busy intervals of a space, loaded from the database on first use."""
+    return get_many_intervals([space_id])[space_id]
+
+
+def get_many_intervals(space_ids):
+    """Busy intervals of many spaces; cache misses are loaded in one query."""
+    keys = {space_id: INDEX_KEY.format(space_id=space_id) for space_id in space_ids}
+    cached = cache.get_many(keys.values())
+    result = {
+        space_id: cached[key]
+        for space_id, key in keys.items()
+        if key in cached
+    }
+    missing = [space_id for space_id in space_ids if space_id not in result]
+    if missing:
+        loaded = _load(missing)
+        cache.set_many({keys[space_id]: loaded[space_id] for space_id in missing}, INDEX_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def has_overlap(space_id, start, end):
+    """Whether a new booking of ``space_id`` for ``start``..``end`` would overlap."""
+    return get_intervals(space_id).overlaps(start, end)
+
+
+def invalidate(space_ids):
+    """
+    Drop cached intervals after a reservation write.
+
+    The entry is removed immediately and again after commit, so a reader
+    cannot keep an index loaded before the write became visible.
+    """
+    keys = [INDEX_KEY.format(space_id=space_id) for space_id in set(space_ids)]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def free_windows(space_id, after=None, **kwargs):
+    return get_intervals(space_id).free_windows(after or timezone.now(), **kwargs)
@@ -0,0 +1,43 @@
+import signal
+from django.core.management.base import BaseCommand, CommandError
+from app.api.reservations.expiry import SWEEP_BATCH_SIZE, ExpiryScheduler, sweep
+
+
+class Command(BaseCommand):
+    help = 'Expire reservations as they end; runs as a daemon that wakes at the next end time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Expire everything currently due and exit'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SWEEP_BATCH_SIZE,
+            help='Reservations expired per transaction'
+        )
+        parser.add_argument(
+            '--max-sleep',
+            type=int,
+            default=None,
+            help='Longest wait in seconds before checking for new bookings'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        if options['once']:
+            expired = sweep(batch_size=options['batch_size'])
+            self.stdout.write(f'Expired {expired} reservations')
+            return
+
+        scheduler = ExpiryScheduler(batch_size=options['batch_size'], max_sleep=options['max_sleep'])
+        signal.signal(signal.SIGTERM, lambda *args: scheduler.stop())
+        self.stdout.write('Expiring reservations as they end; press Ctrl+C to stop')
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            scheduler.stop()
@@ -0,0 +1,28 @@
+import signal
+from django.core.management.base import BaseCommand
+from app.api.reservations.reminders import ReminderScheduler, send_due_reminders
+
+
+class Command(BaseCommand):
+    help = 'Send "starts soon" reservation reminders; runs as a daemon driven by a timing wheel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send the reminders due now and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            sent = send_due_reminders()
+            self.stdout.write(f'Sent {sent} reminders')
+            return
+
+        scheduler = ReminderScheduler()
+        signal.signal(signal.SIGTERM, lambda *args: scheduler.stop())
+        self.stdout.write('Sending reservation reminders as they fall due; press Ctrl+C to stop')
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            scheduler.stop()
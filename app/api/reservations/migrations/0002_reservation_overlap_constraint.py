@@ -0,0 +1,69 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:25
+
+import app.api.reservations.models
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0003_occupancysample"),
+        ("reservations", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("status", "active")),
+                fields=["end_time"],
+                name="reservation_active_end_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("status", "active")),
+                fields=["start_time"],
+                name="reservation_active_start_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["user", "status", "-created_at"],
+                name="reservation_user_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["user", "-created_at"], name="reservation_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["parking_space", "status", "start_time", "end_time"],
+                name="reservation_space_time_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="reservation",
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                condition=models.Q(("status", "active")),
+                expressions=[
+                    ("parking_space", "="),
+                    (
+                        app.api.reservations.models.TsTzRange("start_time", "end_time"),
+                        "&&",
+                    ),
+                ],
+                name="reservation_no_overlapping_active",
+            ),
+        ),
+    ]
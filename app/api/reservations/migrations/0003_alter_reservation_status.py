@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0002_reservation_overlap_constraint"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reservation",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("active", "Active"),
+                    ("completed", "Completed"),
+                    ("cancelled", "Cancelled"),
+                    ("expired", "Expired"),
+                ],
+                default="active",
+                max_length=20,
+                verbose_name="status",
+            ),
+        ),
+    ]
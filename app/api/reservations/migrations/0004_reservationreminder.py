@@ -0,0 +1,51 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0003_alter_reservation_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReservationReminder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "offset_minutes",
+                    models.PositiveIntegerField(verbose_name="minutes before start"),
+                ),
+                ("sent_at", models.DateTimeField(verbose_name="sent at")),
+                (
+                    "reservation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminders",
+                        to="reservations.reservation",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "reservation reminder",
+                "verbose_name_plural": "reservation reminders",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="reservationreminder",
+            constraint=models.UniqueConstraint(
+                fields=("reservation", "offset_minutes"),
+                name="unique_reservation_reminder",
+            ),
+        ),
+    ]
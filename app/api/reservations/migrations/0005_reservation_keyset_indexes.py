@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0004_parkingspace_distance_to_entrance"),
+        ("reservations", "0004_reservationreminder"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="reservation",
+            name="reservation_user_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="reservation_user_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="reservation_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:02
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0004_parkingspace_distance_to_entrance"),
+        ("reservations", "0005_reservation_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="reservation",
+            name="plate_key",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.text.Upper(
+                    models.Func(
+                        models.F("vehicle_plate"),
+                        models.Value("[^A-Za-z0-9]"),
+                        models.Value(""),
+                        models.Value("g"),
+                        function="REGEXP_REPLACE",
+                        output_field=models.CharField(),
+                    )
+                ),
+                output_field=models.CharField(max_length=20),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["plate_key"],
+                name="reservation_plate_key_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["plate_key"],
+                name="reservation_plate_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("notes"), name="gin_trgm_ops"
+                ),
+                name="reservation_notes_trgm_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("parking_lots", "0004_parkingspace_distance_to_entrance"),
+        ("reservations", "0006_plate_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="hourly_rate",
+            field=models.DecimalField(
+                decimal_places=2, max_digits=6, null=True, verbose_name="hourly rate"
+            ),
+        ),
+        # Existing bookings keep the rate their lot charges today
+        migrations.RunSQL(
+            """
+            UPDATE reservations_reservation AS reservation
+            SET hourly_rate = lot.hourly_rate
+            FROM parking_lots_parkinglot AS lot
+            WHERE lot.id = reservation.parking_lot_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="reservation",
+            name="hourly_rate",
+            field=models.DecimalField(
+                decimal_places=2, max_digits=6, verbose_name="hourly rate"
+            ),
+        ),
+    ]
@@ -1,11 +1,117 @@
-from django.db import models
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Func, Q, Value, ExpressionWrapper, DurationField, FloatField, DecimalField
+from django.db.models.functions import Extract, Cast, Upper
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
+from app.api.parking_lots.counters import release_space, take_space
 from app.api.parking_lots.models import ParkingLot, ParkingSpace
+from app.utils.exception import EXCLUSION_VIOLATION
 from decimal import Decimal
+import re
 
 User = get_user_model()
 
+
+def duration_seconds_expression():
+    """SQL expression for the reservation length in seconds."""
+    interval = ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+    return Cast(Extract(interval, 'epoch'), FloatField())
+
+
+def duration_hours_expression():
+    """SQL expression for the reservation length in hours."""
+    return ExpressionWrapper(duration_seconds_expression() / Value(3600.0), output_field=FloatField())
+
+
+def total_cost_expression():
+    """SQL expression mirroring ``Reservation.total_cost`` (duration x booked hourly rate)."""
+    interval = ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+    seconds = Cast(Extract(interval, 'epoch'), DecimalField(max_digits=16, decimal_places=4))
+    return ExpressionWrapper(
+        seconds * F('hourly_rate') / Value(Decimal('3600')),
+        output_field=DecimalField(max_digits=16, decimal_places=4)
+    )
+
+
+def normalize_plate(value):
+    """Plate search key: letters and digits only, upper case ("abc-123" -> "ABC123")."""
+    return re.sub(r'[^A-Za-z0-9]', '', value or '').upper()
+
+
+def plate_key_expression():
+    """SQL expression mirroring ``normalize_plate`` for the generated ``plate_key`` column."""
+    return Upper(Func(
+        F('vehicle_plate'), Value('[^A-Za-z0-9]'), Value(''), Value('g'),
+        function='REGEXP_REPLACE',
+        output_field=models.CharField()
+    ))
+
+
+class TsTzRange(Func):
+    """``tstzrange(start, end)`` for range constraints and lookups."""
+
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+class ReservationConflict(ValueError):
+    """Raised when a booking overlaps an active reservation of the same space."""
+
+
+class ReservationQuerySet(models.QuerySet):
+    """QuerySet with database-side duration and cost calculations."""
+
+    def reportable(self):
+        """Reservations that count towards revenue reports."""
+        return self.filter(status__in=Reservation.REPORTABLE_STATUSES)
+
+    def with_duration_and_cost(self):
+        """Annotate ``duration_hours`` and ``cost_amount`` computed in the database."""
+        return self.annotate(
+            duration_hours=duration_hours_expression(),
+            cost_amount=total_cost_expression()
+        )
+
+    def plate(self, value, match='exact'):
+        """
+        Reservations whose normalized plate equals, starts with or contains ``value``.
+
+        Exact and prefix matches use the ``varchar_pattern_ops`` index on
+        ``plate_key``; substring matches use its trigram index.
+        """
+        key = normalize_plate(value)
+        if match == 'prefix':
+            return self.filter(plate_key__startswith=key)
+        elif match == 'contains':
+            return self.filter(plate_key__contains=key)
+        return self.filter(plate_key=key)
+
+    def search(self, text):
+        """
+        Free-text search over plate, notes, lot name and space number.
+
+        Plates match anywhere through the ``plate_key`` trigram index and
+        notes through their trigram index; lots and spaces are matched in
+        subqueries against their own, much smaller tables.
+        """
+        condition = (
+            Q(notes__icontains=text)
+            | Q(parking_lot__in=ParkingLot.objects.filter(name__icontains=text))
+            | Q(parking_space__in=ParkingSpace.objects.filter(space_number__icontains=text))
+        )
+        key = normalize_plate(text)
+        if key:
+            condition |= Q(plate_key__contains=key)
+        return self.filter(condition)
+
+    def for_listing(self):
+        """Join the related rows serializers read and annotate duration and cost."""
+        return self.select_related('user', 'parking_lot', 'parking_space').with_duration_and_cost()
+
+
 class Reservation(models.Model):
     """Model for parking reservations."""
     
@@ -13,6 +119,11 @@ class Reservation(models.Model):
         ACTIVE = 'active', _('Active')
         COMPLETED = 'completed', _('Completed')
         CANCELLED = 'cancelled', _('Cancelled')
+        EXPIRED = 'expired', _('Expired')
+    
+    # Statuses included in revenue and usage reports; an expired booking
+    # held its space for the whole period and is billed like a completed one
+    REPORTABLE_STATUSES = (Status.ACTIVE, Status.COMPLETED, Status.EXPIRED)
     
     parking_lot = models.ForeignKey(
         ParkingLot,
@@ -30,7 +141,17 @@ class Reservation(models.Model):
         related_name='reservations'
     )
     vehicle_plate = models.CharField(_('vehicle plate'), max_length=20)
+    # Normalized plate kept by the database, so every write path (including
+    # bulk_create and update()) stays searchable
+    plate_key = models.GeneratedField(
+        expression=plate_key_expression(),
+        output_field=models.CharField(max_length=20),
+        db_persist=True
+    )
     notes = models.TextField(_('notes'), blank=True)
+    # The lot's rate when the booking was made; costs and revenue reports
+    # keep using it after the lot's rate changes
+    hourly_rate = models.DecimalField(_('hourly rate'), max_digits=6, decimal_places=2)
     start_time = models.DateTimeField(_('start time'))
     end_time = models.DateTimeField(_('end time'))
     status = models.CharField(
@@ -42,10 +163,45 @@ class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ReservationQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('reservation')
         verbose_name_plural = _('reservations')
         ordering = ['-created_at']
+        constraints = [
+            # Two active reservations of one space may never overlap; enforced
+            # by the database so concurrent bookings cannot race past it
+            ExclusionConstraint(
+                name='reservation_no_overlapping_active',
+                expressions=[
+                    ('parking_space', RangeOperators.EQUAL),
+                    (TsTzRange('start_time', 'end_time'), RangeOperators.OVERLAPS),
+                ],
+                condition=Q(status='active'),
+            ),
+        ]
+        indexes = [
+            # Expiry sweeps and upcoming-reservation scans over active rows
+            models.Index(fields=['end_time'], condition=Q(status='active'), name='reservation_active_end_idx'),
+            models.Index(fields=['start_time'], condition=Q(status='active'), name='reservation_active_start_idx'),
+            # Per-user listings filtered by status, newest first
+            models.Index(fields=['user', 'status', '-created_at'], name='reservation_user_status_idx'),
+            # Keyset pages on (created_at, id), per user and for staff
+            models.Index(fields=['user', '-created_at', '-id'], name='reservation_user_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='reservation_created_idx'),
+            # Plate lookups: exact and prefix on the normalized key, substring
+            # through trigrams; free-text search of notes through trigrams
+            models.Index(fields=['plate_key'], opclasses=['varchar_pattern_ops'], name='reservation_plate_key_idx'),
+            GinIndex(fields=['plate_key'], opclasses=['gin_trgm_ops'], name='reservation_plate_trgm_idx'),
+            # icontains compiles to UPPER(notes) LIKE ..., so index that expression
+            GinIndex(OpClass(Upper('notes'), name='gin_trgm_ops'), name='reservation_notes_trgm_idx'),
+            # Availability lookups by space, status and time
+            models.Index(
+                fields=['parking_space', 'status', 'start_time', 'end_time'],
+                name='reservation_space_time_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"Reservation {self.id} - {self.user.get_full_name()}"
@@ -61,31 +217,33 @@ class Reservation(models.Model):
     @property
     def total_cost(self):
         """Calculate the total cost of the reservation."""
-        return self.duration * self.parking_lot.hourly_rate
+        return self.duration * self.hourly_rate
     
     def save(self, *args, **kwargs):
         """Override save to handle space status updates and validation."""
         is_new = self._state.adding
         
+        if is_new and self.end_time <= self.start_time:
+            raise ValueError("End time must be after start time")
+        if self.hourly_rate is None:
+            self.hourly_rate = self.parking_lot.hourly_rate
+        
+        # Overlaps are rejected by the exclusion constraint on insert/update;
+        # the savepoint rolls back the space counters when that happens
+        try:
+            with transaction.atomic():
+                self._update_space_status(is_new)
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            if getattr(e.__cause__, 'pgcode', None) == EXCLUSION_VIOLATION:
+                raise ReservationConflict("This space is already reserved for the selected time period") from e
+            raise
+    
+    def _update_space_status(self, is_new):
         if is_new:
-            # Validate time range
-            if self.end_time <= self.start_time:
-                raise ValueError("End time must be after start time")
-            
-            # Check for overlapping reservations
-            overlapping = Reservation.objects.filter(
-                parking_space=self.parking_space,
-                status=self.Status.ACTIVE,
-                start_time__lt=self.end_time,
-                end_time__gt=self.start_time
-            ).exists()
-            
-            if overlapping:
-                raise ValueError("This space is already reserved for the selected time period")
-            
             # Update parking lot available spaces first
-            self.parking_lot.available_spaces = self.parking_lot.available_spaces - 1
-            self.parking_lot.save()
+            if not take_space(self.parking_lot):
+                raise ValueError("No spaces are available in this parking lot")
             
             # Then update parking space status
             self.parking_space.status = ParkingSpace.Status.RESERVED
@@ -94,12 +252,39 @@ class Reservation(models.Model):
             
         elif self.status == self.Status.CANCELLED:
             # Update parking lot available spaces first
-            self.parking_lot.available_spaces = self.parking_lot.available_spaces + 1
-            self.parking_lot.save()
+            release_space(self.parking_lot)
             
             # Then update parking space status
             self.parking_space.status = ParkingSpace.Status.AVAILABLE
             self.parking_space.current_user = None
             self.parking_space.save()
-        
-        super().save(*args, **kwargs)
+
+
+class ReservationReminder(models.Model):
+    """
+    A "starts soon" reminder that was sent for a reservation.
+
+    One row per reservation and offset; the unique constraint is what makes
+    each reminder go out once, even with several schedulers running.
+    """
+    
+    reservation = models.ForeignKey(
+        Reservation,
+        on_delete=models.CASCADE,
+        related_name='reminders'
+    )
+    offset_minutes = models.PositiveIntegerField(_('minutes before start'))
+    sent_at = models.DateTimeField(_('sent at'))
+    
+    class Meta:
+        verbose_name = _('reservation reminder')
+        verbose_name_plural = _('reservation reminders')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['reservation', 'offset_minutes'],
+                name='unique_reservation_reminder'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Reservation {self.reservation_id} - {self.offset_minutes} min"
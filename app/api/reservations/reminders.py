@@ -0,0 +1,247 @@
+import logging
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from app.api.notification.models import Notification
+from app.api.parking_lots.models import ParkingLot
+from app.api.realtime.utils import send_notifications_to_users
+from app.utils.scheduler import BackgroundScheduler
+from .models import Reservation, ReservationReminder
+
+logger = logging.getLogger(__name__)
+
+WHEEL_RESOLUTION = timedelta(seconds=15)
+WHEEL_SIZE = 240
+
+# How often the wheel is refilled from the database; bookings made in
+# other processes are picked up within this interval
+RELOAD_INTERVAL = timedelta(minutes=5)
+
+CLAIM_SQL = f"""
+    WITH claimed AS (
+        INSERT INTO {ReservationReminder._meta.db_table} (reservation_id, offset_minutes, sent_at)
+        SELECT reservation.id, due.offset_minutes, %s
+        FROM unnest(%s::bigint[], %s::integer[]) AS due(reservation_id, offset_minutes)
+        JOIN {Reservation._meta.db_table} AS reservation ON reservation.id = due.reservation_id
+        WHERE reservation.status = %s AND reservation.start_time > %s
+        ON CONFLICT (reservation_id, offset_minutes) DO NOTHING
+        RETURNING reservation_id, offset_minutes
+    )
+    SELECT claimed.reservation_id, claimed.offset_minutes, reservation.user_id,
+           reservation.parking_lot_id, reservation.start_time
+    FROM claimed
+    JOIN {Reservation._meta.db_table} AS reservation ON reservation.id = claimed.reservation_id
+"""
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel: ``size`` slots of ``resolution`` each.
+
+    Adding an entry and collecting due entries cost O(1) per entry. Entries
+    due more than one revolution ahead are refused and must be added again
+    later; entries already due land in the next slot.
+    """
+
+    def __init__(self, start, resolution=WHEEL_RESOLUTION, size=WHEEL_SIZE):
+        self.resolution = resolution.total_seconds()
+        self.size = size
+        self.slots = [[] for _ in range(size)]
+        self.cursor = self._tick(start)
+
+    def _tick(self, moment):
+        return math.floor(moment.timestamp() / self.resolution)
+
+    def _time(self, tick):
+        return datetime.fromtimestamp(tick * self.resolution, tz=dt_timezone.utc)
+
+    def __len__(self):
+        return sum(len(slot) for slot in self.slots)
+
+    @property
+    def horizon(self):
+        """Entries due before this moment fit on the wheel."""
+        return self._time(self.cursor + self.size)
+
+    def add(self, due, entry):
+        tick = max(self._tick(due), self.cursor)
+        if tick >= self.cursor + self.size:
+            return False
+        self.slots[tick % self.size].append(entry)
+        return True
+
+    def advance(self, now):
+        """Remove and return the entries of every slot up to ``now``."""
+        target = self._tick(now)
+        due = []
+        for tick in range(self.cursor, min(target + 1, self.cursor + self.size)):
+            slot = tick % self.size
+            due.extend(self.slots[slot])
+            self.slots[slot] = []
+        self.cursor = max(self.cursor, target + 1)
+        return due
+
+    def next_due(self):
+        """Start of the first non-empty slot, or ``None``."""
+        for tick in range(self.cursor, self.cursor + self.size):
+            if self.slots[tick % self.size]:
+                return self._time(tick)
+        return None
+
+
+def upcoming(start, end, offsets):
+    """
+    ``(remind_at, (reservation_id, offset))`` for unsent reminders of active
+    reservations starting after ``start`` and due before ``end``.
+
+    Uses the partial index on ``start_time`` of active reservations.
+    """
+    window = Reservation.objects.filter(
+        status=Reservation.Status.ACTIVE,
+        start_time__gt=start,
+        start_time__lt=end + timedelta(minutes=max(offsets))
+    )
+    sent = set(
+        ReservationReminder.objects.filter(reservation__in=window).values_list('reservation_id', 'offset_minutes')
+    )
+    for reservation_id, start_time in window.order_by().values_list('id', 'start_time'):
+        for offset in offsets:
+            remind_at = start_time - timedelta(minutes=offset)
+            if remind_at < end and (reservation_id, offset) not in sent:
+                yield remind_at, (reservation_id, offset)
+
+
+def deliver(due, now=None):
+    """
+    Claim and send reminders for ``(reservation_id, offset)`` pairs.
+
+    The claim is one ``INSERT ... ON CONFLICT DO NOTHING``; only pairs that
+    were not sent before and whose reservation is still active and upcoming
+    are returned, so concurrent schedulers never send the same reminder.
+    Notifications are stored in bulk and sent through the channel layer in
+    one batch after commit. Returns the number of reminders claimed.
+    """
+    if not due:
+        return 0
+    now = now or timezone.now()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(CLAIM_SQL, [
+                now,
+                [reservation_id for reservation_id, _ in due],
+                [offset for _, offset in due],
+                Reservation.Status.ACTIVE,
+                now,
+            ])
+            rows = cursor.fetchall()
+        if not rows:
+            return 0
+
+        # When several offsets of one reservation are due together (e.g. a
+        # late booking) all are claimed but only the closest one is sent
+        closest = {}
+        for row in rows:
+            if row[0] not in closest or row[1] < closest[row[0]][1]:
+                closest[row[0]] = row
+        lot_names = dict(ParkingLot.objects.filter(pk__in={row[3] for row in rows}).values_list('id', 'name'))
+        by_user = defaultdict(list)
+        for reservation_id, _, user_id, parking_lot_id, start_time in closest.values():
+            by_user[user_id].append({
+                "reservation_id": reservation_id,
+                "parking_lot": lot_names.get(parking_lot_id),
+                "start_time": start_time.isoformat(),
+                "minutes": max(0, round((start_time - now).total_seconds() / 60)),
+            })
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                type=Notification.NotificationType.UPCOMING_RESERVATION,
+                message=f"Your reservation starts in {reminder['minutes']} minutes",
+                data=reminder
+            )
+            for user_id, reminders in by_user.items()
+            for reminder in reminders
+        ], batch_size=1000)
+        transaction.on_commit(lambda: send_notifications_to_users(
+            (
+                user_id,
+                f"Your reservation starts in {reminders[0]['minutes']} minutes"
+                if len(reminders) == 1 else f"{len(reminders)} of your reservations start soon",
+                {"reminders": reminders}
+            )
+            for user_id, reminders in by_user.items()
+        ))
+    return len(rows)
+
+
+def send_due_reminders(now=None, offsets=None):
+    """Send every reminder that is due now, without a wheel (cron and --once)."""
+    now = now or timezone.now()
+    offsets = offsets or settings.RESERVATION_REMINDER_OFFSETS
+    return deliver([key for _, key in upcoming(now, now, offsets)], now)
+
+
+class ReminderScheduler(BackgroundScheduler):
+    """
+    Sends "starts soon" reminders from a timing wheel.
+
+    Every ``RELOAD_INTERVAL`` the wheel is filled with the reminders due
+    within one revolution, from one indexed query on ``start_time``. Each
+    tick sends the entries of the elapsed slots in one batch and sleeps
+    until the next non-empty slot or reload.
+    """
+
+    name = 'reservation-reminders'
+
+    def __init__(self, offsets=None, resolution=WHEEL_RESOLUTION, size=WHEEL_SIZE, reload_interval=RELOAD_INTERVAL):
+        super().__init__(reload_interval.total_seconds())
+        self.offsets = offsets or settings.RESERVATION_REMINDER_OFFSETS
+        self.resolution = resolution
+        self.size = size
+        self.reload_interval = reload_interval
+        self.wheel = None
+        self.pending = set()
+        self.reload_at = None
+        self._lock = threading.Lock()
+
+    def reload(self, now):
+        with self._lock:
+            if self.wheel is None:
+                self.wheel = TimingWheel(now, self.resolution, self.size)
+            for remind_at, key in upcoming(now, self.wheel.horizon, self.offsets):
+                if key not in self.pending and self.wheel.add(remind_at, key):
+                    self.pending.add(key)
+        self.reload_at = now + self.reload_interval
+
+    def schedule(self, reservation_id, start_time):
+        """Put a new booking's reminders on the wheel without waiting for a reload."""
+        if self.wheel is None:
+            return
+        with self._lock:
+            for offset in self.offsets:
+                key = (reservation_id, offset)
+                if key not in self.pending and self.wheel.add(start_time - timedelta(minutes=offset), key):
+                    self.pending.add(key)
+        self.wake()
+
+    def tick(self, now=None):
+        """Send due reminders and return the seconds until the next tick."""
+        now = now or timezone.now()
+        if self.reload_at is None or now >= self.reload_at:
+            self.reload(now)
+        with self._lock:
+            due = self.wheel.advance(now)
+            self.pending.difference_update(due)
+            next_due = self.wheel.next_due()
+        sent = deliver(due, now)
+        if sent:
+            logger.info("Sent %s reservation reminders", sent)
+        wake_at = min(filter(None, (next_due, self.reload_at)))
+        return max(self.resolution.total_seconds() / 2, (wake_at - now).total_seconds())
+
+
+scheduler = ReminderScheduler()
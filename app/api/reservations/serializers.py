@@ -1,10 +1,13 @@
 from rest_framework import serializers
 from django.utils import timezone
 from .models import Reservation
+from .intervals import has_overlap
+from .services import DEFAULT_PLACEMENT, PLACEMENT_ORDERINGS
+from app.utils.exception import ConflictError
 from app.api.parking_lots.serializers import ParkingSpaceSerializer
 from app.api.accounts.serializers import UserSerializer
 from django.contrib.auth import get_user_model
-from app.api.parking_lots.models import ParkingSpace
+from app.api.parking_lots.models import ParkingLot, ParkingSpace
 
 User = get_user_model()
 
@@ -66,6 +69,45 @@ class ReservationSerializer(serializers.ModelSerializer):
         
         return attrs
 
+class ReservationListSerializer(serializers.ModelSerializer):
+    """
+    Compact serializer for reservation listings.
+
+    Related objects are flattened to ids and names, and duration and cost
+    are read from the ``for_listing`` annotations, so a page costs the same
+    number of queries whatever its size.
+    """
+
+    duration = serializers.FloatField(source='duration_hours', read_only=True)
+    total_cost = serializers.DecimalField(
+        source='cost_amount',
+        max_digits=10,
+        decimal_places=2,
+        read_only=True
+    )
+    parking_lot_name = serializers.CharField(
+        source='parking_lot.name',
+        read_only=True
+    )
+    space_number = serializers.CharField(
+        source='parking_space.space_number',
+        read_only=True
+    )
+    user_name = serializers.CharField(
+        source='user.get_full_name',
+        read_only=True
+    )
+
+    class Meta:
+        model = Reservation
+        fields = (
+            'id', 'parking_lot', 'parking_lot_name',
+            'parking_space', 'space_number', 'user', 'user_name',
+            'vehicle_plate', 'start_time', 'end_time', 'status',
+            'duration', 'total_cost', 'created_at'
+        )
+        read_only_fields = fields
+
 class ReservationCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating reservations."""
     
@@ -106,22 +148,67 @@ class ReservationCreateSerializer(serializers.ModelSerializer):
                 "This parking space is not available."
             )
         
-        # Check for overlapping reservations
+        # Check for overlapping reservations against the space's interval index;
+        # the exclusion constraint remains the authoritative check on insert
         if start_time and end_time and parking_space:
-            overlapping = Reservation.objects.filter(
-                parking_space=parking_space,
-                status=Reservation.Status.ACTIVE,
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            ).exists()
-            
-            if overlapping:
-                raise serializers.ValidationError(
+            if has_overlap(parking_space.id, start_time, end_time):
+                raise ConflictError(
                     "This space is already reserved for the selected time period."
                 )
         
         return attrs
 
+class ReserveAnySerializer(serializers.Serializer):
+    """Serializer for booking any free space of a parking lot."""
+    
+    user = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(),
+        required=False,
+        allow_null=True
+    )
+    parking_lot = serializers.PrimaryKeyRelatedField(queryset=ParkingLot.objects.all())
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    vehicle_plate = serializers.CharField(max_length=20)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    policy = serializers.ChoiceField(
+        choices=sorted(PLACEMENT_ORDERINGS),
+        default=DEFAULT_PLACEMENT
+    )
+    
+    def validate(self, attrs):
+        """Validate the requested lot and period."""
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError(
+                "End time must be after start time."
+            )
+        
+        if attrs['parking_lot'].status != ParkingLot.Status.ACTIVE:
+            raise serializers.ValidationError(
+                "This parking lot is not accepting reservations."
+            )
+        
+        return attrs
+
+class BulkReservationItemSerializer(serializers.Serializer):
+    """One reservation of a bulk request; ids are resolved in bulk by the service."""
+    
+    user = serializers.IntegerField(required=False, allow_null=True)
+    parking_lot = serializers.IntegerField(required=False, allow_null=True)
+    parking_space = serializers.IntegerField()
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    vehicle_plate = serializers.CharField(max_length=20)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+class BulkReservationSerializer(serializers.Serializer):
+    """Serializer for creating many reservations in one request."""
+    
+    MAX_ITEMS = 500
+    
+    reservations = BulkReservationItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+    atomic = serializers.BooleanField(default=True)
+
 class ReservationUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating reservations."""
     
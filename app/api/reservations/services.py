@@ -1,8 +1,87 @@
+from collections import Counter, defaultdict
 from django.utils import timezone
-from django.db import transaction
-from app.api.reservations.models import Reservation
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Length
+from app.api.parking_lots import availability
+from app.api.parking_lots.counters import adjust_available_spaces, release_spaces
+from app.api.parking_lots.models import ParkingSpace
+from app.api.reservations.expiry import sweep
+from app.api.reservations.intervals import SpaceIntervals
+from app.api.reservations.reminders import send_due_reminders
+from app.api.reservations.models import Reservation, ReservationConflict, User
+from app.api.reservations.signals import reservations_bulk_created
 from app.api.realtime.utils import send_notification_to_user
-from datetime import timedelta
+from app.utils.exception import EXCLUSION_VIOLATION
+
+# Placement policy -> space ordering used when auto-assigning a space
+PLACEMENT_ORDERINGS = {
+    # Lowest space number first ("2" before "10")
+    'fill_order': (Length('space_number'), 'space_number', 'id'),
+    # Closest to the entrance first; spaces without a distance go last
+    'nearest_entrance': (
+        F('distance_to_entrance').asc(nulls_last=True),
+        Length('space_number'),
+        'space_number',
+        'id'
+    ),
+}
+DEFAULT_PLACEMENT = 'fill_order'
+
+
+def _insert_each(pending):
+    """
+    Insert ``{index: reservation}`` one savepoint per row after a batch
+    insert hit a booking committed since the overlap check.
+
+    Conflicting rows are removed from ``pending`` and returned as
+    ``{index: reservation}``.
+    """
+    conflicts = {}
+    for index, reservation in list(pending.items()):
+        try:
+            with transaction.atomic():
+                Reservation.objects.bulk_create([reservation])
+        except IntegrityError as e:
+            if getattr(e.__cause__, 'pgcode', None) != EXCLUSION_VIOLATION:
+                raise
+            conflicts[index] = pending.pop(index)
+    return conflicts
+
+
+def _unreserve(reservations):
+    """Hand the spaces and lot counters taken for unsaved ``reservations`` back."""
+    if not reservations:
+        return
+    ParkingSpace.objects.filter(pk__in=[reservation.parking_space_id for reservation in reservations]).update(
+        status=ParkingSpace.Status.AVAILABLE,
+        current_user=None,
+        updated_at=timezone.now()
+    )
+    for reservation in reservations:
+        reservation.parking_space.status = ParkingSpace.Status.AVAILABLE
+        reservation.parking_space.current_user = None
+    availability.touch(
+        {reservation.parking_lot_id for reservation in reservations},
+        [reservation.parking_space_id for reservation in reservations]
+    )
+    release_spaces(Counter(reservation.parking_lot_id for reservation in reservations))
+
+
+def free_spaces(parking_lot, start_time, end_time, policy=DEFAULT_PLACEMENT):
+    """Available spaces of ``parking_lot`` with no active booking overlapping the period, in placement order."""
+    overlapping = Reservation.objects.filter(
+        parking_space=OuterRef('pk'),
+        status=Reservation.Status.ACTIVE,
+        start_time__lt=end_time,
+        end_time__gt=start_time
+    )
+    return (
+        ParkingSpace.objects.filter(parking_lot=parking_lot, status=ParkingSpace.Status.AVAILABLE)
+        .exclude(Exists(overlapping))
+        .order_by(*PLACEMENT_ORDERINGS[policy])
+    )
+
 
 class ReservationService:
     @staticmethod
@@ -31,6 +110,198 @@ class ReservationService:
             )
             return reservation
 
+    @staticmethod
+    def reserve_any(user, parking_lot, start_time, end_time, policy=DEFAULT_PLACEMENT, **kwargs):
+        """
+        Reserve whichever space of the lot is free first under ``policy``.
+
+        The candidate space is locked with ``SELECT ... FOR UPDATE SKIP
+        LOCKED``, so concurrent requests for the same lot each take a
+        different space instead of queueing on one row. A space lost to a
+        direct booking (exclusion constraint) is skipped and the next one
+        tried. Raises ``ReservationConflict`` when the lot has no free space.
+        """
+        skipped = []
+        with transaction.atomic():
+            while True:
+                space = (
+                    free_spaces(parking_lot, start_time, end_time, policy)
+                    .exclude(pk__in=skipped)
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .first()
+                )
+                if space is None:
+                    raise ReservationConflict("No space is available in this parking lot for the selected time period")
+                try:
+                    reservation = Reservation.objects.create(
+                        user=user,
+                        parking_lot=parking_lot,
+                        parking_space=space,
+                        start_time=start_time,
+                        end_time=end_time,
+                        **kwargs
+                    )
+                except ReservationConflict:
+                    skipped.append(space.pk)
+                    continue
+                # Sent after commit so the lot's counter row lock is not held
+                # across a channel layer round trip
+                payload = {
+                    "reservation_id": reservation.id,
+                    "parking_lot": parking_lot.name,
+                    "parking_space": space.space_number,
+                    "start_time": reservation.start_time.isoformat(),
+                    "end_time": reservation.end_time.isoformat(),
+                }
+                transaction.on_commit(
+                    lambda: send_notification_to_user(user.id, "New reservation created", payload)
+                )
+                return reservation
+
+    @staticmethod
+    def bulk_create_reservations(user, items, atomic=True):
+        """
+        Create many reservations with set-based validation and one insert.
+
+        ``items`` are dicts with ``parking_space``, ``start_time``,
+        ``end_time`` and ``vehicle_plate`` plus optional ``parking_lot``,
+        ``notes`` and ``user`` (ids); items without a user are booked for
+        ``user``. Spaces, users and overlapping bookings are each loaded in
+        one query, lot counters change once per lot and every user gets a
+        single notification after commit.
+
+        Returns ``(reservations, errors)`` where ``errors`` maps item index
+        to a list of messages. With ``atomic`` nothing is created when any
+        item fails; otherwise the valid items are created. Should the insert
+        collide with a booking committed since the overlap check, an atomic
+        batch raises ``ReservationConflict`` while a non-atomic one retries
+        row by row and reports the colliding items.
+        """
+        errors = defaultdict(list)
+        with transaction.atomic():
+            space_ids = [item['parking_space'] for item in items]
+            # Locking the spaces serialises against single bookings, which
+            # update the space row before inserting their reservation
+            spaces = ParkingSpace.objects.select_related('parking_lot').select_for_update(of=('self',)).in_bulk(space_ids)
+            users = User.objects.in_bulk({item['user'] for item in items if item.get('user')})
+            repeated = {space_id for space_id, count in Counter(space_ids).items() if count > 1}
+            
+            for index, item in enumerate(items):
+                space = spaces.get(item['parking_space'])
+                if item['end_time'] <= item['start_time']:
+                    errors[index].append("End time must be after start time.")
+                if item.get('user') and item['user'] not in users:
+                    errors[index].append("User not found.")
+                if space is None:
+                    errors[index].append("Parking space not found.")
+                    continue
+                if item.get('parking_lot') and item['parking_lot'] != space.parking_lot_id:
+                    errors[index].append("The selected parking space does not belong to the specified parking lot.")
+                if space.status != ParkingSpace.Status.AVAILABLE:
+                    errors[index].append("This parking space is not available.")
+                if space.pk in repeated:
+                    errors[index].append("This parking space appears more than once in the batch.")
+            
+            busy = defaultdict(list)
+            valid = [index for index in range(len(items)) if index not in errors]
+            if valid:
+                rows = Reservation.objects.filter(
+                    parking_space_id__in={items[index]['parking_space'] for index in valid},
+                    status=Reservation.Status.ACTIVE,
+                    start_time__lt=max(items[index]['end_time'] for index in valid),
+                    end_time__gt=min(items[index]['start_time'] for index in valid)
+                ).order_by().values_list('parking_space_id', 'start_time', 'end_time')
+                for space_id, start_time, end_time in rows:
+                    busy[space_id].append((start_time, end_time))
+            for index in valid:
+                item = items[index]
+                if SpaceIntervals(busy[item['parking_space']]).overlaps(item['start_time'], item['end_time']):
+                    errors[index].append("This space is already reserved for the selected time period.")
+            
+            if errors and atomic:
+                return [], dict(errors)
+            
+            by_lot = defaultdict(list)
+            for index, item in enumerate(items):
+                if index not in errors:
+                    by_lot[spaces[item['parking_space']].parking_lot_id].append(index)
+            for indexes in by_lot.values():
+                parking_lot = spaces[items[indexes[0]]['parking_space']].parking_lot
+                if not adjust_available_spaces(parking_lot, -len(indexes)):
+                    for index in indexes:
+                        errors[index].append("Not enough spaces are available in this parking lot.")
+            
+            if errors and atomic:
+                transaction.set_rollback(True)
+                return [], dict(errors)
+            
+            pending = {
+                index: Reservation(
+                    user=users[item['user']] if item.get('user') else user,
+                    parking_lot=spaces[item['parking_space']].parking_lot,
+                    parking_space=spaces[item['parking_space']],
+                    hourly_rate=spaces[item['parking_space']].parking_lot.hourly_rate,
+                    start_time=item['start_time'],
+                    end_time=item['end_time'],
+                    vehicle_plate=item['vehicle_plate'],
+                    notes=item.get('notes', '')
+                )
+                for index, item in enumerate(items)
+                if index not in errors
+            }
+            if not pending:
+                return [], dict(errors)
+            
+            by_user = defaultdict(list)
+            for reservation in pending.values():
+                by_user[reservation.user].append(reservation)
+            for booked_for, booked in by_user.items():
+                ParkingSpace.objects.filter(pk__in=[reservation.parking_space_id for reservation in booked]).update(
+                    status=ParkingSpace.Status.RESERVED,
+                    current_user=booked_for,
+                    updated_at=timezone.now()
+                )
+                for reservation in booked:
+                    reservation.parking_space.status = ParkingSpace.Status.RESERVED
+                    reservation.parking_space.current_user = booked_for
+            availability.touch(
+                {reservation.parking_lot_id for reservation in pending.values()},
+                [reservation.parking_space_id for reservation in pending.values()]
+            )
+            
+            try:
+                with transaction.atomic():
+                    Reservation.objects.bulk_create(pending.values(), batch_size=500)
+            except IntegrityError as e:
+                if getattr(e.__cause__, 'pgcode', None) != EXCLUSION_VIOLATION:
+                    raise
+                if atomic:
+                    raise ReservationConflict("A space in the batch was reserved concurrently for the selected time period") from e
+                conflicts = _insert_each(pending)
+                for index in conflicts:
+                    errors[index].append("This space is already reserved for the selected time period.")
+                _unreserve(list(conflicts.values()))
+                by_user = defaultdict(list)
+                for reservation in pending.values():
+                    by_user[reservation.user].append(reservation)
+            reservations = list(pending.values())
+            if not reservations:
+                return [], dict(errors)
+            reservations_bulk_created.send(sender=Reservation, reservations=reservations)
+            
+            def notify():
+                for booked_for, booked in by_user.items():
+                    send_notification_to_user(
+                        booked_for.id,
+                        f"{len(booked)} new reservations created" if len(booked) > 1 else "New reservation created",
+                        {
+                            "reservation_ids": [reservation.id for reservation in booked],
+                            "parking_lots": sorted({reservation.parking_lot.name for reservation in booked}),
+                        }
+                    )
+            transaction.on_commit(notify)
+        return reservations, dict(errors)
+
     @staticmethod
     def cancel_reservation(reservation_id, user):
         """
@@ -41,7 +312,7 @@ class ReservationService:
                 reservation = Reservation.objects.get(id=reservation_id, user=user)
                 if reservation.status == 'cancelled':
                     raise ValueError("Reservation is already cancelled")
-                if reservation.status == 'expired':
+                if reservation.status == Reservation.Status.EXPIRED:
                     raise ValueError("Cannot cancel an expired reservation")
                 reservation.status = 'cancelled'
                 reservation.save()
@@ -62,46 +333,14 @@ class ReservationService:
         """
         Check and update expired reservations
         """
-        
-        # Get all active reservations that have expired
-        expired_reservations = Reservation.objects.filter(
-            status='active',
-            end_time__lt=timezone.now()
-        )
-        for reservation in expired_reservations:
-            reservation.status = 'expired'
-            reservation.save()
-            send_notification_to_user(
-                reservation.user.id,
-                "Your reservation has expired",
-                {
-                    "reservation_id": reservation.id,
-                    "parking_lot": reservation.parking_lot.name,
-                }
-            )
+        return sweep()
 
     @staticmethod
     def check_upcoming_reservations():
         """
-        Check and notify about upcoming reservations
+        Send "starts soon" reminders that are due; each goes out once
         """
-        # Get all active reservations starting in the next 30 minutes
-        upcoming_time = timezone.now() + timedelta(minutes=30)
-        upcoming_reservations = Reservation.objects.filter(
-            status='active',
-            start_time__lte=upcoming_time,
-            start_time__gt=timezone.now()
-        )
-        for reservation in upcoming_reservations:
-            send_notification_to_user(
-                reservation.user.id,
-                "Your reservation starts in 30 minutes",
-                {
-                    "reservation_id": reservation.id,
-                    "parking_lot": reservation.parking_lot.name,
-                    "start_time": reservation.start_time.isoformat(),
-                }
-            )
+        return send_due_reminders()
 
     @staticmethod
     def get_user_active_reservations(user):
@@ -132,7 +371,7 @@ class ReservationService:
         """
         return Reservation.objects.filter(
             user=user,
-            status='expired'
+            status=Reservation.Status.EXPIRED
         )
 
     @staticmethod
@@ -0,0 +1,77 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_migrate
+from django.dispatch import Signal, receiver
+from .expiry import scheduler
+from .reminders import scheduler as reminder_scheduler
+from .intervals import invalidate
+from .models import Reservation
+
+# Sent after ``bulk_create`` inserted ``reservations``, which skips post_save
+reservations_bulk_created = Signal()
+
+
+@receiver(post_init, sender=Reservation)
+def remember_parking_space(sender, instance, **kwargs):
+    """Keep the loaded space so moving a booking refreshes both indexes."""
+    instance._loaded_space_id = instance.__dict__.get('parking_space_id')
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_space_intervals(sender, instance, **kwargs):
+    """Refresh the interval index of the spaces touched by a reservation write."""
+    space_ids = {instance.parking_space_id, getattr(instance, '_loaded_space_id', None)} - {None}
+    invalidate(space_ids)
+    instance._loaded_space_id = instance.parking_space_id
+
+
+@receiver(reservations_bulk_created, sender=Reservation)
+def invalidate_bulk_space_intervals(sender, reservations, **kwargs):
+    """Refresh the interval index of every space booked in a bulk insert."""
+    invalidate(reservation.parking_space_id for reservation in reservations)
+
+
+@receiver(post_save, sender=Reservation)
+def schedule_expiry(sender, instance, **kwargs):
+    """Wake the expiry scheduler when a booking ends before its next deadline."""
+    if instance.status == Reservation.Status.ACTIVE:
+        end_time = instance.end_time
+        transaction.on_commit(lambda: scheduler.schedule(end_time))
+
+
+@receiver(post_save, sender=Reservation)
+def schedule_reminders(sender, instance, created, **kwargs):
+    """Put a new booking's reminders on the reminder wheel."""
+    if created and instance.status == Reservation.Status.ACTIVE:
+        reservation_id, start_time = instance.pk, instance.start_time
+        transaction.on_commit(lambda: reminder_scheduler.schedule(reservation_id, start_time))
+
+
+@receiver(reservations_bulk_created, sender=Reservation)
+def schedule_bulk_expiry(sender, reservations, **kwargs):
+    end_time = min(reservation.end_time for reservation in reservations)
+    bookings = [(reservation.pk, reservation.start_time) for reservation in reservations]
+    
+    def schedule():
+        scheduler.schedule(end_time)
+        for reservation_id, start_time in bookings:
+            reminder_scheduler.schedule(reservation_id, start_time)
+    transaction.on_commit(schedule)
+
+
+@receiver(pre_migrate)
+def create_extensions(sender, using, **kwargs):
+    """
+    Make sure ``btree_gist`` and ``pg_trgm`` exist before tables are created.
+
+    Migrations 0002 and 0006 install them as well; this covers databases
+    built without migrations (the test settings), where the overlap
+    constraint and the trigram indexes would otherwise fail to create.
+    """
+    if sender.name != 'app.api.reservations':
+        return
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
@@ -1,29 +1,24 @@
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, serializers, status
 from rest_framework.response import Response
 from django.utils import timezone
 from app.api.accounts.serializers import UserSerializer
-from .models import Reservation, User
+from .models import Reservation, ReservationConflict, User, normalize_plate
 from .serializers import (
     ReservationSerializer,
+    ReservationListSerializer,
     ReservationCreateSerializer,
     ReservationUpdateSerializer,
+    ReserveAnySerializer,
+    BulkReservationSerializer,
 )
 from .services import ReservationService
 from rest_framework.decorators import action
-from django.db.models import Q
 from datetime import datetime
-from rest_framework.pagination import PageNumberPagination
+from app.utils.pagination import StandardResultsSetPagination
 from app.api.realtime.utils import send_notification_to_user
 from django.core.exceptions import PermissionDenied
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    """Custom pagination class for consistent page sizes."""
-
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 100
+from app.utils.exception import ConflictError
 
 
 # Create your views here.
@@ -36,16 +31,31 @@ class ReservationViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
 
+    # Actions that return many reservations; they use the compact
+    # representation unless the full nested one is asked for with ?expand=true
+    LIST_ACTIONS = {"list", "my_reservations", "active", "pending", "expired", "cancelled", "plate"}
+    EXPAND_VALUES = {"1", "true", "yes"}
+
+    def expand(self):
+        """Whether the client asked for the full nested representation."""
+        return self.request.query_params.get("expand", "").lower() in self.EXPAND_VALUES
+
     def get_serializer_class(self):
-        if self.action == "create":
+        if self.action in self.LIST_ACTIONS and not self.expand():
+            return ReservationListSerializer
+        elif self.action == "create":
             return ReservationCreateSerializer
+        elif self.action == "reserve_any":
+            return ReserveAnySerializer
+        elif self.action == "bulk":
+            return BulkReservationSerializer
         elif self.action in ["update", "partial_update"]:
             return ReservationUpdateSerializer
         return ReservationSerializer
 
     def get_queryset(self):
         """Filter reservations based on user role and query parameters."""
-        queryset = Reservation.objects.all()
+        queryset = Reservation.objects.for_listing()
 
         # Regular users can only see their own reservations
         if not self.request.user.is_staff:
@@ -69,7 +79,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
         # Filter by vehicle plate if provided
         vehicle_plate = self.request.query_params.get("vehicle_plate")
         if vehicle_plate:
-            queryset = queryset.filter(vehicle_plate__icontains=vehicle_plate)
+            queryset = queryset.plate(vehicle_plate, match="contains")
 
         # Filter by date range if provided
         start_date = self.request.query_params.get("start_date")
@@ -102,12 +112,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
         # Search functionality
         search = self.request.query_params.get("search")
         if search:
-            queryset = queryset.filter(
-                Q(vehicle_plate__icontains=search)
-                | Q(notes__icontains=search)
-                | Q(parking_lot__name__icontains=search)
-                | Q(parking_space__space_number__icontains=search)
-            )
+            queryset = queryset.search(search)
 
         # Sorting
         sort_by = self.request.query_params.get("sort_by", "-created_at")
@@ -168,6 +173,8 @@ class ReservationViewSet(viewsets.ModelViewSet):
                 notes=validated_data.get("notes"),
             )
             serializer.instance = reservation
+        except ReservationConflict as e:
+            raise ConflictError(str(e))
         except Exception as e:
             raise serializers.ValidationError(str(e))
 
@@ -197,6 +204,8 @@ class ReservationViewSet(viewsets.ModelViewSet):
                     "changes": serializer.validated_data,
                 },
             )
+        except ReservationConflict as e:
+            raise ConflictError(str(e))
         except Exception as e:
             raise serializers.ValidationError(str(e))
 
@@ -227,6 +236,106 @@ class ReservationViewSet(viewsets.ModelViewSet):
         except Exception as e:
             raise serializers.ValidationError(str(e))
 
+    @action(detail=False, methods=["post"], url_path="reserve-any")
+    def reserve_any(self, request):
+        """Reserve any free space of a parking lot, chosen by placement policy."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        validated_data = serializer.validated_data
+
+        user = validated_data.get("user")
+        if user is not None and user != request.user and not request.user.is_staff:
+            raise PermissionDenied(
+                "Only administrators can create reservations for other users."
+            )
+
+        try:
+            reservation = ReservationService.reserve_any(
+                user=user or request.user,
+                parking_lot=validated_data["parking_lot"],
+                start_time=validated_data["start_time"],
+                end_time=validated_data["end_time"],
+                policy=validated_data["policy"],
+                vehicle_plate=validated_data["vehicle_plate"],
+                notes=validated_data.get("notes", ""),
+            )
+        except ReservationConflict as e:
+            raise ConflictError(str(e))
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+        return Response(
+            ReservationSerializer(reservation, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Create many reservations at once.
+
+        Every item is validated and errors are reported per item index.
+        With ``atomic`` (the default) nothing is created if any item fails;
+        otherwise the valid items are created and the response is 207.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["reservations"]
+
+        if not request.user.is_staff and any(
+            item.get("user") not in (None, request.user.id) for item in items
+        ):
+            raise PermissionDenied(
+                "Only administrators can create reservations for other users."
+            )
+
+        try:
+            reservations, errors = ReservationService.bulk_create_reservations(
+                request.user, items, atomic=serializer.validated_data["atomic"]
+            )
+        except ReservationConflict as e:
+            raise ConflictError(str(e))
+
+        data = {
+            "created": ReservationSerializer(
+                reservations, many=True, context=self.get_serializer_context()
+            ).data,
+            "errors": [
+                {"index": index, "errors": messages}
+                for index, messages in sorted(errors.items())
+            ],
+        }
+        if not reservations:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(data, status=response_status)
+
+    @action(detail=False, methods=["get"])
+    def plate(self, request):
+        """
+        Look up reservations by plate, most recent first.
+
+        ``?plate=`` is normalized (case and separators are ignored) and
+        matched exactly, or as a prefix with ``?match=prefix``. Regular users
+        only see their own reservations.
+        """
+        plate = request.query_params.get("plate", "")
+        match = request.query_params.get("match", "exact")
+        if not normalize_plate(plate):
+            raise serializers.ValidationError({"plate": "A plate is required."})
+        if match not in ("exact", "prefix"):
+            raise serializers.ValidationError({"match": "Must be exact or prefix."})
+
+        reservations = self.get_queryset().plate(plate, match=match).order_by(
+            "-start_time", "-id"
+        )
+        page = self.paginate_queryset(reservations)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=["post"])
     def cancel(self, request, pk=None):
         """Cancel a reservation using the service."""
@@ -303,27 +412,35 @@ class ReservationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"])
     def active(self, request):
         """Get active reservations."""
-        reservations = ReservationService.get_user_active_reservations(request.user)
+        reservations = ReservationService.get_user_active_reservations(
+            request.user
+        ).for_listing()
         serializer = self.get_serializer(reservations, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
     def pending(self, request):
         """Get pending reservations."""
-        reservations = ReservationService.get_user_pending_reservations(request.user)
+        reservations = ReservationService.get_user_pending_reservations(
+            request.user
+        ).for_listing()
         serializer = self.get_serializer(reservations, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
     def expired(self, request):
         """Get expired reservations."""
-        reservations = ReservationService.get_user_expired_reservations(request.user)
+        reservations = ReservationService.get_user_expired_reservations(
+            request.user
+        ).for_listing()
         serializer = self.get_serializer(reservations, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
     def cancelled(self, request):
         """Get cancelled reservations."""
-        reservations = ReservationService.get_user_cancelled_reservations(request.user)
+        reservations = ReservationService.get_user_cancelled_reservations(
+            request.user
+        ).for_listing()
         serializer = self.get_serializer(reservations, many=True)
         return Response(serializer.data)
@@ -30,7 +30,10 @@ django.setup()
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
+from django.conf import settings
 from app.api.realtime.consumers import TokenAuthMiddleware
+from app.api.reservations.expiry import scheduler as expiry_scheduler
+from app.api.reservations.reminders import scheduler as reminder_scheduler
 import app.api.realtime.routing
 
 # Initialize Django ASGI application
@@ -85,10 +88,18 @@ async def lifespan(scope, receive, send):
             if message["type"] == "lifespan.startup":
                 logger.info("Starting notification test on application startup")
                 run_notification_test()
+                if settings.RESERVATION_EXPIRY_IN_LIFESPAN:
+                    logger.info("Starting reservation expiry scheduler")
+                    expiry_scheduler.start()
+                if settings.RESERVATION_REMINDERS_IN_LIFESPAN:
+                    logger.info("Starting reservation reminder scheduler")
+                    reminder_scheduler.start()
                 await send({"type": "lifespan.startup.complete"})
                 logger.info("Lifespan startup complete")
             elif message["type"] == "lifespan.shutdown":
                 logger.info("Processing lifespan shutdown")
+                expiry_scheduler.stop(timeout=5)
+                reminder_scheduler.stop(timeout=5)
                 await send({"type": "lifespan.shutdown.complete"})
                 logger.info("Lifespan shutdown complete")
                 return
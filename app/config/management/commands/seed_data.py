@@ -1,8 +1,10 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from app.api.parking_lots.models import ParkingLot, ParkingSpace
+from app.api.parking_lots.provisioning import create_spaces, space_numbers
 from app.api.reservations.models import Reservation
-from app.api.reports.models import DailyReport, MonthlyReport, ParkingLotReport
+from app.api.reports.models import MonthlyReport
 from django.utils import timezone
 from datetime import timedelta, datetime
 import random
@@ -169,19 +171,10 @@ class Command(BaseCommand):
             # Get a short prefix from the lot name (first 3 letters)
             prefix = lot.name[:3].upper()
             
-            # Calculate how many spaces should be available
-            available_count = lot.available_spaces
-            total_count = lot.total_spaces
-            
-            for i in range(total_count):
-                # Calculate if space should be available
-                should_be_available = i < available_count
-                
-                ParkingSpace.objects.create(
-                    parking_lot=lot,
-                    space_number=f"{prefix}{i+1:03d}",  # Format: "SMC001", "ABR001", etc.
-                    status=ParkingSpace.Status.AVAILABLE if should_be_available else ParkingSpace.Status.OCCUPIED
-                )
+            # The first available_spaces spaces are free, the rest occupied
+            numbers = space_numbers(lot.total_spaces, prefix=prefix)  # Format: "SMC001", "ABR001", etc.
+            create_spaces(lot, numbers[:lot.available_spaces])
+            create_spaces(lot, numbers[lot.available_spaces:], status=ParkingSpace.Status.OCCUPIED)
         self.stdout.write(self.style.SUCCESS('Created parking spaces'))
 
         # Create reservations with more realistic data
@@ -241,16 +234,15 @@ class Command(BaseCommand):
         # Generate reports with more comprehensive data
         self.stdout.write('Generating reports...')
         
-        # Generate daily reports for the next 30 days (future dates)
-        for day in range(30):
-            current_date = timezone.now().date() + timedelta(days=day+1)  # Start from tomorrow
-            
-            # Generate daily report using the model's method
-            DailyReport.generate_report(date=current_date)
-            
-            # Generate parking lot reports for each lot
-            for lot in parking_lots:
-                ParkingLotReport.generate_report(parking_lot=lot, date=current_date)
+        # Generate daily and parking lot reports for the next 30 days (future dates)
+        first_date = timezone.now().date() + timedelta(days=1)  # Start from tomorrow
+        call_command(
+            'generate_reports',
+            '--from', first_date.isoformat(),
+            '--to', (first_date + timedelta(days=29)).isoformat(),
+            '--restart',
+            stdout=self.stdout
+        )
         
         # Generate monthly reports for the next 12 months
         current_date = timezone.now().date()
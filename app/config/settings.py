@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Third party apps
     "rest_framework",
     "rest_framework_simplejwt",
@@ -214,6 +215,62 @@ SWAGGER_SETTINGS = {
 ASGI_APPLICATION = "app.config.asgi.application"
 CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
 
+# Cache configuration: the Redis server from REDIS_HOST/REDIS_PORT (or a
+# full REDIS_URL) shares the cache between processes; without one each
+# process keeps its own local memory cache
+REDIS_URL = os.getenv("REDIS_URL") or (
+    f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT', '6379')}"
+    if os.getenv("REDIS_HOST") else None
+)
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a computed date range report stays cached
+REPORT_CACHE_TIMEOUT = int(os.getenv("REPORT_CACHE_TIMEOUT", "3600"))
+
+# Seconds the dashboard summary is served from cache before recomputing
+REPORT_SUMMARY_CACHE_TIMEOUT = int(os.getenv("REPORT_SUMMARY_CACHE_TIMEOUT", "30"))
+
+# Run the reservation expiry scheduler inside the ASGI lifespan; disable when
+# a separate `manage.py expire_reservations` daemon is deployed instead
+RESERVATION_EXPIRY_IN_LIFESPAN = os.getenv("RESERVATION_EXPIRY_IN_LIFESPAN", "True").lower() in ("true", "1", "t")
+
+# Longest the expiry scheduler sleeps without checking for new bookings
+RESERVATION_EXPIRY_MAX_SLEEP = int(os.getenv("RESERVATION_EXPIRY_MAX_SLEEP", "60"))
+
+# Minutes before start_time at which "starts soon" reminders are sent
+RESERVATION_REMINDER_OFFSETS = [
+    int(minutes) for minutes in os.getenv("RESERVATION_REMINDER_OFFSETS", "30").split(",") if minutes.strip()
+]
+
+# Run the reminder scheduler inside the ASGI lifespan; disable when a
+# separate `manage.py send_reminders` daemon is deployed instead
+RESERVATION_REMINDERS_IN_LIFESPAN = os.getenv("RESERVATION_REMINDERS_IN_LIFESPAN", "True").lower() in ("true", "1", "t")
+
+# Also record an occupancy sample on every counter change (bookings,
+# occupy/vacate, expiry); otherwise the fixed-interval samples taken by
+# `manage.py sample_occupancy` make up the time series
+OCCUPANCY_SAMPLE_ON_CHANGE = os.getenv("OCCUPANCY_SAMPLE_ON_CHANGE", "False").lower() in ("true", "1", "t")
+
+# Answer nearby-lot searches from an in-memory k-d tree of lot locations;
+# when disabled a bounding-box query on the location index is used instead
+PARKING_LOT_SPATIAL_INDEX = os.getenv("PARKING_LOT_SPATIAL_INDEX", "True").lower() in ("true", "1", "t")
+
+# Seconds a lot's cached availability lives without writes; every write to
+# the lot's spaces or counters patches it right after commit
+PARKING_LOT_AVAILABILITY_TIMEOUT = int(os.getenv("PARKING_LOT_AVAILABILITY_TIMEOUT", "600"))
+
 # Logging configuration
 LOGGING = {
     "version": 1,
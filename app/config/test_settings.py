@@ -16,6 +16,13 @@ DATABASES = {
     }
 }
 
+# Keep tests independent of a running Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Disable migrations during tests
 class DisableMigrations:
     def __contains__(self, item):
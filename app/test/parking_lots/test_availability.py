@@ -0,0 +1,167 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from app.api.parking_lots import availability
+from app.api.parking_lots.models import ParkingLot, ParkingSpace
+from app.api.reservations.services import ReservationService
+from app.test.factories import AdminUserFactory, ParkingLotUserOwnedFactory, ParkingSpaceFactory, UserFactory
+
+
+class AvailabilityCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.parking_lot = ParkingLotUserOwnedFactory(total_spaces=3, available_spaces=2)
+        self.free = ParkingSpaceFactory(parking_lot=self.parking_lot)
+        self.taken = ParkingSpaceFactory(parking_lot=self.parking_lot)
+        self.occupied = ParkingSpaceFactory(parking_lot=self.parking_lot, status=ParkingSpace.Status.OCCUPIED)
+
+    def test_snapshot_is_served_from_cache(self):
+        """Test a current snapshot is read without touching the database"""
+        snapshot = availability.get_availability(self.parking_lot.id)
+        self.assertEqual(snapshot['available_spaces'], 2)
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.AVAILABLE], [self.free.id, self.taken.id])
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.OCCUPIED], [self.occupied.id])
+        self.assertEqual([space['id'] for space in snapshot['available']], [self.free.id, self.taken.id])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(availability.get_availability(self.parking_lot.id), snapshot)
+
+    def test_writes_are_patched_in_on_commit(self):
+        """Test a committed write patches the snapshot from the changed rows only"""
+        before = availability.get_availability(self.parking_lot.id)
+        self.taken.status = ParkingSpace.Status.RESERVED
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.taken.save()
+        self.assertEqual(availability.get_availability(self.parking_lot.id), before)
+
+        # One query for the lot's counters and one for the changed space
+        with self.assertNumQueries(2):
+            for callback in callbacks:
+                callback()
+        with self.assertNumQueries(0):
+            snapshot = availability.get_availability(self.parking_lot.id)
+        self.assertEqual(snapshot['version'], before['version'] + 1)
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.RESERVED], [self.taken.id])
+        self.assertEqual([space['id'] for space in snapshot['available']], [self.free.id])
+        self.assertEqual(snapshot, availability.rebuild([self.parking_lot.id])[self.parking_lot.id] | {
+            'version': snapshot['version']
+        })
+
+    def test_inserted_and_deleted_spaces(self):
+        """Test spaces added or removed are patched into and out of the snapshot"""
+        availability.get_availability(self.parking_lot.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.taken.delete()
+            added = ParkingSpaceFactory(parking_lot=self.parking_lot)
+
+        with self.assertNumQueries(0):
+            snapshot = availability.get_availability(self.parking_lot.id)
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.AVAILABLE], [self.free.id, added.id])
+        self.assertEqual([space['id'] for space in snapshot['available']], [self.free.id, added.id])
+
+    def test_stale_snapshot_falls_back_to_rebuild(self):
+        """Test a snapshot another writer made stale is rebuilt instead of patched"""
+        availability.get_availability(self.parking_lot.id)
+        ParkingSpace.objects.filter(pk=self.taken.pk).update(status=ParkingSpace.Status.MAINTENANCE)
+        self.free.status = ParkingSpace.Status.RESERVED
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.free.save()
+        # A concurrent write got its version bump in before this patch
+        availability._bump([self.parking_lot.id])
+        for callback in callbacks:
+            callback()
+
+        with self.assertNumQueries(0):
+            snapshot = availability.get_availability(self.parking_lot.id)
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.MAINTENANCE], [self.taken.id])
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.RESERVED], [self.free.id])
+
+    def test_bulk_bookings_are_patched(self):
+        """Test spaces booked through a queryset update are moved in the snapshot"""
+        availability.get_availability(self.parking_lot.id)
+        start_time = timezone.now() + timedelta(hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservationService.bulk_create_reservations(UserFactory(), [
+                {'parking_space': space.id, 'start_time': start_time,
+                 'end_time': start_time + timedelta(hours=1), 'vehicle_plate': 'FLEET1'}
+                for space in (self.free, self.taken)
+            ])
+
+        with self.assertNumQueries(0):
+            snapshot = availability.get_availability(self.parking_lot.id)
+        self.assertEqual(snapshot['available_spaces'], 0)
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.RESERVED], [self.free.id, self.taken.id])
+        self.assertEqual(snapshot['available'], [])
+
+    def test_rebuild(self):
+        """Test the rebuild covers every lot and drops deleted ones"""
+        other = ParkingLotUserOwnedFactory()
+        call_command('rebuild_availability', stdout=StringIO())
+        with self.assertNumQueries(0):
+            self.assertEqual(availability.get_availability(other.id)['total_spaces'], 50)
+
+        lot_id = other.id
+        ParkingLot.objects.filter(pk=lot_id).delete()
+        self.assertEqual(availability.rebuild([lot_id]), {})
+        self.assertIsNone(cache.get(availability.SNAPSHOT_KEY.format(lot_id=lot_id)))
+        with self.assertRaises(ParkingLot.DoesNotExist):
+            availability.get_availability(lot_id)
+
+
+class AvailabilityEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=UserFactory())
+        self.parking_lot = ParkingLotUserOwnedFactory(owner=AdminUserFactory(), total_spaces=2, available_spaces=2)
+        self.space = ParkingSpaceFactory(parking_lot=self.parking_lot)
+        ParkingSpaceFactory(parking_lot=self.parking_lot)
+
+    def test_occupy_and_vacate_are_reflected(self):
+        """Test the availability actions follow occupy and vacate without querying on a hit"""
+        spaces_url = reverse('parking-lot-available-spaces', args=[self.parking_lot.id])
+        occupancy_url = reverse('parking-lot-occupancy-rate', args=[self.parking_lot.id])
+        self.assertEqual(len(self.client.get(spaces_url).data), 2)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(occupancy_url)
+        self.assertEqual(response.data, {
+            'occupancy_rate': 0, 'total_spaces': 2, 'available_spaces': 2, 'occupied_spaces': 0
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('parking-space-occupy', args=[self.space.id]))
+        self.assertEqual(self.client.get(occupancy_url).data['occupied_spaces'], 1)
+        self.assertNotIn(self.space.id, [space['id'] for space in self.client.get(spaces_url).data])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('parking-space-vacate', args=[self.space.id]))
+        self.assertEqual(self.client.get(occupancy_url).data['occupancy_rate'], 0)
+        self.assertEqual(len(self.client.get(spaces_url).data), 2)
+
+    def test_occupy_reserved_space_in_full_lot(self):
+        """Test occupying a reserved space refreshes the spaces even when the counter is at zero"""
+        other = ParkingSpace.objects.filter(parking_lot=self.parking_lot).exclude(pk=self.space.pk).get()
+        ParkingSpace.objects.filter(parking_lot=self.parking_lot).update(status=ParkingSpace.Status.RESERVED)
+        ParkingLot.objects.filter(pk=self.parking_lot.pk).update(available_spaces=0)
+        availability.rebuild([self.parking_lot.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('parking-space-occupy', args=[self.space.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        snapshot = availability.get_availability(self.parking_lot.id)
+        self.assertEqual(snapshot['available_spaces'], 0)
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.OCCUPIED], [self.space.id])
+        self.assertEqual(snapshot['space_ids'][ParkingSpace.Status.RESERVED], [other.id])
+
+    def test_unknown_lot(self):
+        """Test unknown lots are not found"""
+        for name in ('parking-lot-available-spaces', 'parking-lot-occupancy-rate'):
+            response = self.client.get(reverse(name, args=[0]))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,88 @@
+import random
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from app.api.parking_lots import geo
+from app.api.parking_lots.models import ParkingLot
+from app.test.factories import AdminUserFactory, ParkingLotUserOwnedFactory, UserFactory
+
+
+class KDTreeTests(TestCase):
+    def test_nearest_matches_brute_force(self):
+        """Test the tree yields lots in the same order as exact distances"""
+        rng = random.Random(7)
+        locations = [
+            (lot_id, rng.uniform(14.3, 14.8), rng.uniform(120.8, 121.2))
+            for lot_id in range(500)
+        ]
+        # Points on both sides of the antimeridian and near a pole
+        locations += [(1000, 0.0, 179.99), (1001, 0.0, -179.99), (1002, 89.9, 10.0)]
+        tree = geo.KDTree(locations)
+
+        for latitude, longitude in [(14.55, 121.0), (14.3, 120.8), (0.0, 180.0), (90.0, 0.0)]:
+            expected = sorted(
+                (geo.haversine_km(latitude, longitude, lat, lng), lot_id)
+                for lot_id, lat, lng in locations
+            )
+            found = list(tree.nearest(latitude, longitude))
+            self.assertEqual([lot_id for lot_id, _ in found][:20], [lot_id for _, lot_id in expected][:20])
+            for (_, distance), (expected_distance, _) in zip(found, expected):
+                self.assertAlmostEqual(distance, expected_distance, places=6)
+
+    def test_nearest_within_radius(self):
+        """Test the search stops at the radius"""
+        tree = geo.KDTree([(1, 14.55, 121.0), (2, 14.56, 121.0), (3, 15.55, 121.0)])
+        self.assertEqual([lot_id for lot_id, _ in tree.nearest(14.55, 121.0, max_km=5)], [1, 2])
+        self.assertEqual(list(geo.KDTree([]).nearest(0, 0)), [])
+
+
+class NearbyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = AdminUserFactory()
+        self.here = ParkingLotUserOwnedFactory(owner=owner, latitude=14.5500, longitude=121.0000, available_spaces=5)
+        self.close = ParkingLotUserOwnedFactory(owner=owner, latitude=14.5600, longitude=121.0000, available_spaces=1)
+        self.closed = ParkingLotUserOwnedFactory(
+            owner=owner, latitude=14.5510, longitude=121.0000, status=ParkingLot.Status.CLOSED
+        )
+        self.far = ParkingLotUserOwnedFactory(owner=owner, latitude=15.5500, longitude=121.0000)
+
+    def test_indexed_and_bbox_agree(self):
+        """Test the tree and the bounding-box fallback return the same lots"""
+        for search in (geo.nearby_indexed, geo.nearby_bbox):
+            found = search(14.5500, 121.0000, radius_km=5, k=10)
+            self.assertEqual([lot_id for lot_id, _ in found], [self.here.id, self.close.id])
+            self.assertAlmostEqual(found[1][1], 1.112, places=2)
+            found = search(14.5500, 121.0000, radius_km=5, k=10, min_free=2)
+            self.assertEqual([lot_id for lot_id, _ in found], [self.here.id])
+            self.assertEqual(len(search(14.5500, 121.0000, radius_km=500, k=1)), 1)
+
+    def test_index_follows_moved_lots(self):
+        """Test moving or adding a lot is picked up by the tree"""
+        self.assertEqual(len(geo.get_index()), 4)
+        self.far.latitude = 14.5550
+        self.far.save()
+        ParkingLotUserOwnedFactory(latitude=14.5, longitude=121.0)
+        self.assertEqual(len(geo.get_index()), 5)
+        found = geo.nearby_indexed(14.5500, 121.0000, radius_km=5, k=10)
+        self.assertEqual([lot_id for lot_id, _ in found], [self.here.id, self.far.id, self.close.id])
+
+    @override_settings(PARKING_LOT_SPATIAL_INDEX=False)
+    def test_nearby_endpoint(self):
+        """Test the nearby action returns lot summaries with distances"""
+        client = APIClient()
+        client.force_authenticate(user=UserFactory())
+        url = reverse('parking-lot-nearby')
+
+        response = client.get(url, {'lat': 14.55, 'lng': 121.0, 'radius': 5, 'k': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([lot['id'] for lot in response.data], [self.here.id, self.close.id])
+        self.assertEqual(response.data[0]['distance_km'], 0)
+        self.assertIn('space_counts', response.data[0])
+
+        response = client.get(url, {'lat': 14.55})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get(url, {'lat': 14.55, 'lng': 121.0, 'radius': 500})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
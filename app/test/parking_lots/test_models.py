@@ -1,10 +1,15 @@
-from django.test import TestCase
-from app.api.parking_lots.models import ParkingLot, ParkingSpace
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from app.api.parking_lots.counters import adjust_available_spaces, release_space, take_space
+from app.api.parking_lots.models import ParkingLot, ParkingSpace, OccupancySample
+from app.api.parking_lots.occupancy import downsample, occupancy_by_lot, occupancy_totals
 from app.test.factories import (
     AdminUserFactory,
     ParkingLotUserOwnedFactory,
     ParkingSpaceFactory
 )
+from datetime import datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
 
 class ParkingLotModelTests(TestCase):
@@ -109,4 +114,147 @@ class ParkingSpaceModelTests(TestCase):
                 parking_lot=self.parking_lot,
                 space_number='A2',
                 status='invalid_status'
-            ) 
\ No newline at end of file
+            )
+
+
+class OccupancySampleTests(TestCase):
+    def setUp(self):
+        self.parking_lot = ParkingLotUserOwnedFactory(total_spaces=10, available_spaces=10)
+
+    @override_settings(OCCUPANCY_SAMPLE_ON_CHANGE=True)
+    def test_sample_recorded_on_change(self):
+        """Test a raw sample is appended when the space counts change"""
+        parking_lot = ParkingLotUserOwnedFactory(total_spaces=10, available_spaces=10)
+        parking_lot.name = 'Renamed'
+        parking_lot.save()
+        self.assertEqual(parking_lot.occupancy_samples.count(), 1)
+        parking_lot.available_spaces = 6
+        parking_lot.save()
+        latest = parking_lot.occupancy_samples.latest('bucket_start')
+        self.assertEqual(parking_lot.occupancy_samples.count(), 2)
+        self.assertEqual(latest.resolution, OccupancySample.Resolution.RAW)
+        self.assertAlmostEqual(latest.average_occupancy, 40)
+
+    def test_no_change_samples_by_default(self):
+        """Test saves do not sample unless change samples are enabled"""
+        self.parking_lot.available_spaces = 6
+        self.parking_lot.save()
+        self.assertFalse(self.parking_lot.occupancy_samples.exists())
+
+    def test_downsample_folds_aged_samples(self):
+        """Test raw samples become 5-minute buckets and then hourly buckets"""
+        OccupancySample.objects.all().delete()
+        base = datetime(2024, 1, 1, 8, 0, tzinfo=dt_timezone.utc)
+        for minute, rate in [(0, 10), (2, 30), (4, 50), (7, 90)]:
+            OccupancySample.objects.create(
+                parking_lot=self.parking_lot,
+                bucket_start=base + timedelta(minutes=minute),
+                average_occupancy=rate,
+                peak_occupancy=rate
+            )
+
+        downsample(now=base + timedelta(days=2))
+        buckets = list(self.parking_lot.occupancy_samples.values_list(
+            'resolution', 'bucket_start', 'average_occupancy', 'peak_occupancy', 'sample_count'
+        ))
+        # 10% and 30% held for two minutes each, 50% for the bucket's last minute
+        self.assertEqual(buckets, [
+            ('5m', base, 26.0, 50.0, 3),
+            ('5m', base + timedelta(minutes=5), 90.0, 90.0, 1),
+        ])
+
+        downsample(now=base + timedelta(days=8))
+        # The 90% bucket holds for the remaining 55 minutes of the hour
+        (resolution, bucket_start, average, peak, count), = self.parking_lot.occupancy_samples.values_list(
+            'resolution', 'bucket_start', 'average_occupancy', 'peak_occupancy', 'sample_count'
+        )
+        self.assertEqual((resolution, bucket_start, peak, count), ('1h', base, 90.0, 4))
+        self.assertAlmostEqual(average, (26 * 5 + 90 * 55) / 60)
+
+    def test_occupancy_totals_by_range(self):
+        """Test range queries return the time-weighted average and peak"""
+        OccupancySample.objects.all().delete()
+        base = datetime(2024, 1, 1, 8, 0, tzinfo=dt_timezone.utc)
+        OccupancySample.objects.create(
+            parking_lot=self.parking_lot, resolution='1h', bucket_start=base,
+            average_occupancy=20, peak_occupancy=60, sample_count=3
+        )
+        OccupancySample.objects.create(
+            parking_lot=self.parking_lot, bucket_start=base + timedelta(hours=2),
+            average_occupancy=100, peak_occupancy=100
+        )
+        totals = occupancy_totals(base, base + timedelta(hours=3))
+        # 20% for two hours, then 100% for the last hour
+        self.assertAlmostEqual(totals['average'], 140 / 3)
+        self.assertEqual(totals['peak'], 100)
+        self.assertIsNone(occupancy_totals(base - timedelta(days=1), base))
+
+    def test_bursts_do_not_outweigh_quiet_periods(self):
+        """Test many samples in a busy spell count for their duration only"""
+        OccupancySample.objects.all().delete()
+        base = datetime(2024, 1, 1, 0, 0, tzinfo=dt_timezone.utc)
+        OccupancySample.objects.create(
+            parking_lot=self.parking_lot, bucket_start=base, average_occupancy=0, peak_occupancy=0
+        )
+        # 100 changes during the last four hours, all at full occupancy
+        busy = base + timedelta(hours=20)
+        OccupancySample.objects.bulk_create([
+            OccupancySample(
+                parking_lot=self.parking_lot, bucket_start=busy + timedelta(minutes=2.4 * index),
+                average_occupancy=100, peak_occupancy=100
+            )
+            for index in range(100)
+        ])
+        totals = occupancy_totals(base, base + timedelta(days=1))
+        self.assertAlmostEqual(totals['average'], 100 * 4 / 24)
+        by_lot = occupancy_by_lot(base, base + timedelta(days=1))
+        self.assertAlmostEqual(by_lot[self.parking_lot.id]['average'], 100 * 4 / 24)
+
+
+class AvailabilityCounterTests(TestCase):
+    def setUp(self):
+        self.parking_lot = ParkingLotUserOwnedFactory(total_spaces=2, available_spaces=1)
+
+    def test_counter_bounds(self):
+        """Test counter changes stay within 0..total_spaces"""
+        self.assertTrue(take_space(self.parking_lot))
+        self.assertEqual(self.parking_lot.available_spaces, 0)
+        self.assertFalse(take_space(self.parking_lot))
+        self.assertTrue(adjust_available_spaces(self.parking_lot, 2))
+        self.assertFalse(release_space(self.parking_lot))
+        self.parking_lot.refresh_from_db()
+        self.assertEqual(self.parking_lot.available_spaces, 2)
+
+    def test_counter_uses_database_value(self):
+        """Test a stale instance cannot overwrite concurrent changes"""
+        stale = ParkingLot.objects.get(pk=self.parking_lot.pk)
+        take_space(self.parking_lot)
+        self.assertTrue(release_space(stale))
+        self.assertEqual(stale.available_spaces, 1)
+
+    def test_counter_change_is_one_statement(self):
+        """Test a change is a single UPDATE that also returns the new counts"""
+        before = OccupancySample.objects.filter(parking_lot=self.parking_lot).count()
+        with self.assertNumQueries(1):
+            self.assertTrue(take_space(self.parking_lot))
+        self.assertEqual((self.parking_lot.total_spaces, self.parking_lot.available_spaces), (2, 0))
+        self.assertEqual(OccupancySample.objects.filter(parking_lot=self.parking_lot).count(), before)
+
+    @override_settings(OCCUPANCY_SAMPLE_ON_CHANGE=True)
+    def test_counter_change_is_sampled(self):
+        """Test each applied change records an occupancy sample when enabled"""
+        before = OccupancySample.objects.filter(parking_lot=self.parking_lot).count()
+        take_space(self.parking_lot)
+        take_space(self.parking_lot)
+        samples = OccupancySample.objects.filter(parking_lot=self.parking_lot)
+        self.assertEqual(samples.count(), before + 1)
+        self.assertEqual(samples.latest('id').peak_occupancy, 100)
+
+
+class AvailabilityCounterConcurrencyTests(TransactionTestCase):
+    def test_counter_exact_under_contention(self):
+        """Test many threads changing one lot leave an exact count"""
+        out = StringIO()
+        call_command('benchmark_counters', threads=8, iterations=50, spaces=5, seed=1, stdout=out)
+        self.assertIn('Counter exact', out.getvalue())
+        self.assertFalse(ParkingLot.objects.exists())
@@ -1,13 +1,20 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from app.api.parking_lots.models import ParkingLot, ParkingSpace
-from app.test.factories import ParkingLotUserOwnedFactory, ParkingSpaceFactory, AdminUserFactory, UserFactory
+from app.api.parking_lots.occupancy import record_samples
+from app.test.factories import ParkingLotUserOwnedFactory, ParkingSpaceFactory, AdminUserFactory, UserFactory, ReservationFactory
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
 from decimal import Decimal
 
 class ParkingLotViewSetTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.admin_user = AdminUserFactory()
         self.regular_user = UserFactory()
@@ -21,6 +28,54 @@ class ParkingLotViewSetTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
 
+    def test_list_parking_lots_summary(self):
+        """Test lots are listed with space counts by default and full spaces with ?expand=true"""
+        ParkingSpaceFactory(parking_lot=self.parking_lot, status=ParkingSpace.Status.OCCUPIED)
+        ParkingSpaceFactory(parking_lot=self.parking_lot, status=ParkingSpace.Status.OCCUPIED)
+        url = reverse('parking-lot-list')
+
+        response = self.client.get(url)
+        lot = response.data['results'][0]
+        self.assertNotIn('spaces', lot)
+        self.assertEqual(lot['space_counts'], {
+            'available': 1, 'occupied': 2, 'reserved': 0, 'maintenance': 0
+        })
+
+        response = self.client.get(url, {'expand': 'true'})
+        self.assertEqual(len(response.data['results'][0]['spaces']), 3)
+
+    def test_list_queries_do_not_grow_with_lots(self):
+        """Test listing lots costs the same number of queries for any number of lots and spaces"""
+        url = reverse('parking-lot-list')
+
+        def count_queries(params):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        baseline = [count_queries({}), count_queries({'expand': 'true'})]
+        for _ in range(5):
+            lot = ParkingLotUserOwnedFactory(owner=self.admin_user)
+            ParkingSpaceFactory.create_batch(3, parking_lot=lot)
+        self.assertEqual([count_queries({}), count_queries({'expand': 'true'})], baseline)
+
+    def test_filter_and_sort_by_occupancy(self):
+        """Test occupancy filters and sorting run in the database and keep pagination"""
+        ParkingLot.objects.filter(pk=self.parking_lot.pk).update(total_spaces=10, available_spaces=5)
+        busy = ParkingLotUserOwnedFactory(owner=self.admin_user, total_spaces=10, available_spaces=1)
+        quiet = ParkingLotUserOwnedFactory(owner=self.admin_user, total_spaces=10, available_spaces=9)
+        url = reverse('parking-lot-list')
+
+        response = self.client.get(url, {'max_occupancy': 50, 'sort_by': '-occupancy_rate'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([lot['id'] for lot in response.data['results']], [self.parking_lot.id, quiet.id])
+
+        response = self.client.get(url, {'sort_by': 'occupancy_rate', 'page_size': 1, 'page': 3})
+        self.assertEqual([lot['id'] for lot in response.data['results']], [busy.id])
+        self.assertEqual(ParkingLot.objects.get(pk=busy.pk).occupancy, 90)
+
     def test_create_parking_lot(self):
         url = reverse('parking-lot-list')
         data = {
@@ -44,6 +99,73 @@ class ParkingLotViewSetTest(TestCase):
         self.assertEqual(parking_lot.hourly_rate, Decimal('15.00'))
         self.assertEqual(parking_lot.status, ParkingLot.Status.ACTIVE)
 
+    def test_create_large_lot_in_batches(self):
+        """Test a large lot's spaces are inserted in a handful of statements from a layout"""
+        url = reverse('parking-lot-list')
+        data = {
+            'name': 'Garage',
+            'address': '1 Deck Rd',
+            'latitude': 14.5995,
+            'longitude': 120.9842,
+            'total_spaces': 2000,
+            'available_spaces': 2000,
+            'hourly_rate': '15.00',
+            'layout': [{'prefix': 'L1-', 'count': 1200}, {'prefix': 'L2-', 'count': 800, 'width': 4}]
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "parking_lots_parkingspace"')]
+        self.assertEqual(len(inserts), 2)
+
+        spaces = ParkingSpace.objects.filter(parking_lot__name='Garage')
+        self.assertEqual(spaces.count(), 2000)
+        self.assertTrue(spaces.filter(space_number='L1-1200').exists())
+        self.assertTrue(spaces.filter(space_number='L2-0800').exists())
+
+        data['layout'] = [{'prefix': 'L1-', 'count': 10}]
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resize_parking_lot_adds_spaces(self):
+        """Test growing total_spaces numbers the new spaces after the existing ones"""
+        ParkingSpace.objects.filter(parking_lot=self.parking_lot).delete()
+        ParkingLot.objects.filter(pk=self.parking_lot.pk).update(total_spaces=2, available_spaces=2)
+        ParkingSpace.objects.bulk_create([
+            ParkingSpace(parking_lot=self.parking_lot, space_number=number) for number in ('001', '002')
+        ])
+        url = reverse('parking-lot-detail', args=[self.parking_lot.id])
+        response = self.client.patch(url, {'total_spaces': 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(self.parking_lot.spaces.order_by('space_number').values_list('space_number', flat=True)),
+            ['001', '002', '003', '004', '005']
+        )
+
+    def test_import_spaces(self):
+        """Test importing a zone layout adds spaces and grows the lot counters"""
+        ParkingLot.objects.filter(pk=self.parking_lot.pk).update(total_spaces=10, available_spaces=4)
+        url = reverse('parking-lot-import-spaces', args=[self.parking_lot.id])
+        layout = {'layout': [{'prefix': 'A', 'count': 3}, {'prefix': 'B', 'count': 2, 'start': 10, 'width': 2}]}
+
+        response = self.client.post(url, layout, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 5, 'total_spaces': 15, 'available_spaces': 9})
+        self.assertTrue(self.parking_lot.spaces.filter(space_number='B11').exists())
+
+        # Numbers already in the lot are rejected and nothing is written
+        response = self.client.post(url, {'layout': [{'prefix': 'A', 'count': 5}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('A001', response.data['detail'])
+        self.assertEqual(ParkingLot.objects.get(pk=self.parking_lot.pk).total_spaces, 15)
+
+        response = self.client.post(url, {'layout': [{'prefix': 'C', 'count': 2}, {'prefix': 'C', 'count': 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.post(url, layout, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_update_parking_lot(self):
         url = reverse('parking-lot-detail', args=[self.parking_lot.id])
         data = {
@@ -83,8 +205,45 @@ class ParkingLotViewSetTest(TestCase):
         response = self.client.patch(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_occupancy_history(self):
+        url = reverse('parking-lot-occupancy-history', args=[self.parking_lot.id])
+        # Samples as taken by `manage.py sample_occupancy` before and after a change
+        record_samples()
+        self.parking_lot.available_spaces = self.parking_lot.total_spaces - 5
+        self.parking_lot.save()
+        record_samples()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['samples']), 2)
+        self.assertAlmostEqual(response.data['peak_occupancy'], 5 / self.parking_lot.total_spaces * 100)
+        response = self.client.get(url, {'start': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lot_free_windows(self):
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=self.parking_space,
+            start_time=start + timedelta(hours=1),
+            end_time=start + timedelta(hours=2)
+        )
+        other_space = ParkingSpaceFactory(parking_lot=self.parking_lot)
+        self.client.force_authenticate(user=self.regular_user)
+        url = reverse('parking-lot-free-windows', args=[self.parking_lot.id])
+        response = self.client.get(url, {'start': start.isoformat(), 'count': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        windows = {row['parking_space']: row['windows'] for row in response.data}
+        self.assertEqual(windows[self.parking_space.id], [
+            {'start': start, 'end': start + timedelta(hours=1)},
+            {'start': start + timedelta(hours=2), 'end': None},
+        ])
+        self.assertEqual(windows[other_space.id], [{'start': start, 'end': None}])
+        response = self.client.get(url, {'count': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 class ParkingSpaceViewSetTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.admin_user = AdminUserFactory()
         self.regular_user = UserFactory()
@@ -141,4 +300,38 @@ class ParkingSpaceViewSetTest(TestCase):
         url = reverse('parking-space-detail', args=[self.parking_space.id])
         data = {'status': ParkingSpace.Status.MAINTENANCE}
         response = self.client.patch(url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN) 
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN) 
+
+    def test_occupy_and_vacate_update_lot_counter(self):
+        occupy_url = reverse('parking-space-occupy', args=[self.parking_space.id])
+        vacate_url = reverse('parking-space-vacate', args=[self.parking_space.id])
+        response = self.client.post(occupy_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # A second occupy is rejected and does not take another lot space
+        response = self.client.post(occupy_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.parking_lot.refresh_from_db()
+        self.assertEqual(self.parking_lot.available_spaces, self.parking_lot.total_spaces - 1)
+        
+        response = self.client.post(vacate_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.parking_lot.refresh_from_db()
+        self.parking_space.refresh_from_db()
+        self.assertEqual(self.parking_lot.available_spaces, self.parking_lot.total_spaces)
+        self.assertEqual(self.parking_space.status, ParkingSpace.Status.AVAILABLE)
+
+    def test_space_free_windows(self):
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=self.parking_space,
+            start_time=start,
+            end_time=start + timedelta(hours=2)
+        )
+        url = reverse('parking-space-free-windows', args=[self.parking_space.id])
+        response = self.client.get(url, {
+            'start': start.isoformat(),
+            'until': (start + timedelta(hours=3)).isoformat()
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'start': start + timedelta(hours=2), 'end': start + timedelta(hours=3)}])
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from app.api.reports import analytics
+from app.api.reservations.models import Reservation
+from app.test.factories import (
+    ParkingLotUserOwnedFactory,
+    ParkingSpaceFactory,
+    ReservationFactory,
+    UserFactory
+)
+
+
+class ReservationAnalyticsTests(TestCase):
+    def setUp(self):
+        self.parking_lot = ParkingLotUserOwnedFactory(hourly_rate=Decimal('10.00'))
+        self.other_lot = ParkingLotUserOwnedFactory(hourly_rate=Decimal('4.00'))
+        # A Monday well in the future, at 9:00 local time
+        self.monday = timezone.make_aware(datetime(2031, 6, 2, 9, 0))
+        for lot, offset, hours in [
+            (self.parking_lot, 0, 1),
+            (self.parking_lot, 0, 3),
+            (self.parking_lot, 5, 2),
+            (self.other_lot, 24 + 5, 10),
+        ]:
+            ReservationFactory(
+                parking_lot=lot,
+                parking_space=ParkingSpaceFactory(parking_lot=lot),
+                start_time=self.monday + timedelta(hours=offset),
+                end_time=self.monday + timedelta(hours=offset + hours)
+            )
+        cancelled = ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+            start_time=self.monday,
+            end_time=self.monday + timedelta(hours=1)
+        )
+        cancelled.status = Reservation.Status.CANCELLED
+        cancelled.save()
+        self.columns = analytics.ReservationColumns.load(
+            self.monday.date(), self.monday.date() + timedelta(days=6)
+        )
+
+    def test_load_columns(self):
+        """Test only reportable reservations in the range are loaded"""
+        self.assertEqual(len(self.columns), 4)
+        self.assertEqual(sorted(self.columns.duration_hours.tolist()), [1.0, 2.0, 3.0, 10.0])
+
+    def test_hourly_distribution(self):
+        """Test reservations and revenue are bucketed by local starting hour"""
+        hours = {row['hour']: row for row in analytics.hourly_distribution(self.columns)}
+        self.assertEqual(hours[9]['reservations'], 2)
+        self.assertEqual(hours[9]['revenue'], 40.0)
+        self.assertEqual(hours[14]['reservations'], 2)
+        self.assertEqual(hours[14]['revenue'], 60.0)
+
+    def test_duration_distribution(self):
+        """Test the duration histogram and percentiles"""
+        result = analytics.duration_distribution(self.columns)
+        self.assertEqual(result['count'], 4)
+        self.assertEqual(result['mean'], 4.0)
+        self.assertEqual(result['percentiles']['p50'], 2.5)
+        self.assertEqual([row['reservations'] for row in result['bins']], [0, 1, 1, 1, 0, 0, 1, 0, 0])
+        self.assertIsNone(result['bins'][-1]['max_hours'])
+
+    def test_revenue_heatmap(self):
+        """Test revenue lands in the weekday x hour cell of each reservation"""
+        result = analytics.revenue_heatmap(self.columns)
+        self.assertEqual(result['revenue'][0][9], 40.0)
+        self.assertEqual(result['revenue'][0][14], 20.0)
+        self.assertEqual(result['revenue'][1][14], 40.0)
+        self.assertEqual(sum(map(sum, result['reservations'])), 4)
+
+    def test_revenue_by_lot(self):
+        """Test totals are grouped per parking lot"""
+        lots = {row['parking_lot']: row for row in analytics.revenue_by_lot(self.columns)}
+        self.assertEqual(lots[self.parking_lot.id]['reservations'], 3)
+        self.assertEqual(lots[self.parking_lot.id]['revenue'], 60.0)
+        self.assertEqual(lots[self.other_lot.id]['average_duration'], 10.0)
+
+    def test_empty_range(self):
+        """Test statistics on an empty range"""
+        columns = analytics.ReservationColumns.load(datetime(2000, 1, 1).date(), datetime(2000, 1, 2).date())
+        self.assertEqual(len(columns), 0)
+        self.assertIsNone(analytics.duration_distribution(columns)['mean'])
+        self.assertEqual(analytics.revenue_by_lot(columns), [])
+
+    def test_analytics_endpoints(self):
+        """Test the analytics actions on the report viewset"""
+        client = APIClient()
+        client.force_authenticate(user=UserFactory(is_staff=True))
+        params = {
+            'start_date': self.monday.date().isoformat(),
+            'end_date': (self.monday.date() + timedelta(days=6)).isoformat(),
+            'lots': str(self.parking_lot.id)
+        }
+        response = client.get(reverse('report-hourly-distribution'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(row['reservations'] for row in response.data['results']), 3)
+        for name in ('report-duration-distribution', 'report-revenue-heatmap', 'report-revenue-by-lot'):
+            self.assertEqual(client.get(reverse(name), params).status_code, status.HTTP_200_OK)
+        response = client.get(reverse('report-revenue-by-lot'), {'start_date': 'bad'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
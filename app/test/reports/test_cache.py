@@ -0,0 +1,76 @@
+import threading
+import time
+from datetime import date
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from app.api.reports import cache as report_cache
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_miss_then_hit(self):
+        """Test a computed value is cached and counted"""
+        data, hit = report_cache.single_flight('test', 'reports:test', lambda: {'value': 1}, 60)
+        self.assertEqual(data, {'value': 1})
+        self.assertFalse(hit)
+        data, hit = report_cache.single_flight('test', 'reports:test', lambda: {'value': 2}, 60)
+        self.assertEqual(data, {'value': 1})
+        self.assertTrue(hit)
+        self.assertEqual(report_cache.stats('test'), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_concurrent_callers_compute_once(self):
+        """Test concurrent misses wait for a single computation"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': len(calls)}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(report_cache.single_flight('test', 'reports:test', compute, 60))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([data for data, _ in results], [{'value': 1}] * 5)
+        self.assertEqual(sum(1 for _, hit in results if not hit), 1)
+
+    def test_lock_released_after_failure(self):
+        """Test a failed computation does not block the next caller"""
+        def fail():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            report_cache.single_flight('test', 'reports:test', fail, 60)
+        data, hit = report_cache.single_flight('test', 'reports:test', lambda: {'value': 1}, 60)
+        self.assertEqual(data, {'value': 1})
+        self.assertFalse(hit)
+
+
+class DateVersionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_evicted_version_does_not_repeat_a_key(self):
+        """Test a version evicted after bumps restarts above every value it held"""
+        day = date(2026, 1, 1)
+        seen = {report_cache.range_key('test', day, day)}
+        report_cache.bump_dates([day])
+        seen.add(report_cache.range_key('test', day, day))
+
+        cache.delete(report_cache.VERSION_KEY.format(date=day.isoformat()))
+        key = report_cache.range_key('test', day, day)
+        self.assertNotIn(key, seen)
+        self.assertEqual(report_cache.range_key('test', day, day), key)
+        report_cache.bump_dates([day])
+        self.assertNotIn(report_cache.range_key('test', day, day), seen | {key})
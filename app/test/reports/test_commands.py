@@ -0,0 +1,96 @@
+import os
+import tempfile
+from io import StringIO
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from app.api.reports.backfill import Checkpoint
+from app.api.reports.models import DailyReport, ParkingLotReport
+from app.test.factories import (
+    ParkingLotUserOwnedFactory,
+    ParkingSpaceFactory,
+    ReservationFactory
+)
+
+class GenerateReportsSetup:
+    workers = 1
+
+    def setUp(self):
+        self.lots = ParkingLotUserOwnedFactory.create_batch(3, hourly_rate=Decimal('10.00'))
+        self.start = timezone.localtime(timezone.now()).replace(
+            hour=8, minute=0, second=0, microsecond=0
+        ) - timedelta(days=2)
+        ReservationFactory(
+            parking_lot=self.lots[0],
+            parking_space=ParkingSpaceFactory(parking_lot=self.lots[0]),
+            start_time=self.start,
+            end_time=self.start + timedelta(hours=3)
+        )
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'reports.checkpoint')
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command(
+            'generate_reports',
+            '--from', self.start.date().isoformat(),
+            '--to', (self.start.date() + timedelta(days=1)).isoformat(),
+            '--workers', str(self.workers),
+            '--lots-per-unit', '2',
+            '--checkpoint', self.checkpoint,
+            *args,
+            stdout=out
+        )
+        return out.getvalue()
+
+
+class GenerateReportsCommandTests(GenerateReportsSetup, TestCase):
+    def test_generates_date_by_lot_matrix(self):
+        """Test every date and lot gets a report in one run"""
+        output = self.run_command()
+        self.assertEqual(DailyReport.objects.count(), 2)
+        self.assertEqual(ParkingLotReport.objects.count(), 6)
+        report = ParkingLotReport.objects.get(parking_lot=self.lots[0], date=self.start.date())
+        self.assertEqual(report.total_reservations, 1)
+        self.assertEqual(report.total_revenue, Decimal('30.00'))
+        self.assertIn('reports/s', output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_rerun_upserts_existing_reports(self):
+        """Test running twice updates reports instead of duplicating them"""
+        self.run_command()
+        self.run_command()
+        self.assertEqual(DailyReport.objects.count(), 2)
+        self.assertEqual(ParkingLotReport.objects.count(), 6)
+
+    def test_resumes_from_checkpoint(self):
+        """Test units recorded in the checkpoint are skipped"""
+        lot_ids = sorted(lot.id for lot in self.lots)
+        checkpoint = Checkpoint(self.checkpoint, {
+            'from': self.start.date().isoformat(),
+            'to': (self.start.date() + timedelta(days=1)).isoformat(),
+            'lots': lot_ids,
+            'lots_per_unit': 2,
+        })
+        checkpoint.mark_done([f'{self.start.date().isoformat()}:0', f'{self.start.date().isoformat()}:1'])
+        output = self.run_command()
+        self.assertIn('Resuming', output)
+        self.assertFalse(DailyReport.objects.filter(date=self.start.date()).exists())
+        self.assertEqual(ParkingLotReport.objects.count(), 3)
+
+
+class ParallelGenerateReportsCommandTests(GenerateReportsSetup, TransactionTestCase):
+    """Worker processes use their own connections, so the data is committed."""
+
+    workers = 2
+
+    def test_workers_generate_every_report(self):
+        """Test spawned workers compute the same reports as the current process"""
+        output = self.run_command()
+        self.assertIn('2 workers', output)
+        self.assertEqual(DailyReport.objects.count(), 2)
+        self.assertEqual(ParkingLotReport.objects.count(), 6)
+        report = ParkingLotReport.objects.get(parking_lot=self.lots[0], date=self.start.date())
+        self.assertEqual(report.total_reservations, 1)
+        self.assertEqual(report.total_revenue, Decimal('30.00'))
@@ -1,18 +1,25 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
-from app.api.parking_lots.models import ParkingLot
-from app.api.reports.models import DailyReport, MonthlyReport, ParkingLotReport
-from datetime import datetime, timedelta
+from app.api.parking_lots.models import ParkingLot, OccupancySample
+from app.api.reports.models import (
+    DailyReport, MonthlyReport, ParkingLotReport, ReservationRollup, merge_daily_reports
+)
+from app.api.reports.rollups import reconcile
+from app.api.reservations.models import Reservation
+from datetime import datetime, timedelta, time
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from app.test.factories import (
     ParkingLotUserOwnedFactory,
+    ParkingSpaceFactory,
+    ReservationFactory,
     DailyReportFactory,
     MonthlyReportFactory,
     ParkingLotReportFactory
 )
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 
 User = get_user_model()
 
@@ -199,4 +206,253 @@ class ParkingLotReportModelTests(TestCase):
         self.assertEqual(report.total_reservations, 0)
         self.assertEqual(report.occupancy_rate, 0)
         self.assertEqual(report.average_duration, 0)
-        self.assertIsNone(report.peak_hour) 
\ No newline at end of file
+        self.assertIsNone(report.peak_hour)
+
+
+class ReportGenerationTests(TestCase):
+    def setUp(self):
+        self.parking_lot = ParkingLotUserOwnedFactory(hourly_rate=Decimal('10.00'))
+        self.start = timezone.localtime(timezone.now()).replace(
+            hour=9, minute=0, second=0, microsecond=0
+        ) - timedelta(days=1)
+        self.date = self.start.date()
+        # Two reservations at 9:00 and one at 14:00
+        for offset, hours in [(0, 2), (0, 1), (5, 3)]:
+            ReservationFactory(
+                parking_lot=self.parking_lot,
+                parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+                start_time=self.start + timedelta(hours=offset),
+                end_time=self.start + timedelta(hours=offset + hours)
+            )
+        cancelled = ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+            start_time=self.start,
+            end_time=self.start + timedelta(hours=4)
+        )
+        cancelled.status = Reservation.Status.CANCELLED
+        cancelled.save()
+
+    def test_daily_report_aggregates(self):
+        """Test daily report totals are computed in the database"""
+        report = DailyReport.generate_report(date=self.date)
+        self.assertEqual(report.total_reservations, 3)
+        self.assertEqual(report.total_revenue, Decimal('60.00'))
+        self.assertAlmostEqual(report.average_duration, 2.0)
+        self.assertEqual(report.peak_hour, time(9, 0))
+
+    def test_parking_lot_report_aggregates(self):
+        """Test parking lot report totals are computed in the database"""
+        other_lot = ParkingLotUserOwnedFactory(hourly_rate=Decimal('5.00'))
+        ReservationFactory(
+            parking_lot=other_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=other_lot),
+            start_time=self.start,
+            end_time=self.start + timedelta(hours=1)
+        )
+        report = ParkingLotReport.generate_report(parking_lot=self.parking_lot, date=self.date)
+        self.assertEqual(report.total_reservations, 3)
+        self.assertEqual(report.total_revenue, Decimal('60.00'))
+        self.assertEqual(report.peak_hour, time(9, 0))
+
+    def test_generate_for_all_lots(self):
+        """Test every lot's report is produced by grouped queries and one upsert"""
+        other_lot = ParkingLotUserOwnedFactory(hourly_rate=Decimal('5.00'))
+        empty_lot = ParkingLotUserOwnedFactory()
+        ReservationFactory(
+            parking_lot=other_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=other_lot),
+            start_time=self.start + timedelta(hours=3),
+            end_time=self.start + timedelta(hours=5)
+        )
+        ParkingLotReport.objects.create(parking_lot=self.parking_lot, date=self.date, total_reservations=99)
+        with CaptureQueriesContext(connection) as context:
+            ParkingLotReport.generate_for_all_lots(date=self.date)
+        self.assertLessEqual(len(context.captured_queries), 4)
+        
+        reports = {report.parking_lot_id: report for report in ParkingLotReport.objects.filter(date=self.date)}
+        self.assertEqual(len(reports), ParkingLot.objects.count())
+        self.assertEqual(reports[self.parking_lot.id].total_reservations, 3)
+        self.assertEqual(reports[self.parking_lot.id].peak_hour, time(9, 0))
+        self.assertEqual(reports[other_lot.id].total_revenue, Decimal('10.00'))
+        self.assertEqual(reports[other_lot.id].peak_hour, time(12, 0))
+        self.assertEqual(reports[empty_lot.id].total_reservations, 0)
+        self.assertIsNone(reports[empty_lot.id].peak_hour)
+
+    def test_monthly_report_aggregates(self):
+        """Test monthly report totals and peak day"""
+        report = MonthlyReport.generate_report(year=self.date.year, month=self.date.month)
+        self.assertEqual(report.total_reservations, 3)
+        self.assertEqual(report.total_revenue, Decimal('60.00'))
+        self.assertEqual(report.peak_day, self.date)
+
+    def test_daily_report_reads_rollups_only(self):
+        """Test report generation does not scan reservations"""
+        with CaptureQueriesContext(connection) as context:
+            DailyReport.generate_report(date=self.date)
+        reservation_queries = [
+            query for query in context.captured_queries
+            if 'reservations_reservation' in query['sql']
+        ]
+        self.assertEqual(reservation_queries, [])
+
+    def test_reports_use_historical_occupancy(self):
+        """Test past reports read the day's occupancy samples, not the live counts"""
+        OccupancySample.objects.all().delete()
+        day_start = timezone.make_aware(datetime.combine(self.date, time.min))
+        for hour, rate in [(8, 20), (12, 80), (18, 50)]:
+            OccupancySample.objects.create(
+                parking_lot=self.parking_lot,
+                bucket_start=day_start + timedelta(hours=hour),
+                average_occupancy=rate,
+                peak_occupancy=rate
+            )
+        # Weighted by time held: 20% for 4 hours, 80% for 6, 50% until midnight
+        expected = (20 * 4 + 80 * 6 + 50 * 6) / 16
+        daily = DailyReport.generate_report(date=self.date)
+        self.assertAlmostEqual(daily.occupancy_rate, expected)
+        self.assertEqual(daily.peak_occupancy_rate, 80)
+        lot_report = ParkingLotReport.generate_report(parking_lot=self.parking_lot, date=self.date)
+        self.assertAlmostEqual(lot_report.occupancy_rate, expected)
+        self.assertEqual(lot_report.peak_occupancy_rate, 80)
+        
+        empty_day = DailyReport.generate_report(date=self.date - timedelta(days=30))
+        self.assertEqual(empty_day.occupancy_rate, 0)
+
+    def test_merge_uses_stored_daily_reports(self):
+        """Test range reports merge fresh daily reports without recomputing them"""
+        DailyReport.generate_report(date=self.date)
+        DailyReport.objects.filter(date=self.date).update(total_reservations=7, average_duration=1.0)
+        totals = merge_daily_reports(self.date - timedelta(days=3), self.date + timedelta(days=3))
+        self.assertEqual(totals['total_reservations'], 7)
+        self.assertEqual(totals['total_revenue'], Decimal('60.00'))
+        self.assertAlmostEqual(totals['average_duration'], 1.0)
+        self.assertEqual(totals['peak'], self.date)
+
+    def test_merge_recomputes_stale_and_missing_days(self):
+        """Test days changed after their daily report, or without one, fall back to rollups"""
+        DailyReport.generate_report(date=self.date)
+        ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+            start_time=self.start,
+            end_time=self.start + timedelta(hours=2)
+        )
+        ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+            start_time=self.start - timedelta(days=1),
+            end_time=self.start - timedelta(days=1) + timedelta(hours=1)
+        )
+        with CaptureQueriesContext(connection) as context:
+            totals = merge_daily_reports(self.date - timedelta(days=1), self.date)
+        self.assertEqual(totals['total_reservations'], 5)
+        self.assertEqual(totals['total_revenue'], Decimal('90.00'))
+        self.assertEqual(totals['peak'], self.date)
+        self.assertEqual([day['bucket'] for day in totals['days']], [self.date - timedelta(days=1), self.date])
+        self.assertFalse(any('reservations_reservation' in query['sql'] for query in context.captured_queries))
+
+    def test_merge_averages_stored_occupancy(self):
+        """Test the range occupancy rate is the mean of the stored daily rates"""
+        DailyReport.objects.create(date=self.date, occupancy_rate=40)
+        DailyReport.objects.create(date=self.date - timedelta(days=1), occupancy_rate=60)
+        totals = merge_daily_reports(self.date - timedelta(days=1), self.date)
+        self.assertAlmostEqual(totals['average_occupancy_rate'], 50)
+
+    def test_merge_samples_occupancy_of_missing_days(self):
+        """Test days without a daily report take their occupancy from the samples"""
+        OccupancySample.objects.all().delete()
+        DailyReport.objects.create(date=self.date, occupancy_rate=40)
+        missing = self.date - timedelta(days=1)
+        day_start = timezone.make_aware(datetime.combine(missing, time.min))
+        for hour, rate in [(10, 60), (16, 100), (24 + 10, 0)]:
+            OccupancySample.objects.create(
+                parking_lot=self.parking_lot,
+                bucket_start=day_start + timedelta(hours=hour),
+                average_occupancy=rate,
+                peak_occupancy=rate
+            )
+        # 60% for 6 hours, then 100% until midnight; the day before has no data
+        totals = merge_daily_reports(self.date - timedelta(days=2), self.date)
+        self.assertAlmostEqual(totals['average_occupancy_rate'], (40 + (60 * 6 + 100 * 8) / 14) / 2)
+
+
+class ReservationRollupTests(TestCase):
+    def setUp(self):
+        self.parking_lot = ParkingLotUserOwnedFactory(hourly_rate=Decimal('10.00'))
+        self.start = timezone.localtime(timezone.now()).replace(
+            hour=10, minute=0, second=0, microsecond=0
+        ) + timedelta(days=1)
+        self.reservation = ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+            start_time=self.start,
+            end_time=self.start + timedelta(hours=2)
+        )
+
+    def get_bucket(self):
+        return ReservationRollup.objects.get(
+            date=self.start.date(),
+            parking_lot=self.parking_lot,
+            hour=10
+        )
+
+    def test_create_adds_to_bucket(self):
+        """Test creating a reservation increments its bucket"""
+        bucket = self.get_bucket()
+        self.assertEqual(bucket.total_reservations, 1)
+        self.assertEqual(bucket.total_revenue, Decimal('20.00'))
+        self.assertAlmostEqual(bucket.total_duration, 2.0)
+
+    def test_cancel_removes_from_bucket(self):
+        """Test cancelling a reservation removes its contribution"""
+        reservation = Reservation.objects.get(pk=self.reservation.pk)
+        reservation.status = Reservation.Status.CANCELLED
+        reservation.save()
+        bucket = self.get_bucket()
+        self.assertEqual(bucket.total_reservations, 0)
+        self.assertEqual(bucket.total_revenue, Decimal('0'))
+
+    def test_complete_keeps_bucket(self):
+        """Test completing a reservation keeps it in the bucket"""
+        self.reservation.status = Reservation.Status.COMPLETED
+        self.reservation.save()
+        self.assertEqual(self.get_bucket().total_reservations, 1)
+
+    def test_moving_reservation_moves_bucket(self):
+        """Test changing the start time moves the contribution between buckets"""
+        self.reservation.start_time = self.start + timedelta(hours=3)
+        self.reservation.end_time = self.start + timedelta(hours=4)
+        self.reservation.save()
+        self.assertEqual(self.get_bucket().total_reservations, 0)
+        moved = ReservationRollup.objects.get(
+            date=self.start.date(), parking_lot=self.parking_lot, hour=13
+        )
+        self.assertEqual(moved.total_reservations, 1)
+        self.assertEqual(moved.total_revenue, Decimal('10.00'))
+
+    def test_delete_removes_from_bucket(self):
+        """Test deleting a reservation removes its contribution"""
+        self.reservation.delete()
+        self.assertEqual(self.get_bucket().total_reservations, 0)
+
+    def test_rate_change_keeps_booked_revenue(self):
+        """Test a lot rate change is neither applied to past bookings nor reported as drift"""
+        ParkingLot.objects.filter(pk=self.parking_lot.pk).update(hourly_rate=Decimal('15.00'))
+        reservation = Reservation.objects.get(pk=self.reservation.pk)
+        reservation.end_time = self.start + timedelta(hours=3)
+        reservation.save()
+        self.assertEqual(self.get_bucket().total_revenue, Decimal('30.00'))
+        self.assertEqual(reservation.total_cost, Decimal('30.00'))
+        self.assertEqual(reconcile(), [])
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        """Test reconcile rebuilds drifted buckets from raw reservations"""
+        self.assertEqual(reconcile(), [])
+        ReservationRollup.objects.update(total_reservations=5)
+        drift = reconcile(dry_run=True)
+        self.assertEqual(len(drift), 1)
+        self.assertEqual(self.get_bucket().total_reservations, 5)
+        reconcile()
+        self.assertEqual(self.get_bucket().total_reservations, 1)
+        self.assertEqual(reconcile(), [])
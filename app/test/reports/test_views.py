@@ -1,22 +1,31 @@
+from asgiref.sync import async_to_sync
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from app.api.reports.models import DailyReport, MonthlyReport, ParkingLotReport
+from app.api.parking_lots.models import ParkingLot
 from app.test.factories import (
     UserFactory,
     ParkingLotUserOwnedFactory,
     DailyReportFactory,
     MonthlyReportFactory,
-    ParkingLotReportFactory
+    ParkingLotReportFactory,
+    ParkingSpaceFactory,
+    ReservationFactory
 )
 from datetime import datetime, timedelta
 from decimal import Decimal
 from django.utils import timezone
+import csv
 import json
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 class ReportViewSetTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = UserFactory(is_staff=True)
         self.client.force_authenticate(user=self.user)
@@ -83,6 +92,27 @@ class ReportViewSetTests(TestCase):
         self.assertIn('total_revenue', response.data)
         self.assertIn('daily_reservations', response.data)
 
+    def test_summary_is_cached(self):
+        """Test the summary is computed once and then served from the cache."""
+        url = reverse('report-summary')
+        DailyReport.objects.update_or_create(
+            date=timezone.localdate() - timedelta(days=1),
+            defaults={'total_reservations': 10, 'average_duration': 2.0, 'occupancy_rate': 40}
+        )
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(first.data['reservation_change'], -10)
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertFalse(any('reports_' in query['sql'] for query in context.captured_queries))
+        
+        stats = self.client.get(reverse('report-cache-stats')).data
+        self.assertEqual(stats['summary']['hits'], 1)
+        self.assertEqual(stats['summary']['misses'], 1)
+
     def test_monthly_endpoint(self):
         """Test the monthly endpoint."""
         url = reverse('report-monthly')
@@ -91,6 +121,16 @@ class ReportViewSetTests(TestCase):
         self.assertIn('total_revenue', response.data)
         self.assertIn('total_reservations', response.data)
 
+    def test_yearly_endpoint(self):
+        """Test the yearly endpoint."""
+        url = reverse('report-yearly')
+        response = self.client.get(url, {'year': datetime.now().year})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('total_revenue', response.data)
+        self.assertIn('peak_day', response.data)
+        response = self.client.get(url, {'year': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_date_range_endpoint(self):
         """Test the date range endpoint."""
         url = reverse('report-date-range')
@@ -104,6 +144,51 @@ class ReportViewSetTests(TestCase):
         self.assertIn('total_revenue', response.data)
         self.assertIn('total_reservations', response.data)
 
+    def test_date_range_is_cached_until_a_date_changes(self):
+        """Test repeated date range requests are served from the cache until a reservation write."""
+        url = reverse('report-date-range')
+        start_time = timezone.localtime(timezone.now()).replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=30)
+        params = {
+            'start_date': (start_time - timedelta(days=1)).date().isoformat(),
+            'end_date': (start_time + timedelta(days=1)).date().isoformat()
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservationFactory(
+                parking_lot=self.parking_lot,
+                parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+                start_time=start_time,
+                end_time=start_time + timedelta(hours=2)
+            )
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_reservations'], 1)
+        self.assertEqual(response.data['daily_data'], [{'date': start_time.date().isoformat(), 'reservations': 1}])
+        
+        with CaptureQueriesContext(connection) as context:
+            cached = self.client.get(url, params)
+        report_queries = [
+            query for query in context.captured_queries
+            if 'reports_' in query['sql'] or 'reservations_' in query['sql']
+        ]
+        self.assertEqual(report_queries, [])
+        self.assertEqual(cached.data, response.data)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservationFactory(
+                parking_lot=self.parking_lot,
+                parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+                start_time=start_time + timedelta(hours=3),
+                end_time=start_time + timedelta(hours=4)
+            )
+        response = self.client.get(url, params)
+        self.assertEqual(response.data['total_reservations'], 2)
+
+    def test_date_range_rejects_reversed_range(self):
+        """Test the date range endpoint rejects an end date before the start date."""
+        url = reverse('report-date-range')
+        response = self.client.get(url, {'start_date': '2024-02-01', 'end_date': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_parking_lot_endpoint(self):
         """Test the parking lot endpoint."""
         url = reverse('report-parking-lot', args=[self.parking_lot.id])
@@ -112,6 +197,23 @@ class ReportViewSetTests(TestCase):
         self.assertIn('total_revenue', response.data)
         self.assertIn('total_reservations', response.data)
 
+    def test_generate_lot_reports_endpoint(self):
+        """Test generating every parking lot report in one request."""
+        url = reverse('report-generate-lot-reports')
+        response = self.client.post(url, {'date': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['generated'], ParkingLot.objects.count())
+        response = self.client.post(url, {'date': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def read_export(self, response):
+        """Consume a streamed export the way an ASGI server does."""
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        return async_to_sync(read)().decode()
+
     def test_export_endpoint(self):
         """Test the export endpoint."""
         url = reverse('report-export')
@@ -125,6 +227,58 @@ class ReportViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response['Content-Type'], 'text/csv')
 
+    def test_export_streams_parking_lot_rows_in_one_query(self):
+        """Test the parking lot export streams every row without per-row queries."""
+        url = reverse('report-export')
+        start_date = timezone.now().date() - timedelta(days=365)
+        end_date = timezone.now().date()
+        response = self.client.get(url, {
+            'type': 'parking_lot',
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as context:
+            lines = self.read_export(response).splitlines()
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(lines[0].split(',')[0], 'Parking Lot')
+        self.assertEqual(len(lines) - 1, ParkingLotReport.objects.filter(date__range=[start_date, end_date]).count())
+        self.assertTrue(all(line.startswith(self.parking_lot.name) for line in lines[1:]))
+
+    def test_export_reservations(self):
+        """Test exporting raw reservations for a date range."""
+        start_time = timezone.now() + timedelta(days=1)
+        reservation = ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=2)
+        )
+        url = reverse('report-export')
+        response = self.client.get(url, {
+            'type': 'reservations',
+            'start_date': (start_time - timedelta(days=1)).date().isoformat(),
+            'end_date': (start_time + timedelta(days=1)).date().isoformat()
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(self.read_export(response).splitlines()))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], str(reservation.id))
+        self.assertEqual(rows[1][4], reservation.vehicle_plate)
+        self.assertEqual(Decimal(rows[1][-1]), (reservation.total_cost).quantize(Decimal('0.01')))
+
+    def test_export_invalid_type(self):
+        """Test exporting an unknown report type."""
+        url = reverse('report-export')
+        response = self.client.get(url, {
+            'type': 'unknown',
+            'start_date': '2024-01-01',
+            'end_date': '2024-01-31'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_unauthorized_access(self):
         """Test unauthorized access to reports."""
         self.client.force_authenticate(user=None)
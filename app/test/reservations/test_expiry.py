@@ -0,0 +1,99 @@
+from io import StringIO
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from app.api.notification.models import Notification
+from app.api.parking_lots.models import ParkingLot, ParkingSpace
+from app.api.reservations.expiry import ExpiryScheduler, expire_due, sweep
+from app.api.reservations.intervals import has_overlap
+from app.api.reservations.models import Reservation
+from app.test.factories import (
+    UserFactory,
+    ParkingLotUserOwnedFactory,
+    ParkingSpaceFactory,
+    ReservationFactory
+)
+
+
+class ReservationExpiryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        self.parking_lot = ParkingLotUserOwnedFactory(total_spaces=10, available_spaces=10)
+        self.now = timezone.now()
+
+    def book(self, start_hours, end_hours, space=None):
+        return ReservationFactory(
+            user=self.user,
+            parking_lot=self.parking_lot,
+            parking_space=space or ParkingSpaceFactory(parking_lot=self.parking_lot),
+            start_time=self.now + timedelta(hours=start_hours),
+            end_time=self.now + timedelta(hours=end_hours)
+        )
+
+    def test_expire_due(self):
+        """Test due reservations expire and free their spaces and lot counters"""
+        due = [self.book(-3, -1), self.book(-2, -1)]
+        upcoming = self.book(1, 2)
+        # The space of a due booking that is booked again later stays reserved
+        rebooked = self.book(2, 3, space=due[1].parking_space)
+        self.assertTrue(has_overlap(due[0].parking_space_id, self.now - timedelta(hours=2), self.now))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rows = expire_due()
+
+        self.assertEqual(sorted(row[0] for row in rows), sorted(reservation.id for reservation in due))
+        self.assertEqual(
+            set(Reservation.objects.filter(status=Reservation.Status.EXPIRED).values_list('id', flat=True)),
+            {reservation.id for reservation in due}
+        )
+        self.assertEqual(
+            Reservation.objects.filter(status=Reservation.Status.ACTIVE).count(), 2
+        )
+        self.assertEqual(ParkingSpace.objects.get(pk=due[0].parking_space_id).status, ParkingSpace.Status.AVAILABLE)
+        self.assertEqual(ParkingSpace.objects.get(pk=rebooked.parking_space_id).status, ParkingSpace.Status.RESERVED)
+        self.assertEqual(ParkingSpace.objects.get(pk=upcoming.parking_space_id).status, ParkingSpace.Status.RESERVED)
+        self.assertEqual(ParkingLot.objects.get(pk=self.parking_lot.pk).available_spaces, 10 - 4 + 2)
+        self.assertFalse(has_overlap(due[0].parking_space_id, self.now - timedelta(hours=2), self.now))
+        self.assertEqual(
+            Notification.objects.filter(user=self.user, type=Notification.NotificationType.RESERVATION_EXPIRED).count(), 2
+        )
+
+    def test_sweep_in_batches(self):
+        """Test a sweep keeps taking batches until nothing is due"""
+        for _ in range(5):
+            self.book(-2, -1)
+        self.assertEqual(sweep(batch_size=2), 5)
+        self.assertEqual(sweep(batch_size=2), 0)
+
+    def test_counters_capped(self):
+        """Test freed spaces never push a lot above its total"""
+        self.book(-2, -1)
+        ParkingLot.objects.filter(pk=self.parking_lot.pk).update(available_spaces=10)
+        expire_due()
+        self.assertEqual(ParkingLot.objects.get(pk=self.parking_lot.pk).available_spaces, 10)
+
+    def test_scheduler_wakes_at_next_end_time(self):
+        """Test the scheduler sleeps until the next end time, capped by max_sleep"""
+        scheduler = ExpiryScheduler(max_sleep=600)
+        self.assertEqual(scheduler.tick(), 600)
+
+        reservation = self.book(-1, 0.05)
+        delay = scheduler.tick()
+        self.assertEqual(scheduler.deadline, reservation.end_time)
+        self.assertLessEqual(delay, 180)
+        self.assertGreater(delay, 100)
+
+        scheduler.schedule(self.now + timedelta(hours=1))
+        self.assertFalse(scheduler._wake.is_set())
+        scheduler.schedule(self.now)
+        self.assertTrue(scheduler._wake.is_set())
+
+    def test_command_once(self):
+        """Test the daemon command can run a single sweep"""
+        self.book(-2, -1)
+        out = StringIO()
+        call_command('expire_reservations', '--once', stdout=out)
+        self.assertIn('Expired 1 reservations', out.getvalue())
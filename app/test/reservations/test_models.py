@@ -1,7 +1,18 @@
-from django.test import TestCase
+import asyncio
+import threading
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
-from app.api.parking_lots.models import ParkingLot, ParkingSpace
-from app.api.reservations.models import Reservation
+from app.api.parking_lots.models import OccupancySample, ParkingLot, ParkingSpace
+from app.api.reservations.models import Reservation, ReservationConflict
+from app.api.reservations.intervals import SpaceIntervals, has_overlap
+from app.api.reservations.services import ReservationService
+from app.api.reports.models import ReservationRollup
+from django.db.models import Sum
+from django.core.cache import cache
 from datetime import datetime, timedelta
 from decimal import Decimal
 from django.utils import timezone
@@ -123,4 +134,301 @@ class ReservationModelTests(TestCase):
         self.reservation.status = Reservation.Status.CANCELLED
         self.reservation.save()
         self.parking_lot.refresh_from_db()
-        self.assertEqual(self.parking_lot.available_spaces, current_spaces + 1) 
\ No newline at end of file
+        self.assertEqual(self.parking_lot.available_spaces, current_spaces + 1) 
+class ReservationOverlapConstraintTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.parking_lot = ParkingLotUserOwnedFactory()
+        self.parking_space = ParkingSpaceFactory(parking_lot=self.parking_lot)
+        self.start_time = timezone.now() + timedelta(hours=1)
+        self.reservation = ReservationFactory(
+            user=self.user,
+            parking_lot=self.parking_lot,
+            parking_space=self.parking_space,
+            start_time=self.start_time,
+            end_time=self.start_time + timedelta(hours=2)
+        )
+
+    def book(self, start_hours, end_hours, **kwargs):
+        return ReservationFactory(
+            user=self.user,
+            parking_lot=self.parking_lot,
+            parking_space=self.parking_space,
+            start_time=self.start_time + timedelta(hours=start_hours),
+            end_time=self.start_time + timedelta(hours=end_hours),
+            **kwargs
+        )
+
+    def test_overlapping_insert_is_rejected(self):
+        """Test the exclusion constraint rejects an overlapping active booking"""
+        available = ParkingLot.objects.get(pk=self.parking_lot.pk).available_spaces
+        with self.assertRaises(ReservationConflict):
+            self.book(1, 3)
+        # The lot counter update is rolled back with the failed insert
+        self.assertEqual(ParkingLot.objects.get(pk=self.parking_lot.pk).available_spaces, available)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_adjacent_and_inactive_bookings_are_allowed(self):
+        """Test touching ranges and non-active reservations do not conflict"""
+        self.book(2, 4)
+        self.book(0, 2, status=Reservation.Status.CANCELLED)
+        self.assertEqual(Reservation.objects.count(), 3)
+
+    def test_overlapping_update_is_rejected(self):
+        """Test moving a booking onto another one is rejected"""
+        later = self.book(3, 4)
+        later.start_time = self.start_time + timedelta(hours=1)
+        with self.assertRaises(ReservationConflict):
+            later.save()
+
+
+class SpaceIntervalsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.base = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def at(self, hours):
+        return self.base + timedelta(hours=hours)
+
+    def test_overlaps(self):
+        """Test bisect overlap checks against merged busy intervals"""
+        index = SpaceIntervals([(self.at(4), self.at(6)), (self.at(1), self.at(2)), (self.at(2), self.at(3))])
+        self.assertEqual(len(index), 2)
+        self.assertTrue(index.overlaps(self.at(1.5), self.at(1.75)))
+        self.assertTrue(index.overlaps(self.at(0), self.at(5)))
+        self.assertTrue(index.overlaps(self.at(5.5), self.at(7)))
+        self.assertFalse(index.overlaps(self.at(3), self.at(4)))
+        self.assertFalse(index.overlaps(self.at(6), self.at(8)))
+        self.assertFalse(index.overlaps(self.at(-2), self.at(1)))
+
+    def test_free_windows(self):
+        """Test the next free windows skip busy and too short gaps"""
+        index = SpaceIntervals([(self.at(1), self.at(2)), (self.at(2.25), self.at(3)), (self.at(5), self.at(6))])
+        self.assertEqual(
+            index.free_windows(self.at(0), count=5, min_duration=timedelta(minutes=30)),
+            [(self.at(0), self.at(1)), (self.at(3), self.at(5)), (self.at(6), None)]
+        )
+        self.assertEqual(index.free_windows(self.at(1.5), count=1), [(self.at(2), self.at(2.25))])
+        self.assertEqual(
+            index.free_windows(self.at(0), until=self.at(5.5)),
+            [(self.at(0), self.at(1)), (self.at(2), self.at(2.25)), (self.at(3), self.at(5))]
+        )
+
+    def test_index_refreshed_on_write(self):
+        """Test bookings and cancellations update the cached index"""
+        parking_lot = ParkingLotUserOwnedFactory()
+        space = ParkingSpaceFactory(parking_lot=parking_lot)
+        self.assertFalse(has_overlap(space.id, self.at(1), self.at(2)))
+        reservation = ReservationFactory(
+            parking_lot=parking_lot,
+            parking_space=space,
+            start_time=self.at(1),
+            end_time=self.at(3)
+        )
+        self.assertTrue(has_overlap(space.id, self.at(2), self.at(4)))
+        with self.assertNumQueries(0):
+            self.assertFalse(has_overlap(space.id, self.at(3), self.at(4)))
+        reservation.status = Reservation.Status.CANCELLED
+        reservation.save()
+        self.assertFalse(has_overlap(space.id, self.at(2), self.at(4)))
+
+
+class ReserveAnyTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.parking_lot = ParkingLotUserOwnedFactory()
+        self.spaces = [
+            ParkingSpaceFactory(parking_lot=self.parking_lot, space_number=number, distance_to_entrance=distance)
+            for number, distance in [('10', 5), ('2', 40), ('3', None)]
+        ]
+        self.start_time = timezone.now() + timedelta(hours=1)
+        self.end_time = self.start_time + timedelta(hours=2)
+
+    def reserve(self, **kwargs):
+        return ReservationService.reserve_any(
+            self.user, self.parking_lot, self.start_time, self.end_time, vehicle_plate='ANY123', **kwargs
+        )
+
+    def test_fill_order(self):
+        """Test spaces are filled by natural space number"""
+        numbers = [self.reserve().parking_space.space_number for _ in range(3)]
+        self.assertEqual(numbers, ['2', '3', '10'])
+        with self.assertRaises(ReservationConflict):
+            self.reserve()
+
+    def test_nearest_entrance(self):
+        """Test the nearest space is taken first and unknown distances last"""
+        numbers = [self.reserve(policy='nearest_entrance').parking_space.space_number for _ in range(3)]
+        self.assertEqual(numbers, ['10', '2', '3'])
+
+    def test_skips_overlapping_spaces(self):
+        """Test spaces with an overlapping active booking are not assigned"""
+        ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=self.spaces[1],
+            start_time=self.start_time,
+            end_time=self.end_time,
+            status=Reservation.Status.ACTIVE
+        )
+        ParkingSpace.objects.filter(pk=self.spaces[1].pk).update(status=ParkingSpace.Status.AVAILABLE)
+        self.assertEqual(self.reserve().parking_space.space_number, '3')
+
+    def test_notifies_after_commit(self):
+        """Test the notification is sent once the booking commits, not while locks are held"""
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f"user_{self.user.id}_notifications", channel)
+
+        async def receive():
+            return await asyncio.wait_for(layer.receive(channel), timeout=0.2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = self.reserve()
+            with self.assertRaises(asyncio.TimeoutError):
+                async_to_sync(receive)()
+        message = async_to_sync(receive)()
+        self.assertEqual(message['content']['reservation_id'], reservation.id)
+
+
+class BulkReservationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        self.parking_lot = ParkingLotUserOwnedFactory(total_spaces=5, available_spaces=5)
+        self.spaces = [ParkingSpaceFactory(parking_lot=self.parking_lot) for _ in range(4)]
+        self.start_time = timezone.now() + timedelta(hours=1)
+
+    def item(self, space, **kwargs):
+        return {
+            'parking_space': space.id,
+            'start_time': self.start_time,
+            'end_time': self.start_time + timedelta(hours=2),
+            'vehicle_plate': 'FLEET1',
+            **kwargs
+        }
+
+    def test_bulk_create(self):
+        """Test a batch is inserted with one counter change and rollup update"""
+        items = [self.item(space) for space in self.spaces[:3]]
+        with self.assertNumQueries(13):
+            reservations, errors = ReservationService.bulk_create_reservations(self.user, items)
+        self.assertEqual(errors, {})
+        self.assertEqual(len(reservations), 3)
+        self.parking_lot.refresh_from_db()
+        self.assertEqual(self.parking_lot.available_spaces, 2)
+        self.assertEqual(
+            ParkingSpace.objects.filter(status=ParkingSpace.Status.RESERVED, current_user=self.user).count(), 3
+        )
+        self.assertEqual(ReservationRollup.objects.aggregate(total=Sum('total_reservations'))['total'], 3)
+        self.assertTrue(has_overlap(self.spaces[0].id, self.start_time, self.start_time + timedelta(hours=1)))
+
+    def test_all_or_nothing(self):
+        """Test one invalid item rejects the whole atomic batch"""
+        ReservationFactory(
+            user=self.user,
+            parking_lot=self.parking_lot,
+            parking_space=self.spaces[0],
+            start_time=self.start_time,
+            end_time=self.start_time + timedelta(hours=1)
+        )
+        items = [
+            self.item(self.spaces[1]),
+            self.item(self.spaces[2], end_time=self.start_time),
+            self.item(self.spaces[1]),
+            self.item(self.spaces[0]),
+        ]
+        reservations, errors = ReservationService.bulk_create_reservations(self.user, items)
+        self.assertEqual(reservations, [])
+        self.assertEqual(sorted(errors), [0, 1, 2, 3])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_partial(self):
+        """Test non-atomic batches create the valid items and report the rest"""
+        ParkingSpace.objects.filter(pk=self.spaces[0].pk).update(status=ParkingSpace.Status.MAINTENANCE)
+        items = [self.item(self.spaces[0]), self.item(self.spaces[1]), self.item(self.spaces[2])]
+        reservations, errors = ReservationService.bulk_create_reservations(self.user, items, atomic=False)
+        self.assertEqual(len(reservations), 2)
+        self.assertEqual(errors, {0: ["This parking space is not available."]})
+
+    def test_partial_with_concurrent_booking(self):
+        """Test a non-atomic batch colliding on insert keeps the other items and hands the space back"""
+        rival = Reservation(
+            user=UserFactory(),
+            parking_lot=self.parking_lot,
+            parking_space=self.spaces[1],
+            hourly_rate=self.parking_lot.hourly_rate,
+            start_time=self.start_time,
+            end_time=self.start_time + timedelta(hours=1),
+            vehicle_plate='RIVAL1'
+        )
+
+        # The counter change samples occupancy between the overlap check and
+        # the insert, which is where a concurrent booking would land
+        def book_concurrently(sender, **kwargs):
+            post_save.disconnect(book_concurrently, sender=OccupancySample)
+            Reservation.objects.bulk_create([rival])
+        post_save.connect(book_concurrently, sender=OccupancySample, weak=False)
+        self.addCleanup(post_save.disconnect, book_concurrently, sender=OccupancySample)
+
+        items = [self.item(space) for space in self.spaces[:3]]
+        with override_settings(OCCUPANCY_SAMPLE_ON_CHANGE=True):
+            reservations, errors = ReservationService.bulk_create_reservations(self.user, items, atomic=False)
+        self.assertEqual(errors, {1: ["This space is already reserved for the selected time period."]})
+        self.assertEqual(
+            sorted(Reservation.objects.filter(user=self.user).values_list('parking_space_id', flat=True)),
+            [reservation.parking_space_id for reservation in reservations]
+        )
+        self.assertEqual([reservation.parking_space_id for reservation in reservations], [self.spaces[0].id, self.spaces[2].id])
+        self.parking_lot.refresh_from_db()
+        self.assertEqual(self.parking_lot.available_spaces, 3)
+        self.spaces[1].refresh_from_db()
+        self.assertEqual(self.spaces[1].status, ParkingSpace.Status.AVAILABLE)
+        self.assertIsNone(self.spaces[1].current_user)
+
+    def test_lot_capacity(self):
+        """Test a lot without enough free spaces rejects its items"""
+        ParkingLot.objects.filter(pk=self.parking_lot.pk).update(available_spaces=1)
+        items = [self.item(space) for space in self.spaces[:2]]
+        reservations, errors = ReservationService.bulk_create_reservations(self.user, items)
+        self.assertEqual(reservations, [])
+        self.assertEqual(sorted(errors), [0, 1])
+        self.parking_lot.refresh_from_db()
+        self.assertEqual(self.parking_lot.available_spaces, 1)
+        self.assertEqual(ParkingSpace.objects.filter(status=ParkingSpace.Status.RESERVED).count(), 0)
+
+
+class ReserveAnyConcurrencyTests(TransactionTestCase):
+    def test_concurrent_requests_get_distinct_spaces(self):
+        """Test a burst of requests for one lot never shares or wastes a space"""
+        parking_lot = ParkingLotUserOwnedFactory(total_spaces=4, available_spaces=4)
+        for number in range(1, 5):
+            ParkingSpaceFactory(parking_lot=parking_lot, space_number=str(number))
+        users = [UserFactory() for _ in range(6)]
+        start_time = timezone.now() + timedelta(hours=1)
+        barrier = threading.Barrier(len(users))
+        results = []
+
+        def book(user):
+            try:
+                barrier.wait()
+                reservation = ReservationService.reserve_any(
+                    user, parking_lot, start_time, start_time + timedelta(hours=1), vehicle_plate='RUSH1'
+                )
+                results.append(reservation.parking_space_id)
+            except ReservationConflict:
+                results.append(None)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        booked = [space_id for space_id in results if space_id is not None]
+        self.assertEqual(len(results), 6)
+        self.assertEqual(len(booked), 4)
+        self.assertEqual(len(set(booked)), 4)
+        parking_lot.refresh_from_db()
+        self.assertEqual(parking_lot.available_spaces, 0)
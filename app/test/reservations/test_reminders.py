@@ -0,0 +1,114 @@
+from io import StringIO
+from datetime import timedelta
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from app.api.notification.models import Notification
+from app.api.reservations.models import Reservation, ReservationReminder
+from app.api.reservations.reminders import ReminderScheduler, TimingWheel, send_due_reminders
+from app.test.factories import (
+    UserFactory,
+    ParkingLotUserOwnedFactory,
+    ParkingSpaceFactory,
+    ReservationFactory
+)
+
+
+class TimingWheelTests(TestCase):
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0)
+        self.wheel = TimingWheel(self.start, resolution=timedelta(seconds=10), size=6)
+
+    def test_add_and_advance(self):
+        """Test entries fire once their slot has elapsed"""
+        self.assertTrue(self.wheel.add(self.start + timedelta(seconds=25), 'a'))
+        self.assertTrue(self.wheel.add(self.start - timedelta(minutes=5), 'late'))
+        self.assertFalse(self.wheel.add(self.start + timedelta(minutes=2), 'too far'))
+        self.assertEqual(len(self.wheel), 2)
+
+        self.assertEqual(self.wheel.advance(self.start), ['late'])
+        self.assertIsNotNone(self.wheel.next_due())
+        self.assertEqual(self.wheel.advance(self.start + timedelta(seconds=10)), [])
+        self.assertEqual(self.wheel.advance(self.start + timedelta(seconds=40)), ['a'])
+        self.assertIsNone(self.wheel.next_due())
+
+    def test_advance_past_revolution(self):
+        """Test a long pause collects every slot exactly once"""
+        self.wheel.add(self.start + timedelta(seconds=50), 'a')
+        self.assertEqual(self.wheel.advance(self.start + timedelta(hours=1)), ['a'])
+        self.assertEqual(len(self.wheel), 0)
+        self.assertTrue(self.wheel.add(self.start + timedelta(hours=1, seconds=30), 'b'))
+
+
+class ReminderTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.parking_lot = ParkingLotUserOwnedFactory()
+        self.now = timezone.now()
+
+    def book(self, minutes, **kwargs):
+        return ReservationFactory(
+            user=self.user,
+            parking_lot=self.parking_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+            start_time=self.now + timedelta(minutes=minutes),
+            end_time=self.now + timedelta(minutes=minutes + 60),
+            **kwargs
+        )
+
+    def notifications(self):
+        return Notification.objects.filter(user=self.user, type=Notification.NotificationType.UPCOMING_RESERVATION)
+
+    def test_reminders_sent_once(self):
+        """Test due reminders are sent exactly once and future ones are left"""
+        due = self.book(20)
+        self.book(45)
+        self.book(10, status=Reservation.Status.CANCELLED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(send_due_reminders(self.now, offsets=[30]), 1)
+        self.assertEqual(send_due_reminders(self.now, offsets=[30]), 0)
+        self.assertEqual(list(ReservationReminder.objects.values_list('reservation_id', flat=True)), [due.id])
+        self.assertEqual(self.notifications().get().data['minutes'], 20)
+
+    def test_late_booking_gets_one_reminder(self):
+        """Test a booking past several offsets is reminded once, with the closest offset"""
+        reservation = self.book(3)
+        self.assertEqual(send_due_reminders(self.now, offsets=[30, 5]), 2)
+        self.assertEqual(self.notifications().count(), 1)
+        self.assertEqual(
+            set(reservation.reminders.values_list('offset_minutes', flat=True)), {5, 30}
+        )
+
+    def test_scheduler_sends_from_wheel(self):
+        """Test the scheduler loads the wheel and sends when the slot is reached"""
+        reservation = self.book(40)
+        scheduler = ReminderScheduler(offsets=[30], resolution=timedelta(seconds=15), size=240)
+
+        delay = scheduler.tick(self.now)
+        self.assertEqual(scheduler.pending, {(reservation.id, 30)})
+        self.assertEqual(delay, scheduler.reload_interval.total_seconds())
+        self.assertEqual(ReservationReminder.objects.count(), 0)
+
+        # A reload before the reminder is due does not add it twice
+        scheduler.tick(self.now + timedelta(minutes=6))
+        self.assertEqual(len(scheduler.wheel), 1)
+
+        scheduler.tick(self.now + timedelta(minutes=10, seconds=15))
+        self.assertEqual(scheduler.pending, set())
+        self.assertEqual(ReservationReminder.objects.get().reservation_id, reservation.id)
+
+    def test_schedule_new_booking(self):
+        """Test bookings made after a reload are put on the wheel directly"""
+        scheduler = ReminderScheduler(offsets=[30])
+        scheduler.tick(self.now)
+        reservation = self.book(35)
+        scheduler.schedule(reservation.id, reservation.start_time)
+        self.assertEqual(scheduler.pending, {(reservation.id, 30)})
+
+    def test_command_once(self):
+        """Test the daemon command can send the due reminders once"""
+        self.book(10)
+        out = StringIO()
+        call_command('send_reminders', '--once', stdout=out)
+        self.assertIn('Sent 1 reminders', out.getvalue())
@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -81,6 +83,93 @@ class ReservationViewSetTest(TestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_update_reservation_overlap_conflict(self):
+        """Test moving a reservation onto another one returns 409"""
+        later = ReservationFactory(
+            user=self.user,
+            parking_lot=self.parking_lot,
+            parking_space=self.parking_space,
+            start_time=self.reservation.end_time + timedelta(hours=1),
+            end_time=self.reservation.end_time + timedelta(hours=2)
+        )
+        url = reverse('reservation-detail', args=[later.id])
+        data = {'start_time': self.reservation.start_time.isoformat()}
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        later.refresh_from_db()
+        self.assertEqual(later.start_time, self.reservation.end_time + timedelta(hours=1))
+
+    def test_reserve_any(self):
+        """Test booking any free space of a lot, then conflicting when it is full"""
+        url = reverse('reservation-reserve-any')
+        start_time = timezone.now() + timedelta(hours=1)
+        data = {
+            'parking_lot': self.parking_lot.id,
+            'vehicle_plate': 'ANY123',
+            'start_time': start_time.isoformat(),
+            'end_time': (start_time + timedelta(hours=1)).isoformat(),
+        }
+        # The space from setUp is already reserved
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        
+        free_space = ParkingSpaceFactory(parking_lot=self.parking_lot)
+        response = self.client.post(url, dict(data, policy='nearest_entrance'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['parking_space']['id'], free_space.id)
+        self.assertEqual(response.data['user']['id'], self.user.id)
+
+    def test_reserve_any_for_other_user_requires_admin(self):
+        """Test regular users cannot auto-book for someone else"""
+        url = reverse('reservation-reserve-any')
+        start_time = timezone.now() + timedelta(hours=1)
+        response = self.client.post(url, {
+            'user': self.admin_user.id,
+            'parking_lot': self.parking_lot.id,
+            'vehicle_plate': 'ANY123',
+            'start_time': start_time.isoformat(),
+            'end_time': (start_time + timedelta(hours=1)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_reservations(self):
+        """Test bulk creation reports per-item errors and supports partial batches"""
+        url = reverse('reservation-bulk')
+        start_time = timezone.now() + timedelta(hours=1)
+        free_space = ParkingSpaceFactory(parking_lot=self.parking_lot)
+        items = [
+            {
+                'parking_space': space.id,
+                'vehicle_plate': 'FLEET1',
+                'start_time': start_time.isoformat(),
+                'end_time': (start_time + timedelta(hours=1)).isoformat(),
+            }
+            for space in (free_space, self.parking_space)
+        ]
+        response = self.client.post(url, {'reservations': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['created'], [])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        
+        response = self.client.post(url, {'reservations': items, 'atomic': False}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(len(response.data['created']), 1)
+        self.assertEqual(response.data['created'][0]['parking_space']['id'], free_space.id)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_bulk_reservations_for_other_user_requires_admin(self):
+        """Test regular users cannot bulk-book for someone else"""
+        url = reverse('reservation-bulk')
+        start_time = timezone.now() + timedelta(hours=1)
+        response = self.client.post(url, {'reservations': [{
+            'user': self.admin_user.id,
+            'parking_space': self.parking_space.id,
+            'vehicle_plate': 'FLEET1',
+            'start_time': start_time.isoformat(),
+            'end_time': (start_time + timedelta(hours=1)).isoformat(),
+        }]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_update_reservation(self):
         """Test updating a reservation"""
         url = reverse('reservation-detail', args=[self.reservation.id])
@@ -168,4 +257,122 @@ class ReservationViewSetTest(TestCase):
             'end_date': end_date.isoformat()
         })
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 1) 
\ No newline at end of file
+        self.assertEqual(len(response.data['results']), 1) 
+    def test_list_reservations_compact(self):
+        """Test the listing is compact by default and nested with ?expand=true"""
+        url = reverse('reservation-list')
+        response = self.client.get(url)
+        item = response.data['results'][0]
+        self.assertEqual(item['parking_space'], self.parking_space.id)
+        self.assertEqual(item['space_number'], self.parking_space.space_number)
+        self.assertEqual(item['user'], self.user.id)
+        self.assertAlmostEqual(item['duration'], float(self.reservation.duration))
+        self.assertEqual(item['total_cost'], f"{self.reservation.total_cost:.2f}")
+
+        response = self.client.get(url, {'expand': 'true'})
+        item = response.data['results'][0]
+        self.assertEqual(item['parking_space']['id'], self.parking_space.id)
+        self.assertEqual(item['user']['id'], self.user.id)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        """Test a listing page costs the same number of queries for any page size"""
+        url = reverse('reservation-list')
+        self.client.force_authenticate(user=self.admin_user)
+
+        def count_queries(params):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        baseline = [count_queries({}), count_queries({'expand': 'true'})]
+        for _ in range(20):
+            ReservationFactory(
+                parking_lot=self.parking_lot,
+                parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot)
+            )
+        self.assertEqual(
+            [count_queries({'page_size': 50}), count_queries({'page_size': 50, 'expand': 'true'})],
+            baseline
+        )
+
+    def test_cursor_pagination(self):
+        """Test ?pagination=cursor walks every reservation newest first without a count"""
+        for _ in range(4):
+            ReservationFactory(
+                user=self.user,
+                parking_lot=self.parking_lot,
+                parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot)
+            )
+        response = self.client.get(reverse('reservation-list'), {'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+
+        seen = []
+        while True:
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        expected = Reservation.objects.filter(user=self.user).order_by('-created_at', '-id')
+        self.assertEqual(seen, list(expected.values_list('id', flat=True)))
+
+    def test_cursor_pagination_with_equal_timestamps(self):
+        """Test the cursor keys on (created_at, id) so rows sharing a timestamp need no OFFSET"""
+        for _ in range(5):
+            ReservationFactory(
+                user=self.user,
+                parking_lot=self.parking_lot,
+                parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot)
+            )
+        reservations = Reservation.objects.filter(user=self.user)
+        reservations.update(created_at=timezone.now())
+        expected = list(reservations.order_by('-id').values_list('id', flat=True))
+
+        response = self.client.get(reverse('reservation-list'), {'pagination': 'cursor', 'page_size': 2})
+        pages = []
+        while True:
+            pages.append([item['id'] for item in response.data['results']])
+            if not response.data['next']:
+                break
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(response.data['next'])
+            self.assertFalse([query for query in queries if 'OFFSET' in query['sql']])
+        self.assertEqual(sum(pages, []), expected)
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([item['id'] for item in response.data['results']], pages[-2])
+
+    def test_plate_lookup(self):
+        """Test plate lookups ignore case and separators and support prefixes"""
+        self.client.force_authenticate(user=self.admin_user)
+        booking = ReservationFactory(
+            parking_lot=self.parking_lot,
+            parking_space=ParkingSpaceFactory(parking_lot=self.parking_lot),
+            vehicle_plate='abc-1234'
+        )
+        url = reverse('reservation-plate')
+
+        response = self.client.get(url, {'plate': 'ABC 1234'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [booking.id])
+
+        response = self.client.get(url, {'plate': 'abc12'})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(url, {'plate': 'abc12', 'match': 'prefix'})
+        self.assertEqual([item['id'] for item in response.data['results']], [booking.id])
+
+        response = self.client.get(url, {'plate': '--'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_reservations(self):
+        """Test search matches plates, notes, lot names and space numbers"""
+        url = reverse('reservation-list')
+        self.reservation.notes = 'Blue sedan near the ramp'
+        self.reservation.save()
+
+        for term in ['sedan', self.reservation.vehicle_plate.lower()[:3], self.reservation.vehicle_plate[-3:], self.parking_lot.name, self.parking_space.space_number]:
+            response = self.client.get(url, {'search': term})
+            self.assertEqual(len(response.data['results']), 1, term)
+        response = self.client.get(url, {'search': 'no such thing'})
+        self.assertEqual(len(response.data['results']), 0)
@@ -11,6 +11,17 @@ from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.conf import settings
 import traceback
 
+# SQLSTATE raised by PostgreSQL for an exclusion constraint violation
+EXCLUSION_VIOLATION = '23P01'
+
+
+class ConflictError(APIException):
+    """The request conflicts with the current state of a resource."""
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The request conflicts with the current state of the resource.'
+    default_code = 'conflict'
+
 
 def custom_exception_handler(exc, context):
     """Custom exception handler for DRF that returns consistent JSON responses."""
@@ -51,6 +62,23 @@ def custom_exception_handler(exc, context):
         
         return Response(error_data, status=status.HTTP_400_BAD_REQUEST)
 
+    # Handle exclusion constraint violations (e.g. overlapping bookings)
+    if isinstance(exc, IntegrityError) and getattr(exc.__cause__, 'pgcode', None) == EXCLUSION_VIOLATION:
+        error_data = {
+            'status': 'error',
+            'code': status.HTTP_409_CONFLICT,
+            'message': 'The request conflicts with an existing record.'
+        }
+        
+        if settings.DEBUG:
+            error_data['debug'] = {
+                'exception_type': exc.__class__.__name__,
+                'exception_message': str(exc),
+                'traceback': traceback.format_exc()
+            }
+        
+        return Response(error_data, status=status.HTTP_409_CONFLICT)
+
     # Handle database integrity errors
     if isinstance(exc, IntegrityError):
         error_data = {
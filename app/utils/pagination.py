@@ -0,0 +1,145 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CreatedCursorPagination(CursorPagination):
+    """
+    Keyset pagination over ``(created_at, id)``, newest first.
+
+    The cursor carries both columns of the last row, and the next page is
+    the rows strictly after it in ``(created_at, id)`` order. Rows sharing
+    a timestamp are therefore never skipped or repeated, and each page is
+    an index range scan from the cursor, so deep pages cost the same as
+    the first one and no COUNT or OFFSET is run. The ``?sort_by`` options
+    do not apply in this mode.
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.id
+        return f'{created_at.isoformat()}|{pk}'
+
+    def decode_position(self, position):
+        """Split a cursor position into its ``(created_at, id)`` key."""
+        created_at, _, pk = position.rpartition('|')
+        try:
+            key = (parse_datetime(created_at), int(pk))
+        except ValueError:
+            key = (None, None)
+        if key[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return key
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*[
+                field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        # Forward cursors walk towards older rows, reversed ones towards newer
+        if current_position is not None:
+            created_at, pk = self.decode_position(current_position)
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'created_at__{lookup}': created_at})
+                | Q(created_at=created_at, **{f'id__{lookup}': pk})
+            )
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+
+        has_following_position = len(results) > len(self.page)
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering) if has_following_position else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Page-number pagination with a per-request cursor mode.
+
+    ``?pagination=cursor`` (or any request carrying a ``cursor``) is
+    paginated by ``CreatedCursorPagination`` instead, for infinite feeds
+    and deep scrolling.
+    """
+
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_class = CreatedCursorPagination
+
+    cursor_paginator = None
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get('pagination') == 'cursor'
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def is_requested(self, request):
+        """Whether the request carries any paging parameter, for endpoints that paginate only on request."""
+        return self.use_cursor(request) or any(
+            param in request.query_params for param in (self.page_query_param, self.page_size_query_param)
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
@@ -0,0 +1,55 @@
+import logging
+import threading
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundScheduler:
+    """
+    Base for background jobs that decide when they next need to run.
+
+    Subclasses implement ``tick``, which does the work and returns the
+    seconds to sleep. ``wake`` cuts the sleep short. ``run`` loops in the
+    calling thread (management command daemons); ``start`` runs it in a
+    daemon thread (ASGI lifespan).
+    """
+
+    name = 'scheduler'
+
+    def __init__(self, max_sleep):
+        self.max_sleep = max_sleep
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def tick(self):
+        raise NotImplementedError
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        """Tick until ``stop`` is called."""
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                delay = self.tick()
+            except Exception:
+                logger.exception("%s tick failed", self.name)
+                delay = self.max_sleep
+            finally:
+                connection.close()
+            self._wake.wait(delay)
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None